@@ -0,0 +1,144 @@
+"""Broadcast latency in a 500-player room with a few stalled sockets.
+
+Compares GameManager.broadcast_to_room, which encodes once and hands the
+payload to every connection's own queue, with the loop it replaced: a
+json.dumps and an awaited send per recipient, one after another. Stalled
+sockets take --stall seconds for every send, like a client on a dead
+mobile link. Broadcasts are due every --interval seconds; delivery latency
+runs from when a broadcast was due until the last healthy player got it.
+
+    cd backend
+    python -m benchmarks.broadcast --players 500 --stalled 5 --output benchmarks/results/broadcast.json
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Any, Dict, List
+
+from benchmarks.run import percentile
+from services.connection import SlowConsumerPolicy
+from services.game_manager import GameManager
+
+ROOM = "bench-room"
+
+class TimedSocket:
+    """Records when each frame arrives"""
+
+    def __init__(self, stall: float = 0.0):
+        self.stall = stall
+        self.received: List[float] = []
+
+    async def accept(self, *args, **kwargs):
+        pass
+
+    async def send_text(self, data: str):
+        if self.stall:
+            await asyncio.sleep(self.stall)
+        self.received.append(time.perf_counter())
+
+    async def send_bytes(self, data: bytes):
+        await self.send_text("")
+
+    async def close(self, code: int = 1000, reason=None):
+        pass
+
+def _message(k: int) -> Dict[str, Any]:
+    return {"type": "game_action", "data": {"player_id": "p0", "action": "build", "building": "tower", "k": k}}
+
+async def legacy_broadcast(sockets: Dict[str, TimedSocket], message: Dict[str, Any]):
+    """The old path: serialize and await each recipient in turn"""
+    for socket in sockets.values():
+        await socket.send_text(json.dumps(message))
+
+def _summary(due: List[float], healthy: List[TimedSocket], caller: List[float]) -> Dict[str, Any]:
+    delivery = sorted(
+        max(socket.received[k] for socket in healthy) - due[k]
+        for k in range(len(due))
+        if all(len(socket.received) > k for socket in healthy)
+    )
+    caller = sorted(caller)
+    return {
+        "delivered": len(delivery),
+        "delivery_p50_ms": round(percentile(delivery, 0.50) * 1e3, 2) if delivery else None,
+        "delivery_p99_ms": round(percentile(delivery, 0.99) * 1e3, 2) if delivery else None,
+        "delivery_max_ms": round(delivery[-1] * 1e3, 2) if delivery else None,
+        "caller_p99_ms": round(percentile(caller, 0.99) * 1e3, 3),
+    }
+
+async def _run_broadcasts(broadcast, args: argparse.Namespace):
+    """Open loop: broadcasts are due on schedule however long the last one took"""
+    due: List[float] = []
+    caller: List[float] = []
+    started = time.perf_counter()
+    for k in range(args.broadcasts):
+        due.append(started + k * args.interval)
+        delay = due[-1] - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        call_started = time.perf_counter()
+        await broadcast(_message(k))
+        caller.append(time.perf_counter() - call_started)
+    return due, caller
+
+def _sockets(args: argparse.Namespace) -> Dict[str, TimedSocket]:
+    # Stalled players spread through the room, not bunched at the end
+    step = max(1, args.players // max(1, args.stalled))
+    stalled = {i * step for i in range(args.stalled)}
+    return {f"p{i}": TimedSocket(args.stall if i in stalled else 0.0) for i in range(args.players)}
+
+async def bench_legacy(args: argparse.Namespace) -> Dict[str, Any]:
+    sockets = _sockets(args)
+    due, caller = await _run_broadcasts(lambda message: legacy_broadcast(sockets, message), args)
+    return _summary(due, [s for s in sockets.values() if not s.stall], caller)
+
+async def bench_queued(args: argparse.Namespace) -> Dict[str, Any]:
+    sockets = _sockets(args)
+    manager = GameManager(send_queue_size=args.queue_size, slow_consumer_policy=args.policy)
+    for player_id, socket in sockets.items():
+        await manager.connect(player_id, socket)
+        await manager.join_room(player_id, ROOM)
+    healthy = [s for s in sockets.values() if not s.stall]
+    # Let healthy players drain the join announcements before measuring
+    while any(manager.connections[p].queue_depth for p, s in sockets.items() if not s.stall):
+        await asyncio.sleep(0.01)
+    for socket in healthy:
+        socket.received.clear()
+
+    due, caller = await _run_broadcasts(lambda message: manager.broadcast_to_room(ROOM, message), args)
+    deadline = time.perf_counter() + 5
+    while any(len(s.received) < args.broadcasts for s in healthy) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    result = _summary(due, healthy, caller)
+    result["stalled_dropped"] = sum(
+        manager.connections[p].dropped for p, s in sockets.items() if s.stall and p in manager.connections
+    )
+    await manager.shutdown()
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Room broadcast latency with stalled sockets; prints JSON")
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--stalled", type=int, default=5)
+    parser.add_argument("--stall", type=float, default=0.05, help="seconds each send to a stalled socket takes")
+    parser.add_argument("--broadcasts", type=int, default=100)
+    parser.add_argument("--interval", type=float, default=0.02, help="seconds between broadcasts")
+    parser.add_argument("--queue-size", type=int, default=256)
+    parser.add_argument("--policy", default=SlowConsumerPolicy.DROP_OLDEST.value,
+                        choices=[policy.value for policy in SlowConsumerPolicy])
+    parser.add_argument("--output", default=None, help="also write the report to this file")
+    args = parser.parse_args(argv)
+    report = {
+        "config": vars(args),
+        "legacy_sequential": asyncio.run(bench_legacy(args)),
+        "per_connection_queues": asyncio.run(bench_queued(args)),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,193 @@
+"""Requests/s, p99 latency and event loop stalls: blocking driver vs motor.
+
+Requests for GET /api/games/{id} (one find_one each) arrive at a fixed
+--rate, and latency counts from when each was due, so time spent queued
+behind a stalled event loop shows up. A ticker stands in for game traffic
+and records how late the loop runs it. "blocking" is how the routes used
+to talk to MongoDB: the synchronous driver called straight from async def
+routes. "async" is the motor-backed DatabaseManager they use now.
+
+Without --mongodb-url both run on mongomock, with --latency seconds of
+simulated server time per query: slept in the caller for the blocking
+driver, awaited for the async one. With --mongodb-url they use pymongo and
+motor against that server and no latency is added.
+
+    cd backend
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.database --requests 5000 --rate 400 --output benchmarks/results/database.json
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from bson import ObjectId
+
+from benchmarks.run import percentile
+from database import database
+from models.game import GameStatus, GameType
+
+# How often the stand-in for game traffic wants to run
+TICK_INTERVAL = 0.01
+
+class SimulatedDatabase:
+    """Database whose collections wrap every call to look like the chosen driver"""
+
+    def __init__(self, db, blocking: bool, latency: float):
+        self._db = db
+        self.blocking = blocking
+        self.latency = latency
+
+    def __getitem__(self, name: str):
+        return SimulatedCollection(self._db[name], self.blocking, self.latency)
+
+class SimulatedCollection:
+    def __init__(self, collection, blocking: bool, latency: float):
+        self._collection = collection
+        self._blocking = blocking
+        self._latency = latency
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            if self._blocking:
+                # The old routes: the whole event loop waits for the server
+                if self._latency:
+                    time.sleep(self._latency)
+                return attr(*args, **kwargs)
+            if self._latency:
+                await asyncio.sleep(self._latency)
+            result = attr(*args, **kwargs)
+            return await result if inspect.isawaitable(result) else result
+        return call
+
+def _game_document() -> Dict[str, Any]:
+    now = time.time()
+    return {
+        "_id": ObjectId(),
+        "game_type": GameType.MULTIPLAYER.value,
+        "status": GameStatus.WAITING.value,
+        "players": [str(ObjectId()) for _ in range(4)],
+        "max_players": 4,
+        "settings": {},
+        "game_objects": [{"id": f"obj-{i}", "type": "house", "position": {"x": i, "y": i}} for i in range(20)],
+        "version": 1,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+def _connect(backend: str, mongodb_url: Optional[str], latency: float):
+    """Point the global database at the backend; returns a cleanup callable"""
+    if mongodb_url is None:
+        if backend == "blocking":
+            import mongomock
+            client = mongomock.MongoClient()
+        else:
+            from mongomock_motor import AsyncMongoMockClient
+            client = AsyncMongoMockClient()
+        database.client = client
+        database.db = SimulatedDatabase(client["vibeton_bench"], backend == "blocking", latency)
+        return lambda: None
+    if backend == "blocking":
+        from pymongo import MongoClient
+        client = MongoClient(mongodb_url)
+        database.client = client
+        database.db = SimulatedDatabase(client.get_default_database("vibeton_bench"), True, 0.0)
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(mongodb_url, maxPoolSize=database.max_pool_size)
+        database.client = client
+        database.db = client.get_default_database("vibeton_bench")
+    return client.close
+
+async def _ticker(lags: List[float], stop: asyncio.Event):
+    """How late each tick runs: what every WebSocket on the worker would feel"""
+    while not stop.is_set():
+        expected = time.perf_counter() + TICK_INTERVAL
+        await asyncio.sleep(TICK_INTERVAL)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+async def measure(backend: str, args: argparse.Namespace) -> Dict[str, Any]:
+    import main
+
+    cleanup = _connect(backend, args.mongodb_url, args.latency)
+    games = database.games
+    game_ids = []
+    for _ in range(args.games):
+        doc = _game_document()
+        await games.insert_one(doc)
+        game_ids.append(str(doc["_id"]))
+
+    latencies: List[float] = []
+    errors = 0
+    lags: List[float] = []
+    stop = asyncio.Event()
+
+    async def request(client: httpx.AsyncClient, game_id: str, due: float):
+        nonlocal errors
+        response = await client.get(f"/api/games/{game_id}")
+        latencies.append(time.perf_counter() - due)
+        errors += response.status_code != 200
+
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        requests = []
+        for i in range(args.requests):
+            # Open loop: requests keep arriving on schedule however slow the server is
+            due = started + i / args.rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            requests.append(asyncio.create_task(request(client, game_ids[i % len(game_ids)], due)))
+        await asyncio.gather(*requests)
+        elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+
+    await games.delete_many({"_id": {"$in": [ObjectId(game_id) for game_id in game_ids]}})
+    cleanup()
+    latencies.sort()
+    lags.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1e3, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1e3, 2),
+        "loop_lag_p99_ms": round(percentile(lags, 0.99) * 1e3, 2) if lags else None,
+        "loop_lag_max_ms": round(lags[-1] * 1e3, 2) if lags else None,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Blocking vs async MongoDB access under concurrent load; prints JSON")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=400.0, help="requests arriving per second")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.002, help="simulated seconds per query on mongomock")
+    parser.add_argument("--mongodb-url", default=None, help="run against this server instead of mongomock")
+    parser.add_argument("--output", default=None, help="also write the report to this file")
+    args = parser.parse_args(argv)
+    if args.mongodb_url:
+        args.latency = 0.0
+    report = {
+        "config": vars(args),
+        "before_blocking": asyncio.run(measure("blocking", args)),
+        "after_async": asyncio.run(measure("async", args)),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
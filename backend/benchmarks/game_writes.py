@@ -0,0 +1,208 @@
+"""Latency of game update, join and start: read-check-write vs one find_one_and_update.
+
+"legacy" is what the routes did before: read the game to check it exists
+and is in the right state, write it with update_one, and for update read
+it back again. "atomic" calls the current route functions, which do each
+in a single find_one_and_update. The player behind a join is already in
+the player cache for both, as it is for a player who just logged in.
+
+Without --mongodb-url both run on mongomock with --latency seconds of
+simulated server time awaited per round trip; with it, against that
+server as is. --concurrency calls are in flight at once, each on a game
+of its own that is created just before the call and deleted after it:
+mongomock scans the whole collection for every query, so a big one would
+time the scan rather than the round trips.
+
+    cd backend
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.game_writes --calls 2000 --concurrency 8 --output benchmarks/results/game_writes.json
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import sys
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from bson import ObjectId
+
+from benchmarks.database import SimulatedDatabase
+from benchmarks.run import percentile
+from database import database
+from models.game import GameUpdate
+from routers.game import join_game, start_game, update_game
+from services.matchmaking import new_game_document
+from services.player_cache import player_cache
+
+USERNAME = "bench-player"
+
+# Set only around the timed call, so setup and cleanup don't count
+_timed = contextvars.ContextVar("timed", default=False)
+
+class CountingDatabase(SimulatedDatabase):
+    """SimulatedDatabase that counts collection calls made by timed calls as round trips"""
+
+    def __init__(self, db, latency: float):
+        super().__init__(db, blocking=False, latency=latency)
+        self.round_trips = 0
+
+    def __getitem__(self, name: str):
+        return _CountingCollection(self, super().__getitem__(name))
+
+class _CountingCollection:
+    def __init__(self, db: CountingDatabase, collection):
+        self._db = db
+        self._collection = collection
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            if _timed.get():
+                self._db.round_trips += 1
+            return attr(*args, **kwargs)
+        return call
+
+async def legacy_update(game_id: str, game_update: GameUpdate):
+    """The old update_game: existence check, update_one, read back"""
+    if not await database.games.find_one({"_id": ObjectId(game_id)}, {"_id": 1}):
+        raise LookupError(game_id)
+    update_data = game_update.dict(exclude_unset=True)
+    update_data["updated_at"] = datetime.utcnow()
+    result = await database.games.update_one({"_id": ObjectId(game_id)}, {"$set": update_data})
+    if result.modified_count == 0:
+        raise ValueError("No changes made")
+    updated_game = await database.games.find_one({"_id": ObjectId(game_id)})
+    updated_game["_id"] = str(updated_game["_id"])
+    return updated_game
+
+async def legacy_join(game_id: str, player_username: str):
+    """The old join_game: read status and players, check them here, then $push"""
+    player_doc = await player_cache.get_by_username(player_username)
+    game_doc = await database.games.find_one({"_id": ObjectId(game_id)}, {"status": 1, "players": 1})
+    if not game_doc or game_doc.get("status") != "waiting":
+        raise ValueError("Game is not accepting new players")
+    if str(player_doc["_id"]) in game_doc.get("players", []):
+        raise ValueError("Player already in game")
+    result = await database.games.update_one(
+        {"_id": ObjectId(game_id)},
+        {"$push": {"players": str(player_doc["_id"])}, "$set": {"updated_at": datetime.utcnow()}}
+    )
+    if result.modified_count == 0:
+        raise ValueError("Failed to join game")
+    return {"message": "Successfully joined game", "game_id": game_id}
+
+async def legacy_start(game_id: str):
+    """The old start_game: read the status, then update_one"""
+    game_doc = await database.games.find_one({"_id": ObjectId(game_id)}, {"status": 1})
+    if not game_doc or game_doc.get("status") != "waiting":
+        raise ValueError("Game cannot be started")
+    now = datetime.utcnow()
+    result = await database.games.update_one(
+        {"_id": ObjectId(game_id)},
+        {"$set": {"status": "active", "started_at": now, "updated_at": now}}
+    )
+    if result.modified_count == 0:
+        raise ValueError("Failed to start game")
+    return {"message": "Game started successfully", "game_id": game_id}
+
+def _connect(mongodb_url: Optional[str], latency: float):
+    """Point the global database at a counting wrapper; returns a cleanup callable"""
+    if mongodb_url is None:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+        db = client["vibeton_bench"]
+        cleanup = lambda: None
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(mongodb_url, maxPoolSize=database.max_pool_size)
+        db = client.get_default_database("vibeton_bench")
+        cleanup = client.close
+    database.client = client
+    database.db = CountingDatabase(db, latency)
+    return cleanup
+
+async def _measure(call: Callable[[str], Awaitable[Any]], calls: int, concurrency: int, creator_id: str) -> Dict[str, Any]:
+    latencies: List[float] = []
+    remaining = iter(range(calls))
+
+    async def worker():
+        for _ in remaining:
+            game = new_game_document("multiplayer", creator_id, {}, None)
+            await database.games.insert_one(game)
+            game_id = str(game["_id"])
+            token = _timed.set(True)
+            started = time.perf_counter()
+            await call(game_id)
+            latencies.append(time.perf_counter() - started)
+            _timed.reset(token)
+            await database.games.delete_one({"_id": game["_id"]})
+
+    round_trips = database.db.round_trips
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "round_trips_per_call": round((database.db.round_trips - round_trips) / calls, 2),
+        # Includes creating and deleting each game
+        "calls_per_s": round(calls / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1e3, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1e3, 3),
+    }
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    cleanup = _connect(args.mongodb_url, args.latency)
+    player = {"_id": ObjectId(), "username": USERNAME, "score": 0, "level": 1}
+    await database.players.insert_one(player)
+    creator_id = str(ObjectId())
+    # Both paths look the player up through the cache; warm it outside the timings
+    await player_cache.get_by_username(USERNAME)
+
+    operations = {
+        "update": {
+            "legacy": lambda game_id: legacy_update(game_id, GameUpdate(score=1)),
+            "atomic": lambda game_id: update_game(game_id, GameUpdate(score=1)),
+        },
+        "join": {
+            "legacy": lambda game_id: legacy_join(game_id, USERNAME),
+            "atomic": lambda game_id: join_game(game_id, USERNAME),
+        },
+        "start": {
+            "legacy": legacy_start,
+            "atomic": start_game,
+        },
+    }
+    report = {}
+    for operation, paths in operations.items():
+        report[operation] = {}
+        for path, call in paths.items():
+            report[operation][path] = await _measure(call, args.calls, args.concurrency, creator_id)
+    await database.players.delete_one({"_id": player["_id"]})
+    player_cache.clear()
+    cleanup()
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Game update/join/start: read-check-write vs atomic; prints JSON")
+    parser.add_argument("--calls", type=int, default=2000, help="calls per operation and path")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.002, help="simulated seconds per round trip on mongomock")
+    parser.add_argument("--mongodb-url", default=None, help="run against this server instead of mongomock")
+    parser.add_argument("--output", default=None, help="also write the report to this file")
+    args = parser.parse_args(argv)
+    if args.mongodb_url:
+        args.latency = 0.0
+    report = {"config": vars(args), **asyncio.run(run(args))}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
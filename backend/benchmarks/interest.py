@@ -0,0 +1,101 @@
+"""Per-move fan-out and cost with 5k players in one room.
+
+Compares room-wide movement broadcasts (interest_radius 0) with the area of
+interest grid. Players are scattered over a --map-size square and random
+players take small steps; frames per move counts what actually reached
+sockets, and the time per move includes draining every writer queue.
+
+    cd backend
+    python -m benchmarks.interest --players 5000 --radius 50 --output benchmarks/results/interest.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+from benchmarks.run import BenchSocket, percentile
+from services.game_manager import GameManager
+
+ROOM = "bench-room"
+
+async def _drain(manager: GameManager):
+    while any(connection.queue_depth for connection in manager.connections.values()):
+        await asyncio.sleep(0.001)
+
+async def measure(radius: float, args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    # The default bound would drop frames on purpose; count them all instead
+    manager = GameManager(send_queue_size=args.players, interest_radius=radius)
+    manager.rate_limits = None
+    positions = []
+    # Place everyone before they join and seat them before any socket is
+    # attached, so setup doesn't announce 5k arrivals to 5k players
+    for i in range(args.players):
+        position = [rng.uniform(0, args.map_size), rng.uniform(0, args.map_size)]
+        positions.append(position)
+        await manager.move_player(f"p{i}", *position)
+    for i in range(args.players):
+        await manager.join_room(f"p{i}", ROOM)
+    sockets: List[BenchSocket] = []
+    for i in range(args.players):
+        socket = BenchSocket()
+        sockets.append(socket)
+        await manager.connect(f"p{i}", socket)
+    await _drain(manager)
+
+    frames_before = sum(socket.frames for socket in sockets)
+    bytes_before = sum(socket.bytes for socket in sockets)
+    calls: List[float] = []
+    started = time.perf_counter()
+    for _ in range(args.moves):
+        i = rng.randrange(args.players)
+        position = positions[i]
+        position[0] = min(args.map_size, max(0.0, position[0] + rng.uniform(-args.step, args.step)))
+        position[1] = min(args.map_size, max(0.0, position[1] + rng.uniform(-args.step, args.step)))
+        call_started = time.perf_counter()
+        await manager.move_player(f"p{i}", *position)
+        calls.append(time.perf_counter() - call_started)
+    await _drain(manager)
+    elapsed = time.perf_counter() - started
+
+    frames = sum(socket.frames for socket in sockets) - frames_before
+    sent_bytes = sum(socket.bytes for socket in sockets) - bytes_before
+    await manager.shutdown()
+    calls.sort()
+    return {
+        "radius": radius,
+        "frames_per_move": round(frames / args.moves, 1),
+        "bytes_per_move": round(sent_bytes / args.moves),
+        "move_call_p50_ms": round(percentile(calls, 0.50) * 1e3, 3),
+        "move_call_p99_ms": round(percentile(calls, 0.99) * 1e3, 3),
+        "ms_per_move_with_delivery": round(elapsed / args.moves * 1e3, 3),
+    }
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "room_wide": await measure(0, args),
+        "area_of_interest": await measure(args.radius, args),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Movement fan-out in one big room; prints JSON")
+    parser.add_argument("--players", type=int, default=5000)
+    parser.add_argument("--map-size", type=float, default=2000.0)
+    parser.add_argument("--radius", type=float, default=50.0)
+    parser.add_argument("--moves", type=int, default=300)
+    parser.add_argument("--step", type=float, default=5.0, help="largest step per axis per move")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="also write the report to this file")
+    args = parser.parse_args(argv)
+    report = {"config": vars(args), **asyncio.run(run(args))}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,112 @@
+"""Leaderboard load time, memory and query rates at 1M players.
+
+Times Leaderboard.load over an in-memory stand-in for the players
+collection, then score updates, rank and neighbour lookups and top-N pages
+(first page and one deep in the table). For comparison, "scan" does what
+the routes had to do without the index, over a plain dict: look at every
+score for a top page and count the higher ones for a rank. MongoDB doing
+the same over the collection is slower still.
+
+    cd backend
+    python -m benchmarks.leaderboard --players 1000000 --output benchmarks/results/leaderboard.json
+"""
+import argparse
+import asyncio
+import heapq
+import json
+import random
+import resource
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from bson import ObjectId
+
+from services.leaderboard import Leaderboard
+
+class _Players:
+    """Just enough of a collection for Leaderboard.load"""
+
+    def __init__(self, docs: List[Dict[str, Any]]):
+        self.docs = docs
+
+    def find(self, *args, **kwargs):
+        return self._cursor()
+
+    async def _cursor(self):
+        for doc in self.docs:
+            yield doc
+
+def _rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _rate(function: Callable[[int], Any], count: int) -> float:
+    """Calls per second"""
+    started = time.perf_counter()
+    for i in range(count):
+        function(i)
+    return round(count / (time.perf_counter() - started), 1)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="In-memory leaderboard at scale; prints JSON")
+    parser.add_argument("--players", type=int, default=1000000)
+    parser.add_argument("--ops", type=int, default=100000, help="operations per indexed measurement")
+    parser.add_argument("--scan-ops", type=int, default=5, help="operations per scan measurement")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="also write the report to this file")
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+
+    docs = [
+        {"_id": ObjectId(), "username": f"player{i}", "score": rng.randrange(100000), "level": rng.randrange(1, 50)}
+        for i in range(args.players)
+    ]
+    player_ids = [str(doc["_id"]) for doc in docs]
+    rss_before = _rss_mb()
+    leaderboard = Leaderboard()
+    started = time.perf_counter()
+    asyncio.run(leaderboard.load(_Players(docs)))
+    load_s = time.perf_counter() - started
+    load_rss_mb = _rss_mb() - rss_before
+
+    def pick(i: int) -> str:
+        return player_ids[rng.randrange(len(player_ids))]
+
+    def update(i: int):
+        leaderboard.upsert(pick(i), "player", rng.randrange(100000), 1)
+
+    indexed = {
+        "upsert_per_s": _rate(update, args.ops),
+        "rank_per_s": _rate(lambda i: leaderboard.rank(pick(i)), args.ops),
+        "around_per_s": _rate(lambda i: leaderboard.around(pick(i), 2), args.ops),
+        "top10_per_s": _rate(lambda i: leaderboard.top(10), args.ops),
+        "top10_at_middle_per_s": _rate(lambda i: leaderboard.top(10, offset=args.players // 2), args.ops),
+    }
+
+    scores = {doc["_id"]: doc["score"] for doc in docs}
+
+    def scan_rank(i: int):
+        score = scores[docs[rng.randrange(len(docs))]["_id"]]
+        return sum(1 for other in scores.values() if other > score) + 1
+
+    scan = {
+        "rank_per_s": _rate(scan_rank, args.scan_ops),
+        "top10_per_s": _rate(lambda i: heapq.nlargest(10, scores.items(), key=lambda item: item[1]), args.scan_ops),
+    }
+    report = {
+        "config": vars(args),
+        "load_s": round(load_s, 2),
+        # The index plus whatever load allocated along the way
+        "load_peak_rss_growth_mb": round(load_rss_mb, 1),
+        "indexed": indexed,
+        "scan": scan,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
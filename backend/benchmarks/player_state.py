@@ -0,0 +1,113 @@
+"""Memory per player and update throughput of the player state store.
+
+Compares PlayerStateStore with the dict of pydantic Position models it
+replaced, at 100k entities by default.
+
+    cd backend
+    python -m benchmarks.player_state --entities 100000 --updates 1000000
+"""
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+from models.game import Position
+from services import player_state
+from services.player_state import PlayerStateStore
+
+def _allocated(build: Callable[[], Any]) -> Tuple[Any, int]:
+    """The object build returns and the bytes it keeps allocated"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+def _rate(count: int, started: float) -> float:
+    return round(count / (time.perf_counter() - started), 1)
+
+def bench_dict(ids: List[str], moves: List[Tuple[int, float, float]]) -> Dict[str, Any]:
+    def build():
+        return {player_id: Position(x=0.0, y=0.0) for player_id in ids}
+    positions, allocated = _allocated(build)
+
+    started = time.perf_counter()
+    for index, x, y in moves:
+        positions[ids[index]] = Position(x=x, y=y)
+    updates = _rate(len(moves), started)
+
+    started = time.perf_counter()
+    near = [player_id for player_id, p in positions.items() if (p.x - 500) ** 2 + (p.y - 500) ** 2 <= 100 ** 2]
+    radius_ms = (time.perf_counter() - started) * 1e3
+    return {
+        "bytes_per_player": round(allocated / len(ids), 1),
+        "updates_per_s": updates,
+        "radius_query_ms": round(radius_ms, 2),
+        "radius_matches": len(near)
+    }
+
+def bench_store(ids: List[str], moves: List[Tuple[int, float, float]]) -> Dict[str, Any]:
+    def build():
+        store = PlayerStateStore()
+        for player_id in ids:
+            store.set(player_id, 0.0, 0.0)
+        return store
+    store, allocated = _allocated(build)
+
+    started = time.perf_counter()
+    for index, x, y in moves:
+        store.set(ids[index], x, y)
+    updates = _rate(len(moves), started)
+
+    started = time.perf_counter()
+    near = store.within(500, 500, 100)
+    radius_ms = (time.perf_counter() - started) * 1e3
+    started = time.perf_counter()
+    store.stale(60)
+    stale_ms = (time.perf_counter() - started) * 1e3
+
+    # Churn: half disconnect and reconnect; slots are reused, columns don't grow
+    for player_id in ids[::2]:
+        store.remove(player_id)
+    for player_id in ids[::2]:
+        store.set(player_id, 1.0, 1.0)
+    return {
+        "bytes_per_player": round(allocated / len(ids), 1),
+        "column_bytes_per_player": round(store.nbytes / len(ids), 1),
+        "updates_per_s": updates,
+        "radius_query_ms": round(radius_ms, 2),
+        "radius_matches": len(near),
+        "stale_query_ms": round(stale_ms, 2),
+        "slots_after_churn": store.capacity
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Player state memory and throughput; prints JSON")
+    parser.add_argument("--entities", type=int, default=100000)
+    parser.add_argument("--updates", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    ids = [f"player-{index}" for index in range(args.entities)]
+    moves = [
+        (random.randrange(args.entities), random.uniform(0, 1000), random.uniform(0, 1000))
+        for _ in range(args.updates)
+    ]
+    report = {
+        "config": vars(args),
+        "numpy": player_state.numpy is not None,
+        "pydantic_dict": bench_dict(ids, moves),
+        "player_state_store": bench_store(ids, moves)
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
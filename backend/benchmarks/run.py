@@ -0,0 +1,272 @@
+"""Load test for the REST and WebSocket paths.
+
+Drives the app in-process: REST clients go through httpx's ASGI transport
+and WebSocket clients are fed straight into GameManager with in-memory
+sockets, against mongomock or a throwaway mongod. Client and server share
+one event loop, so the numbers are for comparing commits on one machine,
+not a capacity estimate.
+
+    cd backend
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.run --rest-clients 20 --ws-clients 500 --duration 10 --output result.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from database import database
+from services.game_manager import game_manager
+from services.leaderboard import leaderboard
+from services.write_behind import player_state_writer
+
+class Recorder:
+    """Latencies and failures per operation name"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, name: str, seconds: float, ok: bool = True):
+        self.latencies.setdefault(name, []).append(seconds)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for name, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            result[name] = {
+                "count": len(values),
+                "errors": self.errors.get(name, 0),
+                "throughput_per_s": round(len(values) / elapsed, 2),
+                "mean_ms": round(sum(values) / len(values) * 1e3, 3),
+                "p50_ms": round(percentile(values, 0.50) * 1e3, 3),
+                "p95_ms": round(percentile(values, 0.95) * 1e3, 3),
+                "p99_ms": round(percentile(values, 0.99) * 1e3, 3),
+                "max_ms": round(values[-1] * 1e3, 3)
+            }
+        return result
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, math.ceil(q * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+class BenchSocket:
+    """Stands in for a WebSocket; counts what the server sends"""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+
+    async def accept(self, *args, **kwargs):
+        pass
+
+    async def send_text(self, data: str):
+        self.frames += 1
+        self.bytes += len(data)
+
+    async def send_bytes(self, data: bytes):
+        self.frames += 1
+        self.bytes += len(data)
+
+    async def close(self, code: int = 1000, reason: Optional[str] = None):
+        pass
+
+async def setup_database(mongo_url: Optional[str]):
+    if mongo_url:
+        os.environ["MONGODB_URL"] = mongo_url
+        await database.connect()
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+        # mongomock-motor's get_default_database isn't wrapped for async use
+        database.client = client
+        database.db = client["vibeton_game"]
+    await leaderboard.load(database.players)
+    player_state_writer.start()
+
+async def timed(recorder: Recorder, name: str, request) -> Optional[httpx.Response]:
+    started = time.perf_counter()
+    try:
+        response = await request
+    except Exception:
+        recorder.record(name, time.perf_counter() - started, ok=False)
+        return None
+    recorder.record(name, time.perf_counter() - started, ok=response.status_code < 400)
+    return response
+
+async def create_games(client: httpx.AsyncClient, run_id: str, count: int) -> List[str]:
+    host = f"bench-{run_id}-host"
+    await client.post("/api/players/", json={"username": host})
+    game_ids = []
+    for _ in range(count):
+        response = await client.post(f"/api/games/?player_username={host}", json={"game_type": "multiplayer"})
+        game_ids.append(response.json()["_id"])
+    return game_ids
+
+async def rest_client(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    run_id: str,
+    index: int,
+    game_ids: List[str],
+    deadline: float,
+):
+    """Create a player, join a game and read the leaderboard, until the deadline"""
+    iteration = 0
+    while time.perf_counter() < deadline:
+        username = f"bench-{run_id}-{index}-{iteration}"
+        iteration += 1
+        await timed(recorder, "create_player", client.post("/api/players/", json={"username": username}))
+        game_id = random.choice(game_ids)
+        await timed(recorder, "join_game", client.post(f"/api/games/{game_id}/join?player_username={username}"))
+        await timed(recorder, "leaderboard_top", client.get("/api/players/leaderboard/top?limit=10"))
+        # mongomock and the ASGI transport never really wait on I/O; without
+        # this a REST client would hold the loop until the deadline
+        await asyncio.sleep(0)
+
+async def ws_client(
+    recorder: Recorder,
+    player_id: str,
+    room_id: str,
+    rate: float,
+    chat_ratio: float,
+    deadline: float,
+):
+    """Send moves (and now and then a chat line) at `rate` messages per second"""
+    interval = 1.0 / rate
+    # Spread clients out so they don't all fire on the same loop iteration
+    await asyncio.sleep(random.random() * interval)
+    while time.perf_counter() < deadline:
+        if random.random() < chat_ratio:
+            name = "ws_chat_message"
+            message = {"type": "chat_message", "data": {"room_id": room_id, "message": "hello"}}
+        else:
+            name = "ws_player_move"
+            message = {"type": "player_move", "data": {"position": {"x": random.uniform(0, 1000), "y": random.uniform(0, 1000)}}}
+        started = time.perf_counter()
+        await game_manager.handle_message(player_id, message)
+        recorder.record(name, time.perf_counter() - started)
+        await asyncio.sleep(interval)
+
+def memory_stats() -> Dict[str, Any]:
+    stats = {"peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        stats["python_heap_mb"] = round(current / 2**20, 1)
+        stats["python_heap_peak_mb"] = round(peak / 2**20, 1)
+    return stats
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run(args) -> Dict[str, Any]:
+    from main import app
+
+    random.seed(args.seed)
+    await setup_database(args.mongo_url)
+    run_id = uuid.uuid4().hex[:8]
+    rest_recorder = Recorder()
+    ws_recorder = Recorder()
+
+    sockets: List[BenchSocket] = []
+    ws_tasks = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        game_ids = await create_games(client, run_id, args.games)
+
+        # Connect everyone before the clock starts
+        for index in range(args.ws_clients):
+            socket = BenchSocket()
+            sockets.append(socket)
+            player_id = f"bench-ws-{index}"
+            await game_manager.connect(player_id, socket)
+            await game_manager.join_room(player_id, f"bench-room-{index // args.room_size}")
+        frames_before = sum(socket.frames for socket in sockets)
+
+        started = time.perf_counter()
+        deadline = started + args.duration
+        for index in range(args.ws_clients):
+            ws_tasks.append(asyncio.create_task(ws_client(
+                ws_recorder, f"bench-ws-{index}", f"bench-room-{index // args.room_size}",
+                args.ws_rate, args.chat_ratio, deadline
+            )))
+        await asyncio.gather(*[
+            rest_client(client, rest_recorder, run_id, index, game_ids, deadline)
+            for index in range(args.rest_clients)
+        ], *ws_tasks)
+        # Let the writers drain what was queued before the deadline
+        await asyncio.sleep(0.1)
+        elapsed = time.perf_counter() - started
+
+    frames = sum(socket.frames for socket in sockets) - frames_before
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "database": "mongod" if args.mongo_url else "mongomock",
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "mongo_url")},
+        "elapsed_s": round(elapsed, 3),
+        "rest": rest_recorder.summary(elapsed),
+        "websocket": {
+            **ws_recorder.summary(elapsed),
+            "delivered": {
+                "frames": frames,
+                "frames_per_s": round(frames / elapsed, 2),
+                "bytes": sum(socket.bytes for socket in sockets)
+            }
+        },
+        "memory": memory_stats()
+    }
+
+    await game_manager.shutdown()
+    await player_state_writer.stop()
+    return report
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="REST and WebSocket load test; prints JSON")
+    parser.add_argument("--rest-clients", type=int, default=10, help="concurrent REST clients")
+    parser.add_argument("--ws-clients", type=int, default=200, help="synthetic WebSocket clients")
+    parser.add_argument("--room-size", type=int, default=50, help="WebSocket clients per room")
+    parser.add_argument("--ws-rate", type=float, default=10.0, help="messages per second per WebSocket client")
+    parser.add_argument("--chat-ratio", type=float, default=0.05, help="share of WebSocket messages that are chat")
+    parser.add_argument("--games", type=int, default=20, help="games the REST clients join")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mongo-url", help="use this (throwaway!) mongod instead of mongomock")
+    parser.add_argument("--trace-memory", action="store_true", help="also report Python heap usage (slower)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.trace_memory:
+        tracemalloc.start()
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
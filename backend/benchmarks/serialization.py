@@ -0,0 +1,104 @@
+"""Rendering a game list: jsonable_encoder vs orjson, with and without projection.
+
+100 games with 1k objects each, shaped like documents from the driver
+(ObjectId ids, datetimes). "legacy" is what get_games used to do: convert
+each _id by hand, then FastAPI's jsonable_encoder and json.dumps.
+"orjson_full" renders the same documents through MongoJSONResponse, and
+"orjson_projected" renders what GAME_LIST_PROJECTION leaves of them.
+
+    cd backend
+    python -m benchmarks.serialization --games 100 --objects 1000 --output benchmarks/results/serialization.json
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from routers.game import GAME_LIST_PROJECTION
+from services.serialization import MongoJSONResponse
+
+def make_games(games: int, objects: int, rng: random.Random) -> List[Dict[str, Any]]:
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": ObjectId(),
+            "game_type": "multiplayer",
+            "status": "active",
+            "players": [str(ObjectId()) for _ in range(4)],
+            "max_players": 4,
+            "game_objects": [
+                {
+                    "id": f"obj-{i}",
+                    "type": rng.choice(("house", "tower", "road", "tree")),
+                    "position": {"x": rng.uniform(0, 2000), "y": rng.uniform(0, 2000)},
+                    "properties": {"level": rng.randrange(1, 5), "owner": f"player-{rng.randrange(4)}"}
+                }
+                for i in range(objects)
+            ],
+            "version": objects,
+            "current_level": 1,
+            "score": rng.randrange(10000),
+            "settings": {"map_width": 256, "map_height": 256, "difficulty": "normal"},
+            "created_at": now,
+            "updated_at": now,
+            "started_at": now,
+            "finished_at": None,
+        }
+        for _ in range(games)
+    ]
+
+def legacy_render(games: List[Dict[str, Any]]) -> bytes:
+    for game in games:
+        game["_id"] = str(game["_id"])
+    return JSONResponse(jsonable_encoder(games)).body
+
+def render(games: List[Dict[str, Any]]) -> bytes:
+    return MongoJSONResponse(games).body
+
+def project(games: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """What MongoDB returns for GAME_LIST_PROJECTION"""
+    return [{key: value for key, value in game.items() if key not in GAME_LIST_PROJECTION} for game in games]
+
+def _time(renderer: Callable[[Any], bytes], content: Callable[[], Any], repeats: int) -> Dict[str, Any]:
+    timings = []
+    body = b""
+    for _ in range(repeats):
+        argument = content()
+        started = time.perf_counter()
+        body = renderer(argument)
+        timings.append(time.perf_counter() - started)
+    return {"median_ms": round(statistics.median(timings) * 1e3, 3), "bytes": len(body)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Game list rendering cost; prints JSON")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--objects", type=int, default=1000, help="game objects per game")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="also write the report to this file")
+    args = parser.parse_args(argv)
+    games = make_games(args.games, args.objects, random.Random(args.seed))
+    projected = project(games)
+    report = {
+        "config": vars(args),
+        # The old loop rewrote _id in place, so it gets fresh copies each time
+        "legacy": _time(legacy_render, lambda: [dict(game) for game in games], args.repeats),
+        "orjson_full": _time(render, lambda: games, args.repeats),
+        "orjson_projected": _time(render, lambda: projected, args.repeats),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,197 @@
+"""Room throughput with rooms sharded over 1, 2, 4 and 8 worker processes.
+
+For each worker count this starts a real cluster through
+services.sharding.run_cluster: the backplane broker plus one uvicorn worker
+per port, each with SHARD_ROOMS on and MONGODB_URL from the environment.
+Client processes open one WebSocket per player on the first worker with
+?room=, follow the redirect to the room's owner the way the frontend does,
+and send moves at --rate per player. Each move carries its send time, so
+roommates' player_moved frames give delivery latency as well as frames/s.
+Aggregate throughput should grow with the worker count up to the number of
+cores (client processes need cores too).
+
+    cd backend
+    python -m benchmarks.sharding --rooms 64 --room-size 20 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List
+from urllib.parse import urlparse
+
+import httpx
+import websockets
+
+from benchmarks.run import percentile
+from services.rate_limit import DEFAULT_RATE_LIMITS
+
+# Latency samples each client process reports, to keep the queue small
+MAX_SAMPLES = 20000
+
+async def _connect(base_url: str, player_id: str, room_id: str):
+    """Socket joined to room_id, on the worker that owns it"""
+    url = f"{base_url}/ws/{player_id}?room={room_id}"
+    for _ in range(3):
+        socket = await websockets.connect(url, max_queue=None)
+        try:
+            first = json.loads(await asyncio.wait_for(socket.recv(), timeout=5))
+        except asyncio.TimeoutError:
+            return socket
+        if first.get("type") != "redirect":
+            return socket
+        await socket.close()
+        url = f"{first['data']['url']}/ws/{player_id}?room={room_id}"
+    raise RuntimeError(f"{player_id} kept being redirected")
+
+def _clients(rooms: List[int], args: Dict[str, Any], epoch: float, start, results):
+    async def run():
+        sockets = []
+        for room in rooms:
+            for seat in range(args["room_size"]):
+                player_id = f"r{room}-p{seat}"
+                sockets.append(await _connect(args["base_url"], player_id, f"bench-room-{room}"))
+        results.put(("ready", len(sockets)))
+        await asyncio.get_running_loop().run_in_executor(None, start.wait)
+
+        sent = 0
+        received = 0
+        latencies: List[float] = []
+        deadline = time.time() + args["duration"]
+
+        async def send(socket):
+            nonlocal sent
+            # Spread players over the interval instead of sending in lockstep
+            await asyncio.sleep(random.uniform(0, 1 / args["rate"]))
+            while time.time() < deadline:
+                await socket.send(json.dumps({
+                    "type": "player_move",
+                    "data": {"position": {"x": time.time() - epoch, "y": 0}}
+                }))
+                sent += 1
+                await asyncio.sleep(1 / args["rate"])
+
+        async def receive(socket):
+            nonlocal received
+            while time.time() < deadline:
+                try:
+                    message = json.loads(await asyncio.wait_for(socket.recv(), deadline - time.time()))
+                except (asyncio.TimeoutError, websockets.ConnectionClosed):
+                    return
+                if message.get("type") != "player_moved":
+                    continue
+                received += 1
+                if len(latencies) < MAX_SAMPLES:
+                    latencies.append(time.time() - epoch - message["data"]["position"]["x"])
+
+        await asyncio.gather(*(send(s) for s in sockets), *(receive(s) for s in sockets))
+        for socket in sockets:
+            await socket.close()
+        results.put(("done", {"sent": sent, "received": received, "latencies": latencies}))
+
+    asyncio.run(run())
+
+async def _wait_for_cluster(workers: int, host: str, base_port: int, timeout: float = 60.0):
+    """Until every worker is up and sees all the others on the backplane"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        for port in range(base_port, base_port + workers):
+            while True:
+                try:
+                    response = await client.get(f"http://{host}:{port}/api/rooms/placement")
+                    if len(response.json().get("workers", {})) == workers:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Worker on port {port} did not join the cluster")
+                await asyncio.sleep(0.2)
+
+async def measure(workers: int, args: Dict[str, Any]) -> Dict[str, Any]:
+    from services.sharding import run_cluster
+
+    host = urlparse(args["base_url"]).hostname
+    base_port = urlparse(args["base_url"]).port
+    cluster = asyncio.create_task(run_cluster(workers, host, base_port, args["backplane_url"]))
+    try:
+        await _wait_for_cluster(workers, host, base_port)
+
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        start = context.Event()
+        epoch = time.time()
+        rooms = list(range(args["rooms"]))
+        processes = [
+            context.Process(target=_clients, args=(rooms[i::args["client_processes"]], args, epoch, start, results))
+            for i in range(args["client_processes"])
+        ]
+        for process in processes:
+            process.start()
+        loop = asyncio.get_running_loop()
+        reports: List[Dict[str, Any]] = []
+        ready = 0
+        while ready < len(processes):
+            kind, _ = await loop.run_in_executor(None, results.get)
+            ready += kind == "ready"
+        start.set()
+        while len(reports) < len(processes):
+            kind, report = await loop.run_in_executor(None, results.get)
+            if kind == "done":
+                reports.append(report)
+        for process in processes:
+            process.join()
+    finally:
+        cluster.cancel()
+        try:
+            await cluster
+        except asyncio.CancelledError:
+            pass
+        # Let the workers exit and free their ports for the next run
+        await asyncio.sleep(2)
+
+    latencies = sorted(sample for report in reports for sample in report["latencies"])
+    return {
+        "workers": workers,
+        "moves_per_s": round(sum(r["sent"] for r in reports) / args["duration"], 1),
+        "frames_per_s": round(sum(r["received"] for r in reports) / args["duration"], 1),
+        "latency_p50_ms": round(percentile(latencies, 0.50) * 1e3, 2) if latencies else None,
+        "latency_p99_ms": round(percentile(latencies, 0.99) * 1e3, 2) if latencies else None,
+    }
+
+async def run_all(counts: List[int], config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [await measure(workers, config) for workers in counts]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sharded room throughput against real workers; prints JSON")
+    parser.add_argument("--workers", default="1,2,4,8", help="comma-separated worker counts")
+    parser.add_argument("--rooms", type=int, default=64)
+    parser.add_argument("--room-size", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=20.0, help="moves per second per player")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--client-processes", type=int, default=4)
+    parser.add_argument("--base-url", default="ws://127.0.0.1:8101")
+    parser.add_argument("--backplane-url", default="unix:///tmp/vibeton-bench-backplane.sock")
+    args = parser.parse_args(argv)
+    config = {
+        "rooms": args.rooms,
+        "room_size": args.room_size,
+        "rate": args.rate,
+        "duration": args.duration,
+        "client_processes": args.client_processes,
+        "base_url": args.base_url,
+        "backplane_url": args.backplane_url,
+    }
+    # Workers inherit the environment: let every player move at --rate
+    os.environ["WS_RATE_LIMITS"] = f"{DEFAULT_RATE_LIMITS},player_move={args.rate}/{args.rate * 2}"
+    runs = asyncio.run(run_all([int(n) for n in args.workers.split(",")], config))
+    base = runs[0]["frames_per_s"] or 1
+    for run in runs:
+        run["speedup"] = round(run["frames_per_s"] / base, 2)
+    print(json.dumps({"cpu_count": os.cpu_count(), "config": config, "runs": runs}, indent=2))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,96 @@
+"""Bytes per message and encode/decode throughput: JSON vs the binary format.
+
+Covers the three hot-path messages with a binary layout: inbound
+player_move, and outbound player_moved and players_moved (a tick delta
+with --tick-players movers). Inbound decoding includes the validation the
+server does before moving anyone; outbound decoding is what a client does.
+
+    cd backend
+    python -m benchmarks.wire --messages 200000 --output benchmarks/results/wire.json
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Any, Callable, Dict
+
+from bson import ObjectId
+
+from services.dispatch import validate_move
+from services.wire import decode_binary, decode_move, encode_binary, encode_move
+
+def _rate(function: Callable[[], Any], count: int) -> float:
+    """Calls per second"""
+    started = time.perf_counter()
+    for _ in range(count):
+        function()
+    return round(count / (time.perf_counter() - started))
+
+def _position() -> Dict[str, float]:
+    # Real positions are arbitrary floats, not short literals
+    return {"x": random.uniform(0, 2000), "y": random.uniform(0, 2000)}
+
+def samples(tick_players: int) -> Dict[str, Dict[str, Any]]:
+    return {
+        "player_move": {"type": "player_move", "data": {"position": _position()}},
+        "player_moved": {"type": "player_moved", "data": {"player_id": str(ObjectId()), "position": _position()}},
+        "players_moved": {"type": "players_moved", "data": {
+            "room_id": str(ObjectId()),
+            "tick": 12345,
+            "positions": {str(ObjectId()): _position() for _ in range(tick_players)}
+        }},
+    }
+
+def bench_inbound(message: Dict[str, Any], count: int) -> Dict[str, Any]:
+    position = message["data"]["position"]
+    text = json.dumps(message)
+    frame = encode_move(position["x"], position["y"])
+    return {
+        "json_bytes": len(text.encode()),
+        "binary_bytes": len(frame),
+        "json_encode_per_s": _rate(lambda: json.dumps(message), count),
+        "binary_encode_per_s": _rate(lambda: encode_move(position["x"], position["y"]), count),
+        "json_decode_per_s": _rate(lambda: validate_move(json.loads(text)["data"]), count),
+        "binary_decode_per_s": _rate(lambda: decode_move(frame), count),
+    }
+
+def bench_outbound(message: Dict[str, Any], count: int) -> Dict[str, Any]:
+    text = json.dumps(message)
+    frame = encode_binary(message)
+    return {
+        "json_bytes": len(text.encode()),
+        "binary_bytes": len(frame),
+        "json_encode_per_s": _rate(lambda: json.dumps(message), count),
+        "binary_encode_per_s": _rate(lambda: encode_binary(message), count),
+        "json_decode_per_s": _rate(lambda: json.loads(text), count),
+        "binary_decode_per_s": _rate(lambda: decode_binary(frame), count),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JSON vs binary wire format per message type; prints JSON")
+    parser.add_argument("--messages", type=int, default=200000, help="encodes and decodes per measurement")
+    parser.add_argument("--tick-players", type=int, default=20, help="movers in the players_moved sample")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="also write the report to this file")
+    args = parser.parse_args(argv)
+    random.seed(args.seed)
+    messages = samples(args.tick_players)
+    # Tick deltas are bigger; keep their run about as long as the others
+    tick_count = max(1, args.messages // args.tick_players)
+    results = {
+        "player_move": bench_inbound(messages["player_move"], args.messages),
+        "player_moved": bench_outbound(messages["player_moved"], args.messages),
+        "players_moved": bench_outbound(messages["players_moved"], tick_count),
+    }
+    for result in results.values():
+        result["size_ratio"] = round(result["binary_bytes"] / result["json_bytes"], 3)
+    report = {"config": vars(args), "per_message": results}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
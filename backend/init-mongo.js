@@ -5,6 +5,8 @@ db = db.getSiblingDB('vibeton_game');
 db.createCollection('players');
 db.createCollection('games');
 db.createCollection('game_sessions');
+db.createCollection('chat_messages');
+db.createCollection('buildings');
 
 // Create indexes for better performance
 db.players.createIndex({ "username": 1 }, { unique: true });
@@ -15,9 +17,25 @@ db.games.createIndex({ "status": 1 });
 db.games.createIndex({ "players": 1 });
 db.games.createIndex({ "created_at": -1 });
 db.games.createIndex({ "game_type": 1 });
+// Keyset pagination: filtered listings sorted newest first with _id as tie-breaker
+db.games.createIndex({ "status": 1, "created_at": -1, "_id": -1 });
+db.games.createIndex({ "game_type": 1, "created_at": -1, "_id": -1 });
+// Matchmaking fallback: oldest waiting game of a type
+db.games.createIndex({ "status": 1, "game_type": 1, "created_at": 1 });
 
 db.game_sessions.createIndex({ "game_id": 1 });
 db.game_sessions.createIndex({ "player_id": 1 });
 db.game_sessions.createIndex({ "created_at": -1 });
 
+// Archived chat (CHAT_ARCHIVE=1), read back per room newest first
+db.chat_messages.createIndex({ "room_id": 1, "created_at": -1 });
+
+// Occupancy grids are rebuilt from a game's buildings on first access
+db.buildings.createIndex({ "game_id": 1 });
+// One building per tile, across every worker; tiles holds y * 65536 + x
+db.buildings.createIndex(
+  { "game_id": 1, "tiles": 1 },
+  { unique: true, partialFilterExpression: { "tiles": { "$exists": true } } }
+);
+
 print("Database initialized successfully!"); 
\ No newline at end of file
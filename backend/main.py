@@ -1,17 +1,59 @@
-from fastapi import FastAPI
+import json
+import os
+from typing import List, Optional
+from fastapi import FastAPI, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 
 from database import database
-from routers import auth, players
+from routers import auth, players, game, rooms, buildings
+from services.backplane import create_backplane
+from services.resume import parse_resume_seqs
+from services.sharding import RoomScheduler
+from services.buildings import building_index, building_writer
+from services.chat_history import chat_archiver, chat_history
+from services.game_manager import game_manager
+from services.leaderboard import leaderboard
+from services.matchmaking import matchmaker
+from services.metrics import HTTPMetricsMiddleware, metrics
+from services.player_cache import player_cache
+from services.serialization import MongoJSONResponse
+from services.write_behind import player_state_writer
+from services.wire import PROTOCOL_JSON
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await database.connect()
     print("Connected to MongoDB")
+    await leaderboard.load(database.players)
+    print(f"Loaded leaderboard with {len(leaderboard)} players")
+    await matchmaker.load(database.games)
+    print(f"Indexed {len(matchmaker)} waiting games for matchmaking")
+    await building_index.ensure_indexes()
+    player_state_writer.start()
+    building_writer.start()
+    if chat_archiver is not None:
+        chat_archiver.start()
+    backplane = create_backplane(os.getenv("BACKPLANE_URL"))
+    if backplane is not None:
+        scheduler = None
+        if os.getenv("SHARD_ROOMS", "").lower() in ("1", "true", "yes"):
+            # Rooms are placed on workers by consistent hashing; WORKER_URL is
+            # where clients reach this worker
+            scheduler = RoomScheduler(backplane.worker_id, os.getenv("WORKER_URL", "ws://localhost:8000"))
+        await game_manager.attach_backplane(backplane, scheduler)
+        print(f"Joined backplane {os.getenv('BACKPLANE_URL')}" + (" with room sharding" if scheduler else ""))
     yield
     # Shutdown
+    await game_manager.shutdown()
+    # Final flush so buffered player state survives the restart
+    await player_state_writer.stop()
+    print(f"Flushed player state: {player_state_writer.stats()}")
+    await building_writer.stop()
+    if chat_archiver is not None:
+        await chat_archiver.stop()
     await database.disconnect()
     print("Disconnected from MongoDB")
 
@@ -19,7 +61,8 @@ app = FastAPI(
     title="Vibeton Game API",
     description="Backend API for Vibeton web game",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=MongoJSONResponse
 )
 
 # CORS middleware
@@ -29,11 +72,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+app.add_middleware(HTTPMetricsMiddleware)
 
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(players.router, prefix="/api/players", tags=["players"])
+app.include_router(game.router, prefix="/api/games", tags=["games"])
+app.include_router(buildings.router, prefix="/api/games", tags=["buildings"])
+app.include_router(rooms.router, prefix="/api/rooms", tags=["rooms"])
 
 @app.get("/")
 async def root():
@@ -44,6 +92,56 @@ async def health_check():
     try:
         # Check database connection
         await database.ping()
-        return {"status": "healthy", "database": "connected"}
+        return {
+            "status": "healthy",
+            "database": "connected",
+            "write_behind": player_state_writer.stats(),
+            "player_cache": player_cache.stats(),
+            "chat_history": chat_history.stats(),
+            "player_state": game_manager.player_state.stats(),
+            "matchmaking": matchmaker.stats(),
+            "buildings": building_index.stats()
+        }
     except Exception as e:
-        return {"status": "unhealthy", "database": "disconnected", "error": str(e)} 
\ No newline at end of file
+        return {"status": "unhealthy", "database": "disconnected", "error": str(e)}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus scrape target"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.websocket("/ws/{player_id}")
+async def websocket_endpoint(
+    websocket: WebSocket,
+    player_id: str,
+    protocol: str = PROTOCOL_JSON,
+    room: Optional[str] = None,
+    resume: Optional[str] = None,
+    seq: List[str] = Query(default=[]),
+):
+    # Clients opt into the binary wire format with ?protocol=binary
+    if room is not None:
+        # ?room= joins straight away, or sends the client to the room's worker
+        redirect = game_manager.redirect_for(room)
+        if redirect is not None:
+            await websocket.accept()
+            await websocket.send_text(json.dumps(redirect))
+            await websocket.close(code=4001)
+            return
+    # A reconnecting client resumes with ?resume=<session_id>&seq=<room_id>:<last seq>...
+    await game_manager.connect(player_id, websocket, protocol=protocol, resume=resume, last_seqs=parse_resume_seqs(seq))
+    try:
+        if room is not None:
+            await game_manager.join_room(player_id, room)
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                break
+            if frame.get("bytes") is not None:
+                await game_manager.handle_binary(player_id, frame["bytes"])
+            elif frame.get("text") is not None:
+                await game_manager.handle_text(player_id, frame["text"])
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await game_manager.disconnect(player_id, websocket)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
 from datetime import datetime
 from enum import Enum
 from bson import ObjectId
@@ -72,7 +72,9 @@ class GameState(BaseModel):
     game_type: GameType
     status: GameStatus
     players: List[str] = []  # Player IDs
+    max_players: Optional[int] = None  # None means no limit
     game_objects: List[GameObject] = []
+    version: int = 0  # Bumped by every write to the game
     current_level: int = 1
     score: int = 0
     settings: Dict[str, Any] = {}
@@ -93,13 +95,50 @@ class PlayerUpdate(BaseModel):
 class GameCreate(BaseModel):
     game_type: GameType
     settings: Dict[str, Any] = {}
+    max_players: Optional[int] = Field(default=None, ge=1)
 
 class GameUpdate(BaseModel):
     status: Optional[GameStatus] = None
     score: Optional[int] = None
     current_level: Optional[int] = None
     game_objects: Optional[List[GameObject]] = None
+    base_version: Optional[int] = None  # Reject the update if the game has moved on
+
+class GameObjectUpdate(BaseModel):
+    id: str
+    type: Optional[str] = None
+    position: Optional[Position] = None
+    properties: Optional[Dict[str, Any]] = None
+
+class GameObjectsPatch(BaseModel):
+    """Changes to individual game objects; one kind of change per patch"""
+    base_version: Optional[int] = None
+    add: List[GameObject] = []
+    update: List[GameObjectUpdate] = []
+    remove: List[str] = []
+
+class BuildingCreate(BaseModel):
+    """A building on the city grid; (x, y) is the top-left tile of its footprint"""
+    building_type: str = Field(min_length=1, max_length=64)
+    x: int = Field(ge=0)
+    y: int = Field(ge=0)
+    width: int = Field(default=1, ge=1, le=8)
+    height: int = Field(default=1, ge=1, le=8)
 
 class WebSocketMessage(BaseModel):
     type: str
-    data: Dict[str, Any] = {} 
\ No newline at end of file
+    data: Dict[str, Any] = {}
+
+# Payloads of inbound WebSocket messages, by message type
+
+class RoomPayload(BaseModel):
+    room_id: str = Field(min_length=1, max_length=128)
+
+class ChatPayload(BaseModel):
+    room_id: str = Field(min_length=1, max_length=128)
+    message: str
+    timestamp: Optional[Union[int, float, str]] = None
+
+class GameObjectsPatchPayload(GameObjectsPatch):
+    game_id: str
+ 
\ No newline at end of file
@@ -1,2 +1,2 @@
 # Routers package
-from . import auth, players, game 
\ No newline at end of file
+from . import auth, players, game, rooms, buildings 
\ No newline at end of file
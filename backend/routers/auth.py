@@ -4,13 +4,16 @@ from bson import ObjectId
 
 from models.game import Player, PlayerCreate
 from database import database
+from services.leaderboard import leaderboard
+from services.player_cache import player_cache
+from services.serialization import MongoJSONResponse
 
 router = APIRouter()
 
 @router.post("/create-player", response_model=dict)
 async def create_player(player_data: PlayerCreate):
     # Check if username already exists
-    existing_player = database.players.find_one({"username": player_data.username})
+    existing_player = await player_cache.get_by_username(player_data.username)
     if existing_player:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -27,9 +30,11 @@ async def create_player(player_data: PlayerCreate):
         "is_active": True
     }
     
-    result = database.players.insert_one(new_player_dict)
+    result = await database.players.insert_one(new_player_dict)
     
     if result.inserted_id:
+        leaderboard.upsert(str(result.inserted_id), player_data.username)
+        player_cache.invalidate(username=player_data.username)
         return {
             "message": "Player created successfully", 
             "player_id": str(result.inserted_id),
@@ -43,13 +48,11 @@ async def create_player(player_data: PlayerCreate):
 
 @router.get("/player/{username}")
 async def get_player_by_username(username: str):
-    player_doc = database.players.find_one({"username": username})
+    player_doc = await player_cache.get_by_username(username)
     if not player_doc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Player not found"
         )
     
-    # Convert ObjectId to string for JSON serialization
-    player_doc["_id"] = str(player_doc["_id"])
-    return player_doc 
\ No newline at end of file
+    return MongoJSONResponse(player_doc) 
\ No newline at end of file
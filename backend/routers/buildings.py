@@ -0,0 +1,115 @@
+from fastapi import APIRouter, HTTPException, Query, status
+from typing import Optional
+
+from models.game import BuildingCreate
+from services.buildings import BuildingNotFound, PlacementConflict, PlacementRejected, building_index
+from services.game_manager import game_manager
+from services.game_objects import GameNotFound
+from services.player_cache import player_cache
+from services.serialization import MongoJSONResponse
+
+router = APIRouter()
+
+# Largest viewport one query may cover, in tiles per side
+MAX_VIEWPORT = 512
+
+def _game_not_found():
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Game not found"
+    )
+
+def _broadcastable(building: dict) -> dict:
+    # Room messages go through json.dumps, which knows neither ObjectId nor datetime
+    return {**building, "_id": str(building["_id"]), "created_at": building["created_at"].isoformat()}
+
+@router.get("/{game_id}/buildings")
+async def get_buildings(
+    game_id: str,
+    x: int = Query(0, ge=0),
+    y: int = Query(0, ge=0),
+    width: int = Query(64, ge=1, le=MAX_VIEWPORT),
+    height: int = Query(64, ge=1, le=MAX_VIEWPORT),
+):
+    """Buildings overlapping a tile rectangle, e.g. the client's viewport"""
+    try:
+        buildings = await building_index.query(game_id, x, y, width, height)
+    except GameNotFound:
+        raise _game_not_found()
+    return MongoJSONResponse({"game_id": game_id, "buildings": buildings})
+
+@router.get("/{game_id}/buildings/check")
+async def check_placement(
+    game_id: str,
+    x: int = Query(..., ge=0),
+    y: int = Query(..., ge=0),
+    width: int = Query(1, ge=1, le=8),
+    height: int = Query(1, ge=1, le=8),
+):
+    """Whether a footprint is free, without placing anything; for placement previews"""
+    try:
+        conflicts = await building_index.check(game_id, x, y, width, height)
+    except GameNotFound:
+        raise _game_not_found()
+    except PlacementRejected as e:
+        return {"free": False, "reason": str(e), "conflicts": []}
+    return {"free": not conflicts, "conflicts": conflicts}
+
+@router.post("/{game_id}/buildings", status_code=status.HTTP_201_CREATED)
+async def place_building(game_id: str, building: BuildingCreate, player_username: Optional[str] = None):
+    """Place a building if its footprint is on the map and free"""
+    player_id = None
+    if player_username is not None:
+        player_doc = await player_cache.get_by_username(player_username)
+        if not player_doc:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Player not found"
+            )
+        player_id = str(player_doc["_id"])
+
+    try:
+        placed = await building_index.place(game_id, building, player_id)
+    except GameNotFound:
+        raise _game_not_found()
+    except PlacementRejected as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except PlacementConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": str(e), "conflicts": e.conflicts}
+        )
+    except Exception as e:
+        print(f"Saving building in game {game_id} failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Could not save the building, try again"
+        )
+
+    await game_manager.broadcast_to_room(game_id, {
+        "type": "building_placed",
+        "data": {"game_id": game_id, "building": _broadcastable(placed)}
+    })
+    return MongoJSONResponse(placed, status_code=status.HTTP_201_CREATED)
+
+@router.delete("/{game_id}/buildings/{building_id}")
+async def remove_building(game_id: str, building_id: str):
+    """Remove a building and free its tiles"""
+    try:
+        await building_index.remove(game_id, building_id)
+    except GameNotFound:
+        raise _game_not_found()
+    except BuildingNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Building not found"
+        )
+
+    await game_manager.broadcast_to_room(game_id, {
+        "type": "building_removed",
+        "data": {"game_id": game_id, "building_id": building_id}
+    })
+    return {"message": "Building removed", "building_id": building_id}
@@ -1,10 +1,28 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from typing import List, Optional
 from bson import ObjectId
 from datetime import datetime
+from pymongo import ReturnDocument
 
-from models.game import GameState, GameCreate, GameUpdate
+from models.game import GameState, GameCreate, GameUpdate, GameObjectsPatch, GameStatus, GameType
 from database import database
+from services.game_manager import game_manager
+from services.game_objects import (
+    RESET_ENTRY, GameNotFound, VersionConflict, game_object_store, version_filter
+)
+from services.matchmaking import MATCH_PROJECTION, joinable_filter, join_update, matchmaker, new_game_document
+from services.player_cache import player_cache
+from services.pagination import keyset_filter, keyset_sort, next_cursor
+from services.serialization import MongoJSONResponse, etag_matches, etag_response, not_modified
+
+# List views leave out the heavy per-game fields; fetch a single game for those
+GAME_LIST_PROJECTION = {"game_objects": 0, "settings": 0, "object_changes": 0}
+# The change log is only served through /changes
+GAME_PROJECTION = {"object_changes": 0}
+
+def _game_etag(version: int) -> str:
+    # Every write to a game bumps its version
+    return f'W/"v{version}"'
 
 router = APIRouter()
 
@@ -12,57 +30,100 @@ router = APIRouter()
 async def create_game(game_data: GameCreate, player_username: str):
     """Create a new game session"""
     # Find player by username
-    player_doc = database.players.find_one({"username": player_username})
+    player_doc = await player_cache.get_by_username(player_username)
     if not player_doc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Player not found"
         )
     
-    new_game_dict = {
-        "game_type": game_data.game_type,
-        "status": "waiting",
-        "players": [str(player_doc["_id"])],
-        "game_objects": [],
-        "current_level": 1,
-        "score": 0,
-        "settings": game_data.settings,
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
-    }
+    new_game_dict = new_game_document(
+        game_data.game_type, str(player_doc["_id"]), game_data.settings, game_data.max_players
+    )
     
-    result = database.games.insert_one(new_game_dict)
+    result = await database.games.insert_one(new_game_dict)
     
     if result.inserted_id:
-        created_game = database.games.find_one({"_id": result.inserted_id})
-        created_game["_id"] = str(created_game["_id"])
-        return created_game
+        matchmaker.sync(new_game_dict)
+        # insert_one has filled in _id; no need to read the game back
+        new_game_dict.pop("object_changes")
+        return MongoJSONResponse(new_game_dict)
     else:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to create game"
         )
 
+@router.post("/quick-join")
+async def quick_join(game_data: GameCreate, player_username: str):
+    """Join the best waiting game of a type, or open one with these settings"""
+    player_doc = await player_cache.get_by_username(player_username)
+    if not player_doc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Player not found"
+        )
+    
+    game_doc, created = await matchmaker.quick_join(
+        str(player_doc["_id"]), game_data.game_type, game_data.settings, game_data.max_players
+    )
+    return {
+        "message": "Created game" if created else "Successfully joined game",
+        "game_id": str(game_doc["_id"]),
+        "created": created,
+        "players": len(game_doc["players"]),
+        "max_players": game_doc.get("max_players")
+    }
+
 @router.get("/", response_model=List[dict])
-async def get_games(skip: int = 0, limit: int = 100):
-    """Get list of games"""
-    games = list(database.games.find().skip(skip).limit(limit))
-    for game in games:
-        game["_id"] = str(game["_id"])
-    return games
+async def get_games(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    status_filter: Optional[GameStatus] = Query(None, alias="status"),
+    game_type: Optional[GameType] = None,
+):
+    """Get list of games, newest first; pass X-Next-Cursor back as `cursor` for the next page"""
+    query = {}
+    if status_filter:
+        query["status"] = status_filter.value
+    if game_type:
+        query["game_type"] = game_type.value
+    try:
+        query.update(keyset_filter("created_at", cursor, descending=True))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    games_cursor = database.games.find(query, GAME_LIST_PROJECTION).sort(keyset_sort("created_at", descending=True))
+    if skip and not cursor:
+        games_cursor = games_cursor.skip(skip)
+    games = await games_cursor.limit(limit).to_list(length=limit)
+    
+    page_cursor = next_cursor(games, "created_at", limit)
+    headers = {"X-Next-Cursor": page_cursor} if page_cursor else None
+    return MongoJSONResponse(games, headers=headers)
 
 @router.get("/{game_id}", response_model=dict)
-async def get_game(game_id: str):
+async def get_game(game_id: str, request: Request):
     """Get game by ID"""
     try:
-        game_doc = database.games.find_one({"_id": ObjectId(game_id)})
+        if request.headers.get("if-none-match"):
+            # Revalidation only needs the version, not the object list
+            current = await database.games.find_one({"_id": ObjectId(game_id)}, {"version": 1})
+            etag = _game_etag(current.get("version") or 0) if current else None
+            if etag and etag_matches(request, etag):
+                return not_modified(etag)
+        
+        game_doc = await database.games.find_one({"_id": ObjectId(game_id)}, GAME_PROJECTION)
         if not game_doc:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Game not found"
             )
-        game_doc["_id"] = str(game_doc["_id"])
-        return game_doc
+        return etag_response(request, game_doc, _game_etag(game_doc.get("version") or 0))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -73,33 +134,39 @@ async def get_game(game_id: str):
 async def update_game(game_id: str, game_update: GameUpdate):
     """Update game state"""
     try:
-        # Check if game exists
-        game_doc = database.games.find_one({"_id": ObjectId(game_id)})
-        if not game_doc:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Game not found"
-            )
-        
-        # Update game
         update_data = game_update.dict(exclude_unset=True)
-        if update_data:
-            update_data["updated_at"] = datetime.utcnow()
-            result = database.games.update_one(
-                {"_id": ObjectId(game_id)},
-                {"$set": update_data}
-            )
-            
-            if result.modified_count == 0:
+        base_version = update_data.pop("base_version", None)
+        update_data["updated_at"] = datetime.utcnow()
+        if "game_objects" in update_data:
+            # A wholesale replacement can't be replayed as a change; clients
+            # behind it get the full list from /changes
+            update_data["object_changes"] = [RESET_ENTRY]
+        
+        query = {"_id": ObjectId(game_id)}
+        if base_version is not None:
+            query.update(version_filter(base_version))
+        
+        # Update and read back in one round trip
+        updated_game = await database.games.find_one_and_update(
+            query,
+            {"$set": update_data, "$inc": {"version": 1}},
+            projection=GAME_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        if not updated_game:
+            current = await database.games.find_one({"_id": ObjectId(game_id)}, {"version": 1})
+            if not current:
                 raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="No changes made"
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Game not found"
                 )
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Game is at version {current.get('version') or 0}"
+            )
         
-        # Return updated game
-        updated_game = database.games.find_one({"_id": ObjectId(game_id)})
-        updated_game["_id"] = str(updated_game["_id"])
-        return updated_game
+        matchmaker.sync(updated_game)
+        return MongoJSONResponse(updated_game)
         
     except HTTPException:
         raise
@@ -114,51 +181,55 @@ async def join_game(game_id: str, player_username: str):
     """Join a game"""
     try:
         # Find player by username
-        player_doc = database.players.find_one({"username": player_username})
+        player_doc = await player_cache.get_by_username(player_username)
         if not player_doc:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Player not found"
             )
+        player_id = str(player_doc["_id"])
         
-        # Check if game exists
-        game_doc = database.games.find_one({"_id": ObjectId(game_id)})
-        if not game_doc:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Game not found"
-            )
-        
-        # Check if game is joinable
-        if game_doc.get("status") != "waiting":
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Game is not accepting new players"
-            )
-        
-        # Check if player is already in the game
-        if str(player_doc["_id"]) in game_doc.get("players", []):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Player already in game"
-            )
-        
-        # Add player to game
-        result = database.games.update_one(
-            {"_id": ObjectId(game_id)},
-            {
-                "$push": {"players": str(player_doc["_id"])},
-                "$set": {"updated_at": datetime.utcnow()}
-            }
+        # Status, membership and capacity are checked by the same atomic update
+        game_doc = await database.games.find_one_and_update(
+            joinable_filter(game_id, player_id),
+            join_update(player_id),
+            projection=MATCH_PROJECTION,
+            return_document=ReturnDocument.AFTER
         )
         
-        if result.modified_count == 0:
+        if not game_doc:
+            # Only the failure path pays for a second read, to explain why
+            game_doc = await database.games.find_one(
+                {"_id": ObjectId(game_id)},
+                MATCH_PROJECTION
+            )
+            if not game_doc:
+                matchmaker.remove(game_id)
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Game not found"
+                )
+            matchmaker.sync(game_doc)
+            if game_doc.get("status") != "waiting":
+                detail = "Game is not accepting new players"
+            elif player_id in game_doc.get("players", []):
+                detail = "Player already in game"
+            elif game_doc.get("max_players") is not None:
+                detail = "Game is full"
+            else:
+                detail = "Failed to join game"
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Failed to join game"
+                detail=detail
             )
         
-        return {"message": "Successfully joined game", "game_id": game_id}
+        matchmaker.sync(game_doc)
+        return {
+            "message": "Successfully joined game",
+            "game_id": game_id,
+            "players": len(game_doc["players"]),
+            "max_players": game_doc.get("max_players")
+        }
         
     except HTTPException:
         raise
@@ -172,39 +243,35 @@ async def join_game(game_id: str, player_username: str):
 async def start_game(game_id: str):
     """Start a game"""
     try:
-        # Check if game exists
-        game_doc = database.games.find_one({"_id": ObjectId(game_id)})
-        if not game_doc:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Game not found"
-            )
-        
-        # Check if game can be started
-        if game_doc.get("status") != "waiting":
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Game cannot be started"
-            )
-        
-        # Start the game
-        result = database.games.update_one(
-            {"_id": ObjectId(game_id)},
+        now = datetime.utcnow()
+        # Only a waiting game can move to active
+        game_doc = await database.games.find_one_and_update(
+            {"_id": ObjectId(game_id), "status": "waiting"},
             {
                 "$set": {
                     "status": "active",
-                    "started_at": datetime.utcnow(),
-                    "updated_at": datetime.utcnow()
-                }
-            }
+                    "started_at": now,
+                    "updated_at": now
+                },
+                "$inc": {"version": 1}
+            },
+            projection={"_id": 1},
+            return_document=ReturnDocument.AFTER
         )
         
-        if result.modified_count == 0:
+        if not game_doc:
+            exists = await database.games.find_one({"_id": ObjectId(game_id)}, {"_id": 1})
+            if not exists:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Game not found"
+                )
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Failed to start game"
+                detail="Game cannot be started"
             )
         
+        matchmaker.remove(game_id)
         return {"message": "Game started successfully", "game_id": game_id}
         
     except HTTPException:
@@ -213,4 +280,46 @@ async def start_game(game_id: str):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Failed to start game: {str(e)}"
-        ) 
\ No newline at end of file
+        )
+
+@router.patch("/{game_id}/objects")
+async def patch_game_objects(game_id: str, patch: GameObjectsPatch):
+    """Add, update or remove individual game objects by id"""
+    try:
+        change = await game_object_store.apply(game_id, patch)
+    except GameNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Game not found"
+        )
+    except VersionConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to patch game objects: {str(e)}"
+        )
+    
+    await game_manager.broadcast_game_objects_patch(game_id, change)
+    return {"game_id": game_id, **change}
+
+@router.get("/{game_id}/changes")
+async def get_game_changes(game_id: str, since: int = Query(0, ge=0)):
+    """Object changes after version `since`, or the full object list when
+    the change log no longer reaches back that far"""
+    try:
+        changes = await game_object_store.changes_since(game_id, since)
+    except GameNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Game not found"
+        )
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid game ID"
+        )
+    return MongoJSONResponse({"game_id": game_id, **changes})
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import List
+from fastapi import APIRouter, HTTPException, Request, status
+from typing import List, Optional
 from bson import ObjectId
 from datetime import datetime
 
 from models.game import Player, PlayerUpdate, PlayerCreate
 from database import database
+from services.leaderboard import leaderboard
+from services.player_cache import player_cache
+from services.pagination import keyset_filter, keyset_sort, next_cursor
+from services.serialization import MongoJSONResponse, etag_matches, etag_response, not_modified
+from services.write_behind import player_state_writer
 
 router = APIRouter()
 
@@ -12,7 +17,7 @@ router = APIRouter()
 async def create_player(player_data: PlayerCreate):
     """Create a new player"""
     # Check if username already exists
-    existing_player = database.players.find_one({"username": player_data.username})
+    existing_player = await player_cache.get_by_username(player_data.username)
     if existing_player:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -29,9 +34,11 @@ async def create_player(player_data: PlayerCreate):
         "is_active": True
     }
     
-    result = database.players.insert_one(new_player_dict)
+    result = await database.players.insert_one(new_player_dict)
     
     if result.inserted_id:
+        leaderboard.upsert(str(result.inserted_id), player_data.username)
+        player_cache.invalidate(username=player_data.username)
         # Return player data with ID
         return {
             "id": str(result.inserted_id),
@@ -46,31 +53,41 @@ async def create_player(player_data: PlayerCreate):
         )
 
 @router.get("/", response_model=List[dict])
-async def get_players(skip: int = 0, limit: int = 100):
-    """Get list of players"""
-    players = list(database.players.find().skip(skip).limit(limit))
-    # Convert ObjectId to string for JSON serialization
-    for player in players:
-        player["_id"] = str(player["_id"])
-    return players
+async def get_players(skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+    """Get list of players, oldest first; pass X-Next-Cursor back as `cursor` for the next page"""
+    try:
+        query = keyset_filter("created_at", cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    players_cursor = database.players.find(query).sort(keyset_sort("created_at"))
+    if skip and not cursor:
+        players_cursor = players_cursor.skip(skip)
+    players = await players_cursor.limit(limit).to_list(length=limit)
+    
+    page_cursor = next_cursor(players, "created_at", limit)
+    headers = {"X-Next-Cursor": page_cursor} if page_cursor else None
+    return MongoJSONResponse(players, headers=headers)
 
 @router.get("/{player_id}", response_model=dict)
-async def get_player(player_id: str):
+async def get_player(player_id: str, request: Request):
     """Get player by ID"""
     try:
-        player_doc = database.players.find_one({"_id": ObjectId(player_id)})
+        player_doc = await player_cache.get_by_id(player_id)
         if not player_doc:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Player not found"
             )
-        # Convert ObjectId to string and format for frontend
-        return {
-            "id": str(player_doc["_id"]),
+        # Format for frontend
+        return etag_response(request, {
+            "id": player_doc["_id"],
             "username": player_doc["username"],
             "score": player_doc.get("score", 0),
             "level": player_doc.get("level", 1)
-        }
+        })
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -82,7 +99,7 @@ async def update_player(player_id: str, player_update: PlayerUpdate):
     """Update player information"""
     try:
         # Check if player exists
-        player_doc = database.players.find_one({"_id": ObjectId(player_id)})
+        player_doc = await database.players.find_one({"_id": ObjectId(player_id)}, {"_id": 1})
         if not player_doc:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -92,11 +109,15 @@ async def update_player(player_id: str, player_update: PlayerUpdate):
         # Update player
         update_data = player_update.dict(exclude_unset=True)
         if update_data:
-            result = database.players.update_one(
+            # This write is newer than anything still buffered for these fields
+            await player_state_writer.discard(player_id, update_data.keys())
+            result = await database.players.update_one(
                 {"_id": ObjectId(player_id)},
                 {"$set": update_data}
             )
             
+            player_cache.invalidate(player_id)
+            
             if result.modified_count == 0:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -104,8 +125,15 @@ async def update_player(player_id: str, player_update: PlayerUpdate):
                 )
         
         # Return updated player
-        updated_player = database.players.find_one({"_id": ObjectId(player_id)})
+        updated_player = await database.players.find_one({"_id": ObjectId(player_id)})
         updated_player["_id"] = str(updated_player["_id"])
+        if "score" in update_data or "level" in update_data:
+            leaderboard.upsert(
+                updated_player["_id"],
+                updated_player["username"],
+                updated_player.get("score", 0),
+                updated_player.get("level", 1)
+            )
         return updated_player
         
     except HTTPException:
@@ -121,7 +149,7 @@ async def delete_player(player_id: str):
     """Delete player"""
     try:
         # Check if player exists
-        player_doc = database.players.find_one({"_id": ObjectId(player_id)})
+        player_doc = await database.players.find_one({"_id": ObjectId(player_id)}, {"_id": 1})
         if not player_doc:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -129,7 +157,7 @@ async def delete_player(player_id: str):
             )
         
         # Delete player
-        result = database.players.delete_one({"_id": ObjectId(player_id)})
+        result = await database.players.delete_one({"_id": ObjectId(player_id)})
         
         if result.deleted_count == 0:
             raise HTTPException(
@@ -137,6 +165,9 @@ async def delete_player(player_id: str):
                 detail="Failed to delete player"
             )
         
+        leaderboard.remove(player_id)
+        player_cache.invalidate(player_id)
+        player_state_writer.forget(player_id)
         return {"message": "Player deleted successfully"}
         
     except HTTPException:
@@ -148,15 +179,26 @@ async def delete_player(player_id: str):
         )
 
 @router.get("/leaderboard/top", response_model=List[dict])
-async def get_leaderboard(limit: int = 10):
+async def get_leaderboard(request: Request, limit: int = 10, offset: int = 0):
     """Get top players by score"""
-    players = list(
-        database.players
-        .find()
-        .sort("score", -1)
-        .limit(limit)
-    )
-    # Convert ObjectId to string for JSON serialization
-    for player in players:
-        player["_id"] = str(player["_id"])
-    return players 
\ No newline at end of file
+    # The ranking knows when it last changed, so a poll can be answered before slicing it
+    etag = leaderboard.etag()
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return etag_response(request, leaderboard.top(limit, offset), etag)
+
+@router.get("/leaderboard/rank/{player_id}", response_model=dict)
+async def get_player_rank(player_id: str, around: int = 2):
+    """Get a player's rank and the players ranked around them"""
+    rank = leaderboard.rank(player_id)
+    if rank is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Player not found"
+        )
+    return MongoJSONResponse({
+        "player_id": player_id,
+        "rank": rank,
+        "total": len(leaderboard),
+        "neighbours": leaderboard.around(player_id, max(around, 0))
+    }) 
\ No newline at end of file
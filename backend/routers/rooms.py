@@ -0,0 +1,45 @@
+from fastapi import APIRouter, HTTPException, Query, status
+from typing import List, Optional
+
+from services.game_manager import game_manager
+from services.serialization import MongoJSONResponse
+
+router = APIRouter()
+
+@router.get("/placement")
+async def get_room_placement():
+    """Admin view of which worker owns each active room"""
+    return game_manager.placement()
+
+@router.get("/{room_id}/worker")
+async def get_room_worker(room_id: str):
+    """Where clients should connect for a room"""
+    if game_manager.scheduler is None:
+        return {"room_id": room_id, "worker_id": None, "url": None}
+    return {
+        "room_id": room_id,
+        "worker_id": game_manager.scheduler.owner(room_id),
+        "url": game_manager.scheduler.owner_url(room_id)
+    }
+
+@router.get("/{room_id}/chat", response_model=List[dict])
+async def get_chat_history(
+    room_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+):
+    """Recent chat in a room, oldest first; pass X-Next-Cursor back as `cursor` for older messages"""
+    before = None
+    if cursor:
+        try:
+            before = int(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+    
+    messages = game_manager.chat_history.page(room_id, before, limit)
+    # A full page may have older messages behind it
+    headers = {"X-Next-Cursor": str(messages[0]["seq"])} if len(messages) == limit else None
+    return MongoJSONResponse(messages, headers=headers)
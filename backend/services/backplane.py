@@ -0,0 +1,342 @@
+import asyncio
+import json
+import sys
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+from urllib.parse import urlparse
+
+# Called with (room_id, message, exclude) for room broadcasts from other workers
+DeliverHandler = Callable[[str, Dict[str, Any], List[str]], Awaitable[None]]
+# Called whenever a worker appears, changes its metadata or goes away
+PeersChangedHandler = Callable[[], None]
+
+class Backplane:
+    """Cross-worker room broadcast and presence.
+
+    Each GameManager delivers to its own sockets and publishes through the
+    backplane so that workers holding other members of the room can do the
+    same. Presence tracks which players are in a room on other workers.
+    Subclasses only decide how frames travel between workers.
+    """
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex
+        self._handler: Optional[DeliverHandler] = None
+        # Our own presence, replayed to workers that (re)connect
+        self.local_members: Dict[str, Set[str]] = {}
+        # room_id -> player_id -> owning worker, for players on other workers
+        self.remote_members: Dict[str, Dict[str, str]] = {}
+        # What we tell other workers about ourselves (e.g. our public url),
+        # and what they told us
+        self.meta: Dict[str, Any] = {}
+        self.peers: Dict[str, Dict[str, Any]] = {}
+        self.on_peers_changed: Optional[PeersChangedHandler] = None
+
+    async def start(self, handler: DeliverHandler):
+        self._handler = handler
+
+    async def stop(self):
+        self._handler = None
+
+    async def _send(self, frame: Dict[str, Any]):
+        raise NotImplementedError
+
+    async def publish(self, room_id: str, message: Dict[str, Any], exclude: Optional[List[str]] = None):
+        await self._send({"op": "publish", "room": room_id, "message": message, "exclude": list(exclude or ())})
+
+    async def join(self, room_id: str, player_id: str):
+        self.local_members.setdefault(room_id, set()).add(player_id)
+        await self._send({"op": "join", "room": room_id, "player": player_id})
+
+    async def leave(self, room_id: str, player_id: str):
+        members = self.local_members.get(room_id)
+        if members is not None:
+            members.discard(player_id)
+            if not members:
+                del self.local_members[room_id]
+        await self._send({"op": "leave", "room": room_id, "player": player_id})
+
+    def _hello(self) -> Dict[str, Any]:
+        return {"op": "hello", "meta": self.meta}
+
+    def _set_peer(self, worker_id: str, meta: Dict[str, Any]):
+        if worker_id and self.peers.get(worker_id) != meta:
+            self.peers[worker_id] = meta
+            self._peers_changed()
+
+    def _peers_changed(self):
+        if self.on_peers_changed is not None:
+            self.on_peers_changed()
+
+    def remote_room_members(self, room_id: str) -> Set[str]:
+        return set(self.remote_members.get(room_id, ()))
+
+    async def _announce_presence(self):
+        for room_id, player_ids in self.local_members.items():
+            for player_id in player_ids:
+                await self._send({"op": "join", "room": room_id, "player": player_id})
+
+    async def _handle_frame(self, frame: Dict[str, Any]):
+        op = frame.get("op")
+        origin = frame.get("origin")
+        if origin == self.worker_id:
+            return
+        if op == "publish":
+            if self._handler is not None:
+                await self._handler(frame["room"], frame["message"], frame.get("exclude", []))
+        elif op == "join":
+            self.remote_members.setdefault(frame["room"], {})[frame["player"]] = origin
+        elif op == "leave":
+            members = self.remote_members.get(frame["room"])
+            if members is not None and members.get(frame["player"]) == origin:
+                del members[frame["player"]]
+                if not members:
+                    del self.remote_members[frame["room"]]
+        elif op == "hello":
+            # A worker (re)joined; tell it who we are and who is here
+            self._set_peer(origin, frame.get("meta", {}))
+            await self._send({"op": "peer", "meta": self.meta})
+            await self._announce_presence()
+        elif op == "peer":
+            self._set_peer(origin, frame.get("meta", {}))
+        elif op == "gone":
+            self._forget_worker(frame["worker"])
+
+    def _forget_worker(self, worker_id: str):
+        if self.peers.pop(worker_id, None) is not None:
+            self._peers_changed()
+        for room_id in list(self.remote_members):
+            members = self.remote_members[room_id]
+            for player_id in [p for p, w in members.items() if w == worker_id]:
+                del members[player_id]
+            if not members:
+                del self.remote_members[room_id]
+
+class FrameQueue:
+    """Outbound frames for one stream, written by their own task.
+
+    Senders only queue, so one slow peer never holds up frames for the
+    others. Whatever piled up is written together and drained once. A peer
+    more than max_size frames behind is not catching up: the stream is
+    closed, and the reconnect replays presence instead of it going stale.
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter, name: str, max_size: int = 10000):
+        self.writer = writer
+        self.name = name
+        self.max_size = max_size
+        self._queue: Deque[bytes] = deque()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._write_loop())
+        self.closed = False
+
+    def put(self, line: bytes):
+        if self.closed:
+            return
+        if len(self._queue) >= self.max_size:
+            print(f"Backplane: {self.name} is {len(self._queue)} frames behind, disconnecting")
+            self.close(abort=True)
+            return
+        self._queue.append(line)
+        self._wakeup.set()
+
+    async def _write_loop(self):
+        try:
+            while True:
+                if not self._queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                while self._queue:
+                    self.writer.write(self._queue.popleft())
+                await self.writer.drain()
+        except asyncio.CancelledError:
+            raise
+        except (ConnectionError, OSError) as e:
+            print(f"Backplane send to {self.name} failed: {e}")
+            self.close(abort=True)
+
+    def close(self, abort: bool = False):
+        """Stop writing; the reading side sees the stream end and cleans up.
+
+        A plain close still hands over what is queued; abort drops it,
+        since a peer that stopped reading would never let that finish.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+        if abort:
+            self.writer.transport.abort()
+        else:
+            self.writer.writelines(self._queue)
+            self.writer.close()
+        self._queue.clear()
+
+class InProcessHub:
+    """Shared bus for InProcessBackplane instances living in one process"""
+
+    def __init__(self):
+        self.backplanes: List["InProcessBackplane"] = []
+
+class InProcessBackplane(Backplane):
+    """Backplane between GameManagers in one process; with a single manager
+    it is a no-op and local delivery is all there is."""
+
+    def __init__(self, hub: Optional[InProcessHub] = None):
+        super().__init__()
+        self.hub = hub or InProcessHub()
+
+    async def start(self, handler: DeliverHandler):
+        await super().start(handler)
+        self.hub.backplanes.append(self)
+        await self._send(self._hello())
+
+    async def stop(self):
+        if self in self.hub.backplanes:
+            self.hub.backplanes.remove(self)
+            for other in self.hub.backplanes:
+                other._forget_worker(self.worker_id)
+        await super().stop()
+
+    async def _send(self, frame: Dict[str, Any]):
+        frame["origin"] = self.worker_id
+        for other in list(self.hub.backplanes):
+            if other is not self:
+                await other._handle_frame(frame)
+
+class BrokerBackplane(Backplane):
+    """Backplane over a local broker reached by Unix socket or TCP.
+
+    Frames are newline-delimited JSON. The broker relays every frame to all
+    other connected workers and announces when a worker goes away, so
+    presence for that worker's players can be dropped.
+    """
+
+    def __init__(self, url: str, reconnect_delay: float = 1.0, max_queue_size: int = 10000):
+        super().__init__()
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self.max_queue_size = max_queue_size
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._outbound: Optional[FrameQueue] = None
+        self._reader_task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: DeliverHandler):
+        await super().start(handler)
+        await self._open()
+        self._reader_task = asyncio.create_task(self._read_loop())
+
+    async def stop(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        if self._outbound is not None:
+            self._outbound.close()
+            self._outbound = None
+        await super().stop()
+
+    async def _open(self):
+        self._reader, writer = await open_broker_connection(self.url)
+        self._outbound = FrameQueue(writer, "broker", self.max_queue_size)
+        await self._send(self._hello())
+        await self._announce_presence()
+
+    async def _send(self, frame: Dict[str, Any]):
+        if self._outbound is None:
+            return
+        frame["origin"] = self.worker_id
+        self._outbound.put(json.dumps(frame).encode() + b"\n")
+
+    async def _read_loop(self):
+        while True:
+            try:
+                line = await self._reader.readline()
+                if not line:
+                    raise ConnectionError("Broker closed the connection")
+                await self._handle_frame(json.loads(line))
+            except asyncio.CancelledError:
+                raise
+            except (ConnectionError, OSError) as e:
+                print(f"Backplane connection lost: {e}")
+                self.remote_members.clear()
+                if self.peers:
+                    self.peers.clear()
+                    self._peers_changed()
+                await self._reconnect()
+            except Exception as e:
+                print(f"Error handling backplane frame: {e}")
+
+    async def _reconnect(self):
+        if self._outbound is not None:
+            self._outbound.close(abort=True)
+            self._outbound = None
+        while True:
+            await asyncio.sleep(self.reconnect_delay)
+            try:
+                await self._open()
+                return
+            except (ConnectionError, OSError):
+                continue
+
+async def open_broker_connection(url: str):
+    parsed = urlparse(url)
+    if parsed.scheme == "unix":
+        return await asyncio.open_unix_connection(parsed.path)
+    if parsed.scheme == "tcp":
+        return await asyncio.open_connection(parsed.hostname, parsed.port)
+    raise ValueError(f"Unsupported backplane url: {url}")
+
+async def run_broker(url: str, max_queue_size: int = 10000):
+    """Relay frames between workers; serves until cancelled"""
+    # Outbound queue per connected worker -> its worker id once it said hello
+    clients: Dict[FrameQueue, Optional[str]] = {}
+
+    def relay(sender: Optional[FrameQueue], line: bytes):
+        for outbound in clients:
+            if outbound is not sender:
+                outbound.put(line)
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        outbound = FrameQueue(writer, "worker", max_queue_size)
+        clients[outbound] = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if clients.get(outbound) is None:
+                    clients[outbound] = json.loads(line).get("origin")
+                    outbound.name = f"worker {clients[outbound]}"
+                relay(outbound, line)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            worker_id = clients.pop(outbound, None)
+            outbound.close()
+            if worker_id:
+                relay(None, json.dumps({"op": "gone", "worker": worker_id, "origin": None}).encode() + b"\n")
+
+    parsed = urlparse(url)
+    if parsed.scheme == "unix":
+        server = await asyncio.start_unix_server(handle, path=parsed.path)
+    elif parsed.scheme == "tcp":
+        server = await asyncio.start_server(handle, parsed.hostname, parsed.port)
+    else:
+        raise ValueError(f"Unsupported backplane url: {url}")
+    async with server:
+        await server.serve_forever()
+
+def create_backplane(url: Optional[str]) -> Optional[Backplane]:
+    """Backplane for BACKPLANE_URL: memory://, unix:///path or tcp://host:port"""
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return InProcessBackplane()
+    return BrokerBackplane(url)
+
+if __name__ == "__main__":
+    # python -m services.backplane unix:///tmp/vibeton-backplane.sock
+    asyncio.run(run_broker(sys.argv[1] if len(sys.argv) > 1 else "unix:///tmp/vibeton-backplane.sock"))
@@ -0,0 +1,442 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from database import database
+from models.game import BuildingCreate
+from services.game_objects import GameNotFound
+
+# Duplicate key: another building already holds one of the tiles
+DUPLICATE_KEY = 11000
+# Tiles are stored as y * TILE_STRIDE + x, so maps are at most this wide
+TILE_STRIDE = 1 << 16
+
+class PlacementRejected(ValueError):
+    """The footprint doesn't fit on the map"""
+
+class PlacementConflict(Exception):
+    def __init__(self, conflicts: List[str]):
+        super().__init__(f"Footprint overlaps {len(conflicts)} building(s)")
+        self.conflicts = conflicts
+
+class BuildingNotFound(LookupError):
+    pass
+
+class TileTaken(Exception):
+    """MongoDB refused a placement: a building saved elsewhere holds one of its tiles"""
+
+def tile_keys(x: int, y: int, width: int, height: int) -> List[int]:
+    return [ty * TILE_STRIDE + tx for ty in range(y, y + height) for tx in range(x, x + width)]
+
+def _map_size(settings: Any, default: int) -> Tuple[int, int]:
+    settings = settings if isinstance(settings, dict) else {}
+    size = []
+    for key in ("map_width", "map_height"):
+        value = settings.get(key)
+        size.append(min(value, TILE_STRIDE) if type(value) is int and value > 0 else default)
+    return size[0], size[1]
+
+class OccupancyGrid:
+    """Which building covers each tile of one game's city.
+
+    Tiles map straight to building ids, so a collision check is one dict
+    lookup per footprint tile however big the city gets. Buildings are also
+    bucketed by chunk_size x chunk_size chunk, so a viewport query only looks
+    at the chunks it overlaps instead of every building in the game.
+    """
+
+    def __init__(self, width: int, height: int, chunk_size: int = 16):
+        self.width = width
+        self.height = height
+        self.chunk_size = chunk_size
+        # (tx, ty) -> building id
+        self.cells: Dict[Tuple[int, int], str] = {}
+        # (cx, cy) -> ids of buildings touching that chunk
+        self.chunks: Dict[Tuple[int, int], Set[str]] = {}
+        # building id -> document
+        self.buildings: Dict[str, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self.buildings)
+
+    def __contains__(self, building_id: str) -> bool:
+        return building_id in self.buildings
+
+    @staticmethod
+    def _tiles(x: int, y: int, width: int, height: int) -> Iterator[Tuple[int, int]]:
+        for ty in range(y, y + height):
+            for tx in range(x, x + width):
+                yield tx, ty
+
+    def _chunk_keys(self, x: int, y: int, width: int, height: int) -> Iterator[Tuple[int, int]]:
+        size = self.chunk_size
+        for cy in range(y // size, (y + height - 1) // size + 1):
+            for cx in range(x // size, (x + width - 1) // size + 1):
+                yield cx, cy
+
+    def validate(self, x: int, y: int, width: int, height: int):
+        if width < 1 or height < 1:
+            raise PlacementRejected("Footprint must cover at least one tile")
+        if x < 0 or y < 0 or x + width > self.width or y + height > self.height:
+            raise PlacementRejected(f"Footprint is outside the {self.width}x{self.height} map")
+
+    def conflicts(self, x: int, y: int, width: int, height: int) -> List[str]:
+        """Ids of buildings already on any tile of the footprint"""
+        cells = self.cells
+        found = []
+        for tile in self._tiles(x, y, width, height):
+            building_id = cells.get(tile)
+            if building_id is not None and building_id not in found:
+                found.append(building_id)
+        return found
+
+    def add(self, building: Dict[str, Any]):
+        """Index a building; the caller has checked it fits"""
+        building_id = str(building["_id"])
+        x, y, width, height = building["x"], building["y"], building["width"], building["height"]
+        self.buildings[building_id] = building
+        for tile in self._tiles(x, y, width, height):
+            self.cells[tile] = building_id
+        for key in self._chunk_keys(x, y, width, height):
+            self.chunks.setdefault(key, set()).add(building_id)
+
+    def remove(self, building_id: str) -> Optional[Dict[str, Any]]:
+        building = self.buildings.pop(building_id, None)
+        if building is None:
+            return None
+        x, y, width, height = building["x"], building["y"], building["width"], building["height"]
+        for tile in self._tiles(x, y, width, height):
+            if self.cells.get(tile) == building_id:
+                del self.cells[tile]
+        for key in self._chunk_keys(x, y, width, height):
+            chunk = self.chunks.get(key)
+            if chunk is not None:
+                chunk.discard(building_id)
+                if not chunk:
+                    del self.chunks[key]
+        return building
+
+    def query(self, x: int, y: int, width: int, height: int) -> List[Dict[str, Any]]:
+        """Buildings overlapping the rectangle, top to bottom, left to right"""
+        right, bottom = x + width, y + height
+        seen: Set[str] = set()
+        found = []
+        for key in self._chunk_keys(x, y, width, height):
+            for building_id in self.chunks.get(key, ()):
+                if building_id in seen:
+                    continue
+                seen.add(building_id)
+                b = self.buildings[building_id]
+                if b["x"] < right and b["x"] + b["width"] > x and b["y"] < bottom and b["y"] + b["height"] > y:
+                    found.append(b)
+        found.sort(key=lambda b: (b["y"], b["x"]))
+        return found
+
+class BuildingWriter:
+    """Group commit for placements and removals.
+
+    A placement only counts once MongoDB has taken it: the unique index on
+    (game_id, tiles) is what stops two workers from building on the same
+    tile. Requests arriving within commit_delay of each other share one
+    insert_many, and removals queued meanwhile go out first as one
+    delete_many, so the tiles they free are free for those inserts.
+    Removing a building whose insert is still queued cancels both writes.
+    """
+
+    def __init__(self, get_collection: Callable[[], Any], commit_delay: float = 0.005):
+        self.get_collection = get_collection
+        self.commit_delay = commit_delay
+        # building id -> (document, future resolved once it is saved)
+        self._inserts: Dict[str, Tuple[Dict[str, Any], asyncio.Future]] = {}
+        self._deletes: Set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.written = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.max_flush_size = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._inserts) + len(self._deletes)
+
+    def _schedule(self):
+        if self._task is not None:
+            self._wakeup.set()
+        else:
+            # Not started (scripts, tests): write through
+            asyncio.create_task(self.flush())
+
+    def insert(self, building: Dict[str, Any]) -> asyncio.Future:
+        """Queue a building; the future fails with TileTaken if its tiles are held in the database"""
+        future = asyncio.get_running_loop().create_future()
+        self._inserts[str(building["_id"])] = (building, future)
+        self._schedule()
+        return future
+
+    def delete(self, building_id: str):
+        queued = self._inserts.pop(building_id, None)
+        if queued is not None:
+            # Never written, so there is nothing to delete; the placement
+            # itself went through and was undone before it reached the database
+            queued[1].set_result(None)
+            return
+        self._deletes.add(building_id)
+        self._schedule()
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            if not self._inserts and not self._deletes:
+                return 0
+            inserts, self._inserts = self._inserts, {}
+            deletes, self._deletes = self._deletes, set()
+            collection = self.get_collection()
+            self.flushes += 1
+            self.max_flush_size = max(self.max_flush_size, len(inserts) + len(deletes))
+            written = 0
+
+            if deletes:
+                try:
+                    await collection.delete_many({"_id": {"$in": [ObjectId(building_id) for building_id in deletes]}})
+                    written += len(deletes)
+                except Exception as e:
+                    self.failed_flushes += 1
+                    print(f"Building flush: deleting {len(deletes)} buildings failed: {e}")
+                    # Deletes are idempotent; try again with the next flush
+                    self._deletes |= deletes
+
+            if inserts:
+                ids = list(inserts)
+                failed: Dict[int, Exception] = {}
+                try:
+                    await collection.insert_many([inserts[building_id][0] for building_id in ids], ordered=False)
+                except BulkWriteError as e:
+                    for error in e.details.get("writeErrors", []):
+                        if error.get("code") == DUPLICATE_KEY:
+                            failed[error["index"]] = TileTaken()
+                        else:
+                            failed[error["index"]] = RuntimeError(error.get("errmsg", "Insert failed"))
+                except Exception as e:
+                    self.failed_flushes += 1
+                    print(f"Building flush: inserting {len(ids)} buildings failed: {e}")
+                    failed = {index: e for index in range(len(ids))}
+                for index, building_id in enumerate(ids):
+                    future = inserts[building_id][1]
+                    if index in failed:
+                        self.rejected += 1
+                        future.set_exception(failed[index])
+                    else:
+                        written += 1
+                        future.set_result(None)
+
+            self.written += written
+            return written
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            # Let requests that arrive together share the round trip
+            await asyncio.sleep(self.commit_delay)
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self.pending,
+            "written": self.written,
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "max_flush_size": self.max_flush_size,
+        }
+
+class BuildingIndex:
+    """Occupancy grids for the most recently used games' cities.
+
+    A game's grid is built from the buildings collection the first time it
+    is needed and again once it is older than max_age, so buildings placed
+    through other workers show up within that window; grids beyond
+    max_games are dropped least recently used first. The grid answers
+    checks and viewport queries and turns away most collisions without a
+    round trip, but the database has the final say on placements: when
+    another worker got to a tile first, the insert is refused, the
+    placement becomes a conflict and the stale grid is rebuilt.
+    """
+
+    def __init__(
+        self,
+        get_buildings: Callable[[], Any],
+        get_games: Callable[[], Any],
+        writer: BuildingWriter,
+        map_size: int = 256,
+        chunk_size: int = 16,
+        max_games: int = 1000,
+        max_age: float = 30.0,
+    ):
+        self.get_buildings = get_buildings
+        self.get_games = get_games
+        self.writer = writer
+        self.map_size = map_size
+        self.chunk_size = chunk_size
+        self.max_games = max_games
+        self.max_age = max_age
+        self._grids: "OrderedDict[str, OccupancyGrid]" = OrderedDict()
+        self._loaded_at: Dict[str, float] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+        self.loads = 0
+
+    def __len__(self) -> int:
+        return len(self._grids)
+
+    async def ensure_indexes(self):
+        """The unique tile index placements rely on; a no-op when it already exists"""
+        await self.get_buildings().create_index(
+            [("game_id", 1), ("tiles", 1)],
+            unique=True,
+            # Documents from before tiles were stored don't take part
+            partialFilterExpression={"tiles": {"$exists": True}}
+        )
+
+    async def grid(self, game_id: str) -> OccupancyGrid:
+        grid = self._grids.get(game_id)
+        if grid is not None and time.monotonic() - self._loaded_at[game_id] < self.max_age:
+            self._grids.move_to_end(game_id)
+            return grid
+        # Concurrent first requests for a game share one load
+        task = self._loading.get(game_id)
+        if task is None:
+            task = self._loading[game_id] = asyncio.create_task(self._load(game_id))
+            task.add_done_callback(lambda _: self._loading.pop(game_id, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, game_id: str) -> OccupancyGrid:
+        if not ObjectId.is_valid(game_id):
+            raise GameNotFound(game_id)
+        game = await self.get_games().find_one({"_id": ObjectId(game_id)}, {"settings": 1})
+        if game is None:
+            raise GameNotFound(game_id)
+        # Let the collection catch up with this worker's own queued writes
+        await self.writer.flush()
+        width, height = _map_size(game.get("settings"), self.map_size)
+        grid = OccupancyGrid(width, height, self.chunk_size)
+        async for building in self.get_buildings().find({"game_id": game_id}, {"tiles": 0}):
+            # Skip anything that no longer fits rather than refuse to load the city
+            try:
+                grid.validate(building["x"], building["y"], building["width"], building["height"])
+            except (KeyError, TypeError, PlacementRejected):
+                continue
+            if not grid.conflicts(building["x"], building["y"], building["width"], building["height"]):
+                grid.add(building)
+        self._grids[game_id] = grid
+        self._grids.move_to_end(game_id)
+        self._loaded_at[game_id] = time.monotonic()
+        while len(self._grids) > self.max_games:
+            evicted, _ = self._grids.popitem(last=False)
+            self._loaded_at.pop(evicted, None)
+        self.loads += 1
+        return grid
+
+    def forget(self, game_id: str):
+        self._grids.pop(game_id, None)
+        self._loaded_at.pop(game_id, None)
+
+    def _settled(self, game_id: str, grid: OccupancyGrid, building: Dict[str, Any], future: asyncio.Future):
+        """Undo a placement the database refused, whether or not anyone still awaits it"""
+        if future.cancelled() or future.exception() is None:
+            return
+        building_id = str(building["_id"])
+        if grid.buildings.get(building_id) is building:
+            grid.remove(building_id)
+        if isinstance(future.exception(), TileTaken) and self._grids.get(game_id) is grid:
+            # Someone else built there: this grid is behind the database
+            self.forget(game_id)
+
+    async def place(self, game_id: str, building: BuildingCreate, player_id: Optional[str] = None) -> Dict[str, Any]:
+        grid = await self.grid(game_id)
+        grid.validate(building.x, building.y, building.width, building.height)
+        conflicts = grid.conflicts(building.x, building.y, building.width, building.height)
+        if conflicts:
+            raise PlacementConflict(conflicts)
+        doc = {
+            "_id": ObjectId(),
+            "game_id": game_id,
+            **building.model_dump(),
+            "placed_by": player_id,
+            "created_at": datetime.utcnow()
+        }
+        tiles = tile_keys(building.x, building.y, building.width, building.height)
+        # Taken in the grid straight away, so placements on this worker
+        # racing for the same tiles are turned away before the database
+        grid.add(doc)
+        saved = self.writer.insert({**doc, "tiles": tiles})
+        saved.add_done_callback(lambda future: self._settled(game_id, grid, doc, future))
+        try:
+            await asyncio.shield(saved)
+        except TileTaken:
+            holders = await self.get_buildings().find(
+                {"game_id": game_id, "tiles": {"$in": tiles}}, {"_id": 1}
+            ).to_list(length=None)
+            raise PlacementConflict([str(holder["_id"]) for holder in holders])
+        return doc
+
+    async def remove(self, game_id: str, building_id: str) -> Dict[str, Any]:
+        grid = await self.grid(game_id)
+        building = grid.remove(building_id)
+        if building is None:
+            raise BuildingNotFound(building_id)
+        self.writer.delete(building_id)
+        return building
+
+    async def check(self, game_id: str, x: int, y: int, width: int, height: int) -> List[str]:
+        """Conflicting building ids, or PlacementRejected if the footprint is off the map"""
+        grid = await self.grid(game_id)
+        grid.validate(x, y, width, height)
+        return grid.conflicts(x, y, width, height)
+
+    async def query(self, game_id: str, x: int, y: int, width: int, height: int) -> List[Dict[str, Any]]:
+        grid = await self.grid(game_id)
+        return grid.query(x, y, width, height)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "games": len(self._grids),
+            "buildings": sum(len(grid) for grid in self._grids.values()),
+            "loads": self.loads,
+            "writer": self.writer.stats(),
+        }
+
+building_writer = BuildingWriter(
+    lambda: database.buildings,
+    commit_delay=float(os.getenv("BUILDING_COMMIT_DELAY", "0.005")),
+)
+
+# Global building index
+building_index = BuildingIndex(
+    lambda: database.buildings,
+    lambda: database.games,
+    building_writer,
+    map_size=int(os.getenv("CITY_MAP_SIZE", "256")),
+    max_games=int(os.getenv("BUILDING_INDEX_GAMES", "1000")),
+    max_age=float(os.getenv("BUILDING_INDEX_MAX_AGE", "30")),
+)
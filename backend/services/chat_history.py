@@ -0,0 +1,173 @@
+import asyncio
+import itertools
+import os
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from database import database
+
+class ChatArchiver:
+    """Batches chat messages into insert_many calls off the hot path.
+
+    Same shape as the player write-behind: messages pile up in memory and
+    go out every flush interval or once max_batch are waiting.
+    """
+
+    def __init__(self, get_collection: Callable[[], Any], flush_interval: float = 2.0, max_batch: int = 500):
+        self.get_collection = get_collection
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._buffer: List[Dict[str, Any]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.written = 0
+        self.failed_flushes = 0
+
+    def add(self, room_id: str, entry: Dict[str, Any]):
+        self._buffer.append({"room_id": room_id, **entry, "created_at": datetime.utcnow()})
+        if len(self._buffer) >= self.max_batch:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            if not self._buffer:
+                return 0
+            batch, self._buffer = self._buffer, []
+            try:
+                await self.get_collection().insert_many(batch, ordered=False)
+            except Exception as e:
+                self.failed_flushes += 1
+                print(f"Chat archive flush of {len(batch)} messages failed: {e}")
+                # Retry with the next flush, but don't let an unreachable
+                # database grow the backlog without bound
+                self._buffer = (batch + self._buffer)[-self.max_batch * 10:]
+                return 0
+            self.written += len(batch)
+            return len(batch)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+class ChatHistory:
+    """Recent chat per room in fixed-size ring buffers.
+
+    Each room keeps at most per_room messages; across all rooms at most
+    max_total, evicting the oldest messages of the least recently active
+    rooms first. Messages get a process-wide increasing seq used as the
+    paging cursor.
+    """
+
+    def __init__(
+        self,
+        per_room: int = 100,
+        max_total: int = 100000,
+        max_length: int = 500,
+        archive: Optional[ChatArchiver] = None,
+    ):
+        self.per_room = per_room
+        self.max_total = max_total
+        self.max_length = max_length
+        self.archive = archive
+        # room_id -> messages oldest first, rooms least recently active first
+        self._rooms: "OrderedDict[str, Deque[Dict[str, Any]]]" = OrderedDict()
+        self._seq = itertools.count(1)
+        self._total = 0
+
+    def __len__(self) -> int:
+        return self._total
+
+    def append(
+        self, room_id: str, player_id: str, message: str, timestamp: Any = None, archive: bool = True
+    ) -> Dict[str, Any]:
+        """Record a message; archive=False for copies of messages another worker archives"""
+        entry = {
+            "seq": next(self._seq),
+            "player_id": player_id,
+            "message": str(message)[:self.max_length],
+            # Client-supplied; only small scalars are worth keeping
+            "timestamp": timestamp if isinstance(timestamp, (int, float)) else str(timestamp)[:64] if timestamp else None
+        }
+        messages = self._rooms.get(room_id)
+        if messages is None:
+            messages = self._rooms[room_id] = deque(maxlen=self.per_room)
+        else:
+            self._rooms.move_to_end(room_id)
+        if len(messages) == self.per_room:
+            # The deque drops its oldest entry itself
+            self._total -= 1
+        messages.append(entry)
+        self._total += 1
+
+        while self._total > self.max_total:
+            oldest_room = next(iter(self._rooms))
+            oldest = self._rooms[oldest_room]
+            oldest.popleft()
+            self._total -= 1
+            if not oldest:
+                del self._rooms[oldest_room]
+
+        if archive and self.archive is not None:
+            self.archive.add(room_id, entry)
+        return entry
+
+    def recent(self, room_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Up to `limit` newest messages, oldest first"""
+        messages = self._rooms.get(room_id)
+        if not messages or limit <= 0:
+            return []
+        return list(itertools.islice(messages, max(len(messages) - limit, 0), None))
+
+    def page(self, room_id: str, before: Optional[int] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Up to `limit` messages older than seq `before` (newest when None), oldest first"""
+        messages = self._rooms.get(room_id)
+        if not messages or limit <= 0:
+            return []
+        end = len(messages)
+        if before is not None:
+            while end > 0 and messages[end - 1]["seq"] >= before:
+                end -= 1
+        return list(itertools.islice(messages, max(end - limit, 0), end))
+
+    def forget(self, room_id: str):
+        messages = self._rooms.pop(room_id, None)
+        if messages is not None:
+            self._total -= len(messages)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"rooms": len(self._rooms), "messages": self._total}
+
+# Persisting chat is opt-in; the in-memory history works without it
+chat_archiver = ChatArchiver(
+    lambda: database.chat_messages,
+    flush_interval=float(os.getenv("CHAT_ARCHIVE_INTERVAL", "2.0")),
+) if os.getenv("CHAT_ARCHIVE", "").lower() in ("1", "true", "yes") else None
+
+# Global chat history
+chat_history = ChatHistory(
+    per_room=int(os.getenv("CHAT_HISTORY_PER_ROOM", "100")),
+    max_total=int(os.getenv("CHAT_HISTORY_TOTAL", "100000")),
+    max_length=int(os.getenv("CHAT_MAX_LENGTH", "500")),
+    archive=chat_archiver,
+)
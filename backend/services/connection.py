@@ -0,0 +1,127 @@
+import asyncio
+from collections import deque
+from enum import Enum
+from typing import Callable, Deque, Dict, List, Optional
+from fastapi import WebSocket
+from services.rate_limit import InboundLimiter
+from services.wire import Payload
+
+class SlowConsumerPolicy(str, Enum):
+    DROP_OLDEST = "drop_oldest"
+    COALESCE = "coalesce"
+    DISCONNECT = "disconnect"
+
+class PlayerConnection:
+    """A WebSocket with its own bounded outbound queue and writer task.
+
+    Messages are queued already encoded, so a broadcast serializes once and
+    a slow socket only ever delays itself.
+    """
+
+    def __init__(
+        self,
+        player_id: str,
+        websocket: WebSocket,
+        max_queue_size: int = 256,
+        policy: SlowConsumerPolicy = SlowConsumerPolicy.DROP_OLDEST,
+        on_close: Optional[Callable[["PlayerConnection"], None]] = None,
+        binary: bool = False,
+        limiter: Optional[InboundLimiter] = None,
+    ):
+        self.player_id = player_id
+        self.websocket = websocket
+        # Negotiated at connect time: hot-path messages go out as binary frames
+        self.binary = binary
+        # Inbound rate limits; None lets everything through
+        self.limiter = limiter
+        self.max_queue_size = max_queue_size
+        self.policy = SlowConsumerPolicy(policy)
+        self.on_close = on_close
+        # Each entry is a one-item list so coalescing can swap the payload in place
+        self._queue: Deque[List[Payload]] = deque()
+        self._pending: Dict[str, List[Payload]] = {}
+        self._keys: Dict[int, str] = {}
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self.closed = False
+        self.dropped = 0
+        self.sent = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def start(self):
+        """Start the writer task"""
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, payload: Payload, coalesce_key: Optional[str] = None) -> bool:
+        """Queue an encoded message; returns False if the connection should be dropped"""
+        if self.closed:
+            return False
+
+        if coalesce_key is not None and self.policy == SlowConsumerPolicy.COALESCE:
+            entry = self._pending.get(coalesce_key)
+            if entry is not None:
+                # Newer state supersedes the one still waiting in the queue
+                entry[0] = payload
+                self.dropped += 1
+                return True
+
+        if len(self._queue) >= self.max_queue_size:
+            if self.policy == SlowConsumerPolicy.DISCONNECT:
+                self.closed = True
+                return False
+            self._forget(self._queue.popleft())
+            self.dropped += 1
+
+        entry = [payload]
+        self._queue.append(entry)
+        if coalesce_key is not None:
+            self._pending[coalesce_key] = entry
+            self._keys[id(entry)] = coalesce_key
+        self._wakeup.set()
+        return True
+
+    def _forget(self, entry: List[Payload]):
+        key = self._keys.pop(id(entry), None)
+        if key is not None and self._pending.get(key) is entry:
+            del self._pending[key]
+
+    async def _write_loop(self):
+        try:
+            while not self.closed:
+                if not self._queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                entry = self._queue.popleft()
+                self._forget(entry)
+                payload = entry[0]
+                if isinstance(payload, bytes):
+                    await self.websocket.send_bytes(payload)
+                else:
+                    await self.websocket.send_text(payload)
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error sending message to player {self.player_id}: {e}")
+            self.closed = True
+            if self.on_close:
+                self.on_close(self)
+
+    async def close(self, code: Optional[int] = None):
+        """Stop the writer and optionally close the socket"""
+        self.closed = True
+        self._queue.clear()
+        self._pending.clear()
+        self._keys.clear()
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        if code is not None:
+            try:
+                await self.websocket.close(code=code)
+            except Exception:
+                pass
@@ -0,0 +1,133 @@
+import math
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+from services.wire import FLOAT32_MAX
+
+Validator = Callable[[Any], Any]
+Handler = Callable[[str, Any], Awaitable[None]]
+
+class MessageRejected(ValueError):
+    """An inbound message failed validation; errors go back to the client"""
+
+    def __init__(self, code: str, message: str, errors: Optional[List[Dict[str, Any]]] = None):
+        super().__init__(message)
+        self.code = code
+        self.errors = errors or []
+
+    def reply(self, message_type: Any = None) -> Dict[str, Any]:
+        data = {"code": self.code, "message": str(self)}
+        if isinstance(message_type, str):
+            data["request_type"] = message_type[:64]
+        if self.errors:
+            data["errors"] = self.errors
+        return {"type": "error", "data": data}
+
+def _rejection(code: str, message: str, errors: Optional[List[Dict[str, Any]]] = None) -> MessageRejected:
+    """A rejection built once and raised as is: most bad input fails the same few ways"""
+    return MessageRejected(code, message, errors)
+
+def _reject(rejection: MessageRejected):
+    # Drop the traceback of the last raise, or it keeps growing
+    raise rejection.with_traceback(None) from None
+
+_NOT_AN_OBJECT = _rejection("invalid_message", "Messages must be objects with a type and data")
+_UNKNOWN_TYPE = _rejection("unknown_type", "Unknown message type")
+_DATA_NOT_AN_OBJECT = _rejection(
+    "invalid_payload", "Invalid message data", [{"loc": [], "msg": "Input should be an object"}]
+)
+_INVALID_POSITION = _rejection(
+    "invalid_payload", "Invalid message data", [{"loc": ["position"], "msg": "Input should be an object with x and y"}]
+)
+_INVALID_COORDINATE = {
+    axis: _rejection(
+        "invalid_payload", "Invalid message data",
+        [{"loc": ["position", axis], "msg": "Input should be a finite number within float32 range"}]
+    )
+    for axis in ("x", "y")
+}
+_INVALID_ACTION = _rejection(
+    "invalid_payload", "Invalid message data", [{"loc": ["action"], "msg": "Input should be a valid string"}]
+)
+
+def model_validator(model: Any) -> Validator:
+    """Validator backed by a TypeAdapter built once, at registration.
+
+    Payloads that aren't objects or lack a required field are turned away
+    before pydantic runs, with a prebuilt error.
+    """
+    validate = TypeAdapter(model).validate_python
+    missing = {
+        name: _rejection("invalid_payload", "Invalid message data", [{"loc": [name], "msg": "Field required"}])
+        for name, field in model.model_fields.items()
+        if field.is_required()
+    }
+
+    def validator(data: Any) -> Any:
+        if type(data) is not dict:
+            _reject(_DATA_NOT_AN_OBJECT)
+        for name, rejection in missing.items():
+            if name not in data:
+                _reject(rejection)
+        try:
+            return validate(data)
+        except ValidationError as e:
+            # Only location and reason; echoing the input back is wasted bandwidth
+            errors = [{"loc": list(error["loc"]), "msg": error["msg"]} for error in e.errors()[:10]]
+            raise MessageRejected("invalid_payload", "Invalid message data", errors) from None
+    return validator
+
+def _coordinate(position: Dict[str, Any], axis: str) -> float:
+    value = position.get(axis)
+    # bool is an int subclass but not a coordinate, hence the exact type check.
+    # Binary clients get positions as float32, so that is the usable range
+    if type(value) in (float, int) and math.isfinite(value) and -FLOAT32_MAX <= value <= FLOAT32_MAX:
+        return float(value)
+    _reject(_INVALID_COORDINATE[axis])
+
+def validate_move(data: Any) -> Tuple[float, float]:
+    """Hand-written check for the hottest message: {"position": {"x": n, "y": n}}"""
+    position = data.get("position") if type(data) is dict else None
+    if type(position) is not dict:
+        _reject(_INVALID_POSITION)
+    return _coordinate(position, "x"), _coordinate(position, "y")
+
+def validate_action(data: Any) -> Dict[str, Any]:
+    """Actions are free-form apart from a string "action"; the payload is passed on as is"""
+    if type(data) is not dict or not isinstance(data.get("action"), str):
+        _reject(_INVALID_ACTION)
+    return data
+
+class MessageHandler(NamedTuple):
+    validate: Validator
+    handle: Handler
+
+class MessageRegistry:
+    """Inbound WebSocket message types, each with its payload validator and handler"""
+
+    def __init__(self):
+        self._handlers: Dict[str, MessageHandler] = {}
+
+    def __contains__(self, message_type: Any) -> bool:
+        return message_type in self._handlers
+
+    def __iter__(self):
+        return iter(self._handlers)
+
+    def register(self, message_type: str, validate: Validator, handle: Handler):
+        self._handlers[message_type] = MessageHandler(validate, handle)
+
+    def get(self, message_type: Any) -> Optional[MessageHandler]:
+        # Unhashable types (a list sent as "type") are just unknown
+        return self._handlers.get(message_type) if isinstance(message_type, str) else None
+
+    def parse(self, message: Any) -> Tuple[str, MessageHandler, Any]:
+        """(type, handler, validated payload) or MessageRejected"""
+        if type(message) is not dict:
+            _reject(_NOT_AN_OBJECT)
+        message_type = message.get("type")
+        handler = self.get(message_type)
+        if handler is None:
+            _reject(_UNKNOWN_TYPE)
+        return message_type, handler, handler.validate(message.get("data", {}))
@@ -1,84 +1,385 @@
+import asyncio
 import json
-from typing import Dict, List
+import os
+import uuid
+from typing import Any, Dict, List, Optional, Set, Tuple
+from bson.errors import InvalidId
 from fastapi import WebSocket
-from models.game import WebSocketMessage, Position, GameObject
+from pymongo.errors import PyMongoError
+from models.game import ChatPayload, GameObject, GameObjectsPatchPayload, RoomPayload
+from services.backplane import Backplane
+from services.chat_history import ChatHistory, chat_history
+from services.connection import PlayerConnection, SlowConsumerPolicy
+from services.dispatch import MessageRegistry, MessageRejected, model_validator, validate_action, validate_move
+from services.game_objects import GameNotFound, PatchRejected, VersionConflict, game_object_store
+from services.player_state import PlayerStateStore
+from services.metrics import (
+    broadcast_fanout_duration, metrics, ws_messages_in, ws_messages_out,
+    ws_messages_throttled, ws_rate_limit_disconnects, ws_session_expirations, ws_session_resumes
+)
+from services.resume import RoomLog, UNSEQUENCED_TYPES
+from services.sharding import RoomScheduler
+from services.rate_limit import (
+    DEFAULT_MOVE_FLOOD_LIMIT, DEFAULT_RATE_LIMITS, DEFAULT_STRIKE_LIMIT, InboundLimiter, Limit, parse_limit, parse_rate_limits
+)
+from services.spatial import InterestGrid
+from services.write_behind import PlayerStateWriter, player_state_writer
+from services.wire import EncodedMessage, PROTOCOL_BINARY, PROTOCOL_JSON, WireProtocolError, decode_move
 
 class GameManager:
-    def __init__(self):
+    def __init__(
+        self,
+        send_queue_size: int = 256,
+        slow_consumer_policy: SlowConsumerPolicy = SlowConsumerPolicy.DROP_OLDEST,
+        tick_rate: float = 0,
+        interest_radius: float = 0,
+        state_writer: Optional[PlayerStateWriter] = None,
+        rate_limits: Optional[Dict[str, Limit]] = None,
+        strike_limit: Optional[Limit] = None,
+        move_flood_limit: Optional[Limit] = None,
+        chat_history: Optional[ChatHistory] = None,
+        chat_replay: int = 20,
+        resume_grace: float = 10.0,
+        resume_log_size: int = 256,
+    ):
         # Active WebSocket connections
-        self.connections: Dict[str, WebSocket] = {}
+        self.connections: Dict[str, PlayerConnection] = {}
+        # Outbound queue bound and what to do when a client falls behind
+        self.send_queue_size = send_queue_size
+        self.slow_consumer_policy = SlowConsumerPolicy(slow_consumer_policy)
         # Game rooms
-        self.rooms: Dict[str, List[str]] = {}
-        # Player positions
-        self.player_positions: Dict[str, Position] = {}
+        self.rooms: Dict[str, Set[str]] = {}
+        # Reverse index: rooms each player is in
+        self.player_rooms: Dict[str, Set[str]] = {}
+        # Player positions, in columnar arrays indexed by slot
+        self.player_state = PlayerStateStore()
+        # Server tick: rooms with a rate > 0 batch moves into one delta per tick
+        self.tick_rate = tick_rate
+        self.room_tick_rates: Dict[str, float] = {}
+        self._tick_tasks: Dict[str, asyncio.Task] = {}
+        self._room_ticks: Dict[str, int] = {}
+        # Players that moved in each ticking room since its last tick
+        self._moved_players: Dict[str, Set[str]] = {}
+        # Area of interest: with a radius > 0, movement and actions only reach
+        # players within that distance, tracked by a grid per room
+        self.interest_radius = interest_radius
+        self.interest_grids: Dict[str, InterestGrid] = {}
+        # Write-behind persistence of positions; None keeps them in memory only
+        self.state_writer = state_writer
+        # Cross-worker room broadcast and presence; None when running single-process
+        self.backplane: Optional[Backplane] = None
+        # Room placement across workers; None when every room lives here
+        self.scheduler: Optional[RoomScheduler] = None
+        # Inbound token buckets per connection and message type; None disables them
+        self.rate_limits = rate_limits
+        self.strike_limit = strike_limit or parse_limit(DEFAULT_STRIKE_LIMIT)
+        self.move_flood_limit = move_flood_limit or parse_limit(DEFAULT_MOVE_FLOOD_LIMIT)
+        # Recent chat per room; the last chat_replay messages go to each joiner
+        self.chat_history = chat_history if chat_history is not None else ChatHistory()
+        self.chat_replay = chat_replay
+        # Session resumption: a dropped player stays in its rooms for
+        # resume_grace seconds; room messages carry a per-room seq and the
+        # last resume_log_size of them are kept for replay
+        self.resume_grace = resume_grace
+        self.resume_log_size = resume_log_size
+        self.sessions: Dict[str, str] = {}
+        self._expiry_tasks: Dict[str, asyncio.Task] = {}
+        self.room_logs: Dict[str, RoomLog] = {}
+        # Last seq of rooms whose log was freed when they emptied, so a room
+        # id that comes back carries on from there instead of restarting at 1
+        self.room_seqs: Dict[str, int] = {}
+        # Inbound message types; validators are built once, here
+        self.handlers = MessageRegistry()
+        self.handlers.register("join_room", model_validator(RoomPayload), lambda player_id, payload: self.join_room(player_id, payload.room_id))
+        self.handlers.register("leave_room", model_validator(RoomPayload), lambda player_id, payload: self.leave_room(player_id, payload.room_id))
+        self.handlers.register("player_move", validate_move, lambda player_id, position: self.move_player(player_id, *position))
+        self.handlers.register("game_action", validate_action, self.handle_game_action)
+        self.handlers.register("chat_message", model_validator(ChatPayload), self.handle_chat_message)
+        self.handlers.register("patch_game_objects", model_validator(GameObjectsPatchPayload), self.handle_game_objects_patch)
         
-    async def connect(self, player_id: str, websocket: WebSocket):
-        """Connect a player to the game"""
+    async def connect(
+        self,
+        player_id: str,
+        websocket: WebSocket,
+        protocol: str = PROTOCOL_JSON,
+        resume: Optional[str] = None,
+        last_seqs: Optional[Dict[str, int]] = None,
+    ):
+        """Connect a player to the game, resuming its session if resume names it"""
         await websocket.accept()
-        self.connections[player_id] = websocket
         
-        # Send welcome message
-        welcome_message = WebSocketMessage(
-            type="connected",
-            data={"player_id": player_id, "message": "Connected to game server"}
+        # A reconnect replaces the previous socket for the same player
+        previous = self.connections.pop(player_id, None)
+        if previous is not None:
+            await previous.close(code=1000)
+        expiry = self._expiry_tasks.pop(player_id, None)
+        if expiry is not None:
+            expiry.cancel()
+        
+        session_id = self.sessions.get(player_id)
+        resumed = session_id is not None and resume == session_id
+        if session_id is not None and not resumed:
+            # The client starts over, so the old session ends here: out of
+            # its rooms, with the others told it left
+            await self._end_session(player_id)
+            session_id = None
+            
+        connection = PlayerConnection(
+            player_id,
+            websocket,
+            max_queue_size=self.send_queue_size,
+            policy=self.slow_consumer_policy,
+            on_close=self._on_connection_closed,
+            binary=protocol == PROTOCOL_BINARY,
+            limiter=InboundLimiter(self.rate_limits, self.strike_limit, self.move_flood_limit) if self.rate_limits else None,
         )
-        await self.send_to_player(player_id, welcome_message.dict())
+        self.connections[player_id] = connection
+        connection.start()
         
-    async def disconnect(self, player_id: str):
-        """Disconnect a player from the game"""
-        if player_id in self.connections:
+        if session_id is None:
+            session_id = self.sessions[player_id] = uuid.uuid4().hex
+        
+        # Nothing below awaits, so the welcome and any replay are queued
+        # ahead of live room traffic
+        rooms = self._resume_rooms(player_id, last_seqs or {}) if resumed else {}
+        welcome = {
+            "type": "connected",
+            "data": {
+                "player_id": player_id,
+                "message": "Connected to game server",
+                "protocol": PROTOCOL_BINARY if connection.binary else PROTOCOL_JSON,
+                "session_id": session_id,
+                "resumed": resumed
+            }
+        }
+        if resumed:
+            welcome["data"]["rooms"] = {room_id: mode for room_id, (mode, _) in rooms.items()}
+        await self.send_to_player(player_id, welcome)
+        for room_id, (mode, messages) in rooms.items():
+            ws_session_resumes.inc(mode)
+            for message in messages:
+                self._enqueue(player_id, message)
+        
+    def _resume_rooms(self, player_id: str, last_seqs: Dict[str, int]) -> Dict[str, Tuple[str, List[EncodedMessage]]]:
+        """Per room: "replay" and the missed messages, or "snapshot" and a room_snapshot"""
+        rooms = {}
+        for room_id in self.get_player_rooms(player_id):
+            log = self.room_logs.get(room_id)
+            seq = last_seqs.get(room_id)
+            missed = log.since(seq, player_id) if log is not None and seq is not None else None
+            if missed is not None:
+                rooms[room_id] = ("replay", missed)
+            else:
+                rooms[room_id] = ("snapshot", [EncodedMessage(self.room_snapshot(room_id))])
+        return rooms
+        
+    def room_snapshot(self, room_id: str) -> Dict[str, Any]:
+        """Everything a client needs to rebuild a room when replay can't cover the gap"""
+        positions = {}
+        for player_id in self.rooms.get(room_id, ()):
+            position = self.player_state.get(player_id)
+            if position is not None:
+                positions[player_id] = {"x": position[0], "y": position[1]}
+        log = self.room_logs.get(room_id)
+        return {
+            "type": "room_snapshot",
+            "data": {
+                "room_id": room_id,
+                "seq": log.seq if log is not None else self.room_seqs.get(room_id, 0),
+                "members": sorted(self.get_room_members(room_id)),
+                "positions": positions,
+                "chat_history": self.chat_history.recent(room_id, self.chat_replay)
+            }
+        }
+        
+    async def disconnect(self, player_id: str, websocket: Optional[WebSocket] = None, resumable: bool = True):
+        """Disconnect a player; with a grace window it keeps its rooms until the window runs out"""
+        connection = self.connections.get(player_id)
+        if websocket is not None and (connection is None or connection.websocket is not websocket):
+            # A newer socket has already taken over this player
+            return
+        if connection is not None:
             del self.connections[player_id]
+            await connection.close()
+        
+        if resumable and self.resume_grace > 0 and self.player_rooms.get(player_id):
+            if player_id not in self._expiry_tasks:
+                self._expiry_tasks[player_id] = asyncio.create_task(self._expire_session(player_id))
+            return
+        await self._end_session(player_id)
         
+    async def _expire_session(self, player_id: str):
+        await asyncio.sleep(self.resume_grace)
+        if self._expiry_tasks.get(player_id) is not asyncio.current_task():
+            return
+        del self._expiry_tasks[player_id]
+        if player_id not in self.connections:
+            ws_session_expirations.inc()
+            await self._end_session(player_id)
+        
+    async def _end_session(self, player_id: str):
+        """Take a gone player out of its rooms and tell the others"""
+        self.sessions.pop(player_id, None)
         # Remove from rooms
-        for room_id, players in self.rooms.items():
-            if player_id in players:
-                players.remove(player_id)
-                # Notify other players in the room
-                await self.broadcast_to_room(room_id, {
-                    "type": "player_disconnected",
-                    "data": {"player_id": player_id}
-                })
+        for room_id in self.player_rooms.pop(player_id, set()):
+            self._remove_from_room(player_id, room_id)
+            if self.backplane is not None:
+                await self.backplane.leave(room_id, player_id)
+            # Notify other players in the room
+            await self.broadcast_to_room(room_id, {
+                "type": "player_disconnected",
+                "data": {"player_id": player_id}
+            })
         
         # Remove player position
-        if player_id in self.player_positions:
-            del self.player_positions[player_id]
+        self.player_state.remove(player_id)
             
+    async def handle_text(self, player_id: str, text: str):
+        """Handle an inbound text frame; anything that isn't JSON gets an error reply"""
+        try:
+            message = json.loads(text)
+        except ValueError:
+            ws_messages_in.inc("unknown")
+            await self.send_to_player(player_id, MessageRejected("invalid_message", "Messages must be JSON").reply())
+            return
+        await self.handle_message(player_id, message)
+
     async def handle_message(self, player_id: str, message: dict):
         """Handle incoming WebSocket message from a player"""
-        message_type = message.get("type")
-        data = message.get("data", {})
-        
-        if message_type == "join_room":
-            await self.join_room(player_id, data.get("room_id"))
-        elif message_type == "leave_room":
-            await self.leave_room(player_id, data.get("room_id"))
-        elif message_type == "player_move":
-            await self.handle_player_move(player_id, data)
-        elif message_type == "game_action":
-            await self.handle_game_action(player_id, data)
-        elif message_type == "chat_message":
-            await self.handle_chat_message(player_id, data)
+        message_type = message.get("type") if type(message) is dict else None
+        if not isinstance(message_type, str):
+            message_type = None
+        ws_messages_in.inc(message_type if message_type in self.handlers else "unknown")
+        if not self._admit(player_id, message_type):
+            if message_type == "player_move":
+                try:
+                    self._defer_move(player_id, *validate_move(message.get("data")))
+                except MessageRejected:
+                    pass
+            return
+        
+        try:
+            message_type, handler, payload = self.handlers.parse(message)
+        except MessageRejected as e:
+            await self.send_to_player(player_id, e.reply(message_type))
+            return
+        try:
+            await handler.handle(player_id, payload)
+        except Exception as e:
+            # A bug in one handler shouldn't cost the player their connection
+            print(f"Error handling {message_type} from {player_id}: {e!r}")
+            await self.send_to_player(
+                player_id, MessageRejected("internal_error", "Failed to handle message").reply(message_type)
+            )
+            
+    async def handle_binary(self, player_id: str, data: bytes):
+        """Handle an inbound binary frame; only player_move has a binary layout"""
+        ws_messages_in.inc("player_move")
+        admitted = self._admit(player_id, "player_move")
+        try:
+            x, y = decode_move(data)
+        except WireProtocolError as e:
+            if admitted:
+                await self.send_to_player(player_id, MessageRejected("invalid_payload", str(e)).reply("player_move"))
+            return
+        if admitted:
+            await self.move_player(player_id, x, y)
         else:
-            print(f"Unknown message type: {message_type}")
+            self._defer_move(player_id, x, y)
+        
+    def _admit(self, player_id: str, message_type: str) -> bool:
+        """Take a token for an inbound message; False if it is over its limit"""
+        connection = self.connections.get(player_id)
+        if connection is None:
+            return True
+        if connection.closed:
+            # Already on its way out; nothing it sends matters now
+            return False
+        if connection.limiter is None:
+            return True
+        limiter = connection.limiter
+        if limiter.allow(message_type):
+            if message_type == "player_move":
+                # Anything held back is older than this move
+                limiter.pending_move = None
+            return True
+        
+        label = message_type if message_type in self.handlers else "unknown"
+        ws_messages_throttled.inc(label, "coalesced" if message_type == "player_move" else "dropped")
+        if message_type == "player_move" and not limiter.move_flooding():
+            # Coalescing already caps what a fast client costs us
+            return False
+        if not limiter.strike() and not connection.closed:
+            print(f"Disconnecting {player_id} for exceeding inbound rate limits")
+            ws_rate_limit_disconnects.inc()
+            connection.closed = True
+            asyncio.create_task(self._drop_connection(connection, code=1008))
+        return False
+        
+    def _defer_move(self, player_id: str, x: float, y: float):
+        """Keep only the latest over-limit move and apply it when the bucket refills"""
+        connection = self.connections.get(player_id)
+        if connection is None or connection.closed or connection.limiter is None:
+            return
+        limiter = connection.limiter
+        limiter.pending_move = (x, y)
+        if limiter.deferred_move is None:
+            limiter.deferred_move = asyncio.create_task(self._apply_deferred_move(connection))
             
+    async def _apply_deferred_move(self, connection: PlayerConnection):
+        limiter = connection.limiter
+        try:
+            while limiter.pending_move is not None:
+                await asyncio.sleep(limiter.wait_time("player_move"))
+                if connection.closed or self.connections.get(connection.player_id) is not connection:
+                    return
+                if limiter.pending_move is not None and limiter.allow("player_move"):
+                    x, y = limiter.pending_move
+                    limiter.pending_move = None
+                    await self.move_player(connection.player_id, x, y)
+        finally:
+            limiter.deferred_move = None
+        
     async def join_room(self, player_id: str, room_id: str):
         """Add player to a game room"""
-        if room_id not in self.rooms:
-            self.rooms[room_id] = []
-            
-        if player_id not in self.rooms[room_id]:
-            self.rooms[room_id].append(player_id)
+        redirect = self.redirect_for(room_id)
+        if redirect is not None:
+            await self.send_to_player(player_id, redirect)
+            return
+        self.rooms.setdefault(room_id, set()).add(player_id)
+        self.player_rooms.setdefault(player_id, set()).add(room_id)
+        self._ensure_room_tick(room_id)
+        if self.backplane is not None:
+            await self.backplane.join(room_id, player_id)
             
-        # Notify all players in the room
+        # Notify the others; the joiner's own copy also carries recent chat
         await self.broadcast_to_room(room_id, {
             "type": "player_joined",
             "data": {"player_id": player_id, "room_id": room_id}
+        }, exclude=[player_id])
+        await self.send_to_player(player_id, {
+            "type": "player_joined",
+            "data": {
+                "player_id": player_id,
+                "room_id": room_id,
+                "chat_history": self.chat_history.recent(room_id, self.chat_replay)
+            }
         })
         
+        position = self.player_state.get(player_id)
+        grid = self._interest_grid(room_id)
+        if grid is not None and position is not None:
+            await self._update_interest(room_id, grid, player_id, *position)
+        
     async def leave_room(self, player_id: str, room_id: str):
         """Remove player from a game room"""
-        if room_id in self.rooms and player_id in self.rooms[room_id]:
-            self.rooms[room_id].remove(player_id)
+        if room_id in self.player_rooms.get(player_id, ()):
+            self.player_rooms[player_id].discard(room_id)
+            if not self.player_rooms[player_id]:
+                del self.player_rooms[player_id]
+            self._remove_from_room(player_id, room_id)
+            if self.backplane is not None:
+                await self.backplane.leave(room_id, player_id)
             
             # Notify other players in the room
             await self.broadcast_to_room(room_id, {
@@ -86,76 +387,481 @@ class GameManager:
                 "data": {"player_id": player_id, "room_id": room_id}
             })
             
-    async def handle_player_move(self, player_id: str, data: dict):
-        """Handle player movement"""
-        position_data = data.get("position", {})
-        new_position = Position(x=position_data.get("x", 0), y=position_data.get("y", 0))
+    async def move_player(self, player_id: str, x: float, y: float):
+        """Record a player's position and fan the movement out"""
+        x, y = float(x), float(y)
         
-        self.player_positions[player_id] = new_position
+        self.player_state.set(player_id, x, y)
+        if self.state_writer is not None:
+            self.state_writer.mark(player_id, position={"x": x, "y": y})
         
-        # Find which room the player is in and broadcast the movement
-        for room_id, players in self.rooms.items():
-            if player_id in players:
-                await self.broadcast_to_room(room_id, {
-                    "type": "player_moved",
-                    "data": {
-                        "player_id": player_id,
-                        "position": new_position.dict()
-                    }
-                }, exclude=[player_id])
+        # Broadcast the movement to every room the player is in, or leave it
+        # for the next tick in rooms that batch their moves
+        for room_id in self.get_player_rooms(player_id):
+            if room_id in self._tick_tasks:
+                self._moved_players.setdefault(room_id, set()).add(player_id)
+                continue
+            message = {
+                "type": "player_moved",
+                "data": {
+                    "player_id": player_id,
+                    "position": {"x": x, "y": y}
+                }
+            }
+            coalesce_key = f"player_moved:{player_id}"
+            grid = self._interest_grid(room_id)
+            if grid is None:
+                await self.broadcast_to_room(room_id, message, exclude=[player_id], coalesce_key=coalesce_key)
+                continue
+            neighbors, entered = await self._update_interest(room_id, grid, player_id, x, y)
+            # Players that just came into view already got the position
+            await self.send_to_players(neighbors - entered, message, coalesce_key=coalesce_key)
                 
     async def handle_game_action(self, player_id: str, data: dict):
         """Handle game-specific actions"""
         action_type = data.get("action")
         
-        # Find which room the player is in
-        for room_id, players in self.rooms.items():
-            if player_id in players:
-                await self.broadcast_to_room(room_id, {
-                    "type": "game_action",
-                    "data": {
-                        "player_id": player_id,
-                        "action": action_type,
-                        "details": data
-                    }
-                })
+        for room_id in self.get_player_rooms(player_id):
+            message = {
+                "type": "game_action",
+                "data": {
+                    "player_id": player_id,
+                    "action": action_type,
+                    "details": data
+                }
+            }
+            grid = self.interest_grids.get(room_id)
+            if grid is not None and player_id in grid:
+                await self.send_to_players(grid.neighbors(player_id) | {player_id}, message)
+            else:
+                await self.broadcast_to_room(room_id, message)
                 
-    async def handle_chat_message(self, player_id: str, data: dict):
+    async def handle_chat_message(self, player_id: str, chat: ChatPayload):
         """Handle chat messages"""
-        message = data.get("message", "")
-        room_id = data.get("room_id")
+        room_id = chat.room_id
         
-        if room_id and room_id in self.rooms and player_id in self.rooms[room_id]:
+        if room_id in self.player_rooms.get(player_id, ()):
+            entry = self.chat_history.append(room_id, player_id, chat.message, chat.timestamp)
             await self.broadcast_to_room(room_id, {
                 "type": "chat_message",
+                "data": {"room_id": room_id, **entry}
+            })
+            
+    async def handle_game_objects_patch(self, player_id: str, patch: GameObjectsPatchPayload):
+        """Apply an object patch to the game whose room the player is in"""
+        game_id = patch.game_id
+        if game_id not in self.player_rooms.get(player_id, ()):
+            await self.send_to_player(player_id, {
+                "type": "error",
+                "data": {"code": "not_in_room", "message": "Join the game's room before editing it", "game_id": game_id}
+            })
+            return
+        
+        error = None
+        try:
+            change = await game_object_store.apply(game_id, patch)
+        except VersionConflict as e:
+            error = {"code": "version_conflict", "message": str(e), "game_id": game_id, "version": e.current_version}
+        except (GameNotFound, InvalidId):
+            error = {"code": "not_found", "message": "Game not found", "game_id": game_id}
+        except PatchRejected as e:
+            error = {"code": "patch_rejected", "message": str(e), "game_id": game_id}
+        except PyMongoError as e:
+            print(f"Error patching objects of game {game_id}: {e}")
+            error = {"code": "patch_failed", "message": "Failed to patch game objects", "game_id": game_id}
+        if error is not None:
+            await self.send_to_player(player_id, {"type": "error", "data": error})
+            return
+        await self.broadcast_game_objects_patch(game_id, change, player_id)
+        
+    async def broadcast_game_objects_patch(self, game_id: str, change: dict, player_id: Optional[str] = None):
+        """Tell everyone in the game's room about an applied patch"""
+        await self.broadcast_to_room(game_id, {
+            "type": "game_objects_patched",
+            "data": {"game_id": game_id, "player_id": player_id, **change}
+        })
+            
+    def get_player_rooms(self, player_id: str) -> List[str]:
+        """Get the rooms a player is currently in"""
+        return list(self.player_rooms.get(player_id, ()))
+        
+    def get_room_members(self, room_id: str) -> Set[str]:
+        """Players in a room across all workers"""
+        members = set(self.rooms.get(room_id, ()))
+        if self.backplane is not None:
+            members |= self.backplane.remote_room_members(room_id)
+        return members
+        
+    async def attach_backplane(self, backplane: Backplane, scheduler: Optional[RoomScheduler] = None):
+        """Start sharing room broadcasts and presence with other workers.
+
+        With a scheduler, rooms are sharded: each room lives on the worker the
+        ring assigns it to and players are redirected there.
+        """
+        self.backplane = backplane
+        if scheduler is not None:
+            self.scheduler = scheduler
+            backplane.meta["url"] = scheduler.url
+            backplane.on_peers_changed = self._on_peers_changed
+        await backplane.start(self._deliver_remote)
+        for room_id, players in self.rooms.items():
+            for player_id in players:
+                await backplane.join(room_id, player_id)
+        
+    def redirect_for(self, room_id: str) -> Optional[dict]:
+        """Message pointing a client at the worker that owns room_id, if not us"""
+        if self.scheduler is None or self.scheduler.is_local(room_id):
+            return None
+        return {
+            "type": "redirect",
+            "data": {
+                "room_id": room_id,
+                "worker_id": self.scheduler.owner(room_id),
+                "url": self.scheduler.owner_url(room_id)
+            }
+        }
+        
+    def _on_peers_changed(self):
+        """Mirror backplane membership into the ring and move rooms that changed owner"""
+        changed = False
+        peers = {worker_id: meta.get("url") for worker_id, meta in self.backplane.peers.items() if meta.get("url")}
+        for worker_id in set(self.scheduler.workers) - set(peers) - {self.scheduler.worker_id}:
+            changed |= self.scheduler.remove_worker(worker_id)
+        for worker_id, url in peers.items():
+            changed |= self.scheduler.add_worker(worker_id, url)
+        if changed:
+            asyncio.create_task(self.rebalance())
+            
+    async def rebalance(self):
+        """Send the members of rooms we no longer own to the new owner"""
+        for room_id in list(self.rooms):
+            redirect = self.redirect_for(room_id)
+            if redirect is None:
+                continue
+            print(f"Room {room_id} moved to worker {redirect['data']['worker_id']}")
+            for player_id in list(self.rooms.get(room_id, ())):
+                await self.send_to_player(player_id, redirect)
+                await self.leave_room(player_id, room_id)
+            self.chat_history.forget(room_id)
+        
+    def placement(self) -> dict:
+        """Room -> worker for every room with members here or elsewhere"""
+        room_ids = set(self.rooms)
+        if self.backplane is not None:
+            room_ids |= set(self.backplane.remote_members)
+        if self.scheduler is None:
+            return {"sharded": False, "rooms": {room_id: None for room_id in sorted(room_ids)}}
+        return {
+            "sharded": True,
+            "worker_id": self.scheduler.worker_id,
+            "workers": dict(self.scheduler.workers),
+            "rooms": self.scheduler.placement(room_ids)
+        }
+        
+    async def _deliver_remote(self, room_id: str, message: dict, exclude: List[str]):
+        """Room broadcast from another worker; chat also goes into our history"""
+        if message.get("type") == "chat_message" and self.rooms.get(room_id):
+            # Only for rooms with members here, who may ask for the history;
+            # the worker the message came from is the one that archives it
+            data = message.get("data", {})
+            self.chat_history.append(
+                room_id, data.get("player_id"), data.get("message", ""), data.get("timestamp"), archive=False
+            )
+        await self._broadcast_local(room_id, message, exclude)
+        
+    def _remove_from_room(self, player_id: str, room_id: str):
+        """Drop a player from a room's member set, deleting the room once empty"""
+        players = self.rooms.get(room_id)
+        if players is None:
+            return
+        players.discard(player_id)
+        moved = self._moved_players.get(room_id)
+        if moved:
+            moved.discard(player_id)
+        grid = self.interest_grids.get(room_id)
+        if grid is not None:
+            grid.remove(player_id)
+        if not players:
+            del self.rooms[room_id]
+            log = self.room_logs.pop(room_id, None)
+            if log is not None:
+                self.room_seqs[room_id] = log.seq
+            self.interest_grids.pop(room_id, None)
+            self._stop_room_tick(room_id)
+            
+    def _interest_grid(self, room_id: str) -> Optional[InterestGrid]:
+        """The room's interest grid, or None when interest management is off"""
+        if self.interest_radius <= 0:
+            return None
+        grid = self.interest_grids.get(room_id)
+        if grid is None:
+            grid = self.interest_grids[room_id] = InterestGrid(self.interest_radius)
+        return grid
+        
+    async def _update_interest(
+        self, room_id: str, grid: InterestGrid, player_id: str, x: float, y: float
+    ) -> Tuple[Set[str], Set[str]]:
+        """Move a player in the grid and send enter/leave view events both ways"""
+        neighbors, entered, left = grid.update(player_id, x, y)
+        if entered:
+            await self.send_to_players(entered, {
+                "type": "player_entered_view",
+                "data": {"room_id": room_id, "player_id": player_id, "position": {"x": x, "y": y}}
+            })
+            for other_id in entered:
+                other = self.player_state.get(other_id)
+                if other is None:
+                    continue
+                await self.send_to_player(player_id, {
+                    "type": "player_entered_view",
+                    "data": {"room_id": room_id, "player_id": other_id, "position": {"x": other[0], "y": other[1]}}
+                })
+        if left:
+            await self.send_to_players(left, {
+                "type": "player_left_view",
+                "data": {"room_id": room_id, "player_id": player_id}
+            })
+            for other_id in left:
+                await self.send_to_player(player_id, {
+                    "type": "player_left_view",
+                    "data": {"room_id": room_id, "player_id": other_id}
+                })
+        return neighbors, entered
+            
+    def get_room_tick_rate(self, room_id: str) -> float:
+        """Ticks per second for a room; 0 means moves are broadcast immediately"""
+        return self.room_tick_rates.get(room_id, self.tick_rate)
+        
+    def set_room_tick_rate(self, room_id: str, rate: Optional[float]):
+        """Override the tick rate of one room; None restores the default"""
+        if rate is None:
+            self.room_tick_rates.pop(room_id, None)
+        else:
+            self.room_tick_rates[room_id] = rate
+        if self.get_room_tick_rate(room_id) <= 0:
+            self._stop_room_tick(room_id)
+        else:
+            self._ensure_room_tick(room_id)
+            
+    def _ensure_room_tick(self, room_id: str):
+        if room_id in self._tick_tasks or room_id not in self.rooms:
+            return
+        if self.get_room_tick_rate(room_id) > 0:
+            self._tick_tasks[room_id] = asyncio.create_task(self._run_room_tick(room_id))
+            
+    def _stop_room_tick(self, room_id: str):
+        task = self._tick_tasks.pop(room_id, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        self._moved_players.pop(room_id, None)
+        self._room_ticks.pop(room_id, None)
+        
+    async def _run_room_tick(self, room_id: str):
+        """Fixed-rate loop; sleeps are scheduled against the clock so ticks don't drift"""
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while room_id in self.rooms:
+            rate = self.get_room_tick_rate(room_id)
+            if rate <= 0:
+                break
+            next_tick += 1 / rate
+            await asyncio.sleep(max(0, next_tick - loop.time()))
+            try:
+                await self.flush_room_tick(room_id)
+            except Exception as e:
+                print(f"Error running tick for room {room_id}: {e}")
+                
+    async def flush_room_tick(self, room_id: str):
+        """Send one players_moved delta with the latest position of everyone who moved"""
+        moved = self._moved_players.pop(room_id, None)
+        if not moved:
+            return
+        positions = {
+            player_id: {"x": position[0], "y": position[1]}
+            for player_id in moved
+            if (position := self.player_state.get(player_id)) is not None
+        }
+        if not positions:
+            return
+        tick = self._room_ticks.get(room_id, 0) + 1
+        self._room_ticks[room_id] = tick
+        
+        grid = self._interest_grid(room_id)
+        if grid is None:
+            await self.broadcast_to_room(room_id, {
+                "type": "players_moved",
                 "data": {
-                    "player_id": player_id,
-                    "message": message,
-                    "timestamp": data.get("timestamp")
+                    "room_id": room_id,
+                    "tick": tick,
+                    "positions": positions
+                }
+            })
+            return
+            
+        # With interest management each recipient gets only the movers it can see
+        visible_moves: Dict[str, Dict[str, dict]] = {}
+        for player_id, position in positions.items():
+            neighbors, entered = await self._update_interest(room_id, grid, player_id, position["x"], position["y"])
+            for other_id in neighbors - entered:
+                visible_moves.setdefault(other_id, {})[player_id] = position
+        for recipient_id, recipient_positions in visible_moves.items():
+            await self.send_to_player(recipient_id, {
+                "type": "players_moved",
+                "data": {
+                    "room_id": room_id,
+                    "tick": tick,
+                    "positions": recipient_positions
                 }
             })
             
-    async def send_to_player(self, player_id: str, message: dict):
+    def _on_connection_closed(self, connection: PlayerConnection):
+        """Writer task hit a send error; clean the player up in the background"""
+        asyncio.create_task(self.disconnect(connection.player_id, connection.websocket))
+        
+    def _enqueue(self, player_id: str, message: EncodedMessage, coalesce_key: Optional[str] = None) -> bool:
+        """Hand an encoded message to a player's writer, applying the slow-consumer policy"""
+        connection = self.connections.get(player_id)
+        if connection is None or connection.closed:
+            return False
+        if not connection.enqueue(message.payload(connection.binary), coalesce_key):
+            print(f"Disconnecting slow consumer {player_id}")
+            asyncio.create_task(self._drop_connection(connection, code=1013))
+            return False
+        return True
+            
+    async def _drop_connection(self, connection: PlayerConnection, code: int):
+        await connection.close(code=code)
+        # A client kicked for abuse (1008) doesn't get to resume
+        await self.disconnect(connection.player_id, connection.websocket, resumable=code != 1008)
+        
+    async def send_to_player(self, player_id: str, message: dict, coalesce_key: Optional[str] = None):
         """Send message to a specific player"""
         if player_id in self.connections:
-            try:
-                await self.connections[player_id].send_text(json.dumps(message))
-            except Exception as e:
-                print(f"Error sending message to player {player_id}: {e}")
-                await self.disconnect(player_id)
+            if self._enqueue(player_id, EncodedMessage(message), coalesce_key):
+                ws_messages_out.inc(message.get("type"))
                 
-    async def broadcast_to_room(self, room_id: str, message: dict, exclude: List[str] = None):
+    async def send_to_players(self, player_ids, message: dict, coalesce_key: Optional[str] = None):
+        """Send one message to several players, encoding it once"""
+        if not player_ids:
+            return
+        with broadcast_fanout_duration.time("players"):
+            encoded = EncodedMessage(message)
+            queued = 0
+            for player_id in player_ids:
+                queued += self._enqueue(player_id, encoded, coalesce_key)
+        ws_messages_out.inc(message.get("type"), amount=queued)
+            
+    async def broadcast_to_room(
+        self,
+        room_id: str,
+        message: dict,
+        exclude: List[str] = None,
+        coalesce_key: Optional[str] = None,
+    ):
         """Broadcast message to all players in a room"""
+        # Other workers are told even when nobody is left here, e.g. on disconnect.
+        # A sharded room normally has every member on its owner, so only
+        # publish when presence says someone is elsewhere.
+        if self.backplane is not None and (self.scheduler is None or self.backplane.remote_members.get(room_id)):
+            await self.backplane.publish(room_id, message, exclude)
+        await self._broadcast_local(room_id, message, exclude, coalesce_key)
+        
+    async def _broadcast_local(
+        self,
+        room_id: str,
+        message: dict,
+        exclude: List[str] = None,
+        coalesce_key: Optional[str] = None,
+    ):
+        """Deliver a room message to the members connected to this worker"""
         if room_id not in self.rooms:
             return
             
-        exclude = exclude or []
-        
-        for player_id in self.rooms[room_id]:
-            if player_id not in exclude:
-                await self.send_to_player(player_id, message)
+        exclude = set(exclude) if exclude else ()
+        with broadcast_fanout_duration.time("room"):
+            log = None
+            if message.get("type") not in UNSEQUENCED_TYPES:
+                log = self.room_logs.get(room_id)
+                if log is None:
+                    log = self.room_logs[room_id] = RoomLog(self.resume_log_size, self.room_seqs.pop(room_id, 0))
+                seq = log.next_seq()
+                message = {**message, "room_id": room_id, "seq": seq}
+            # Encode once per wire format; every recipient's writer shares the payload
+            encoded = EncodedMessage(message)
+            if log is not None:
+                log.append(seq, encoded, exclude)
+            queued = 0
+            for player_id in list(self.rooms[room_id]):
+                if player_id not in exclude:
+                    queued += self._enqueue(player_id, encoded, coalesce_key)
+        ws_messages_out.inc(message.get("type"), amount=queued)
                 
     async def broadcast_to_all(self, message: dict):
         """Broadcast message to all connected players"""
-        for player_id in self.connections:
-            await self.send_to_player(player_id, message) 
\ No newline at end of file
+        with broadcast_fanout_duration.time("all"):
+            encoded = EncodedMessage(message)
+            queued = 0
+            for player_id in list(self.connections):
+                queued += self._enqueue(player_id, encoded)
+        ws_messages_out.inc(message.get("type"), amount=queued)
+            
+    async def shutdown(self):
+        """Close every connection and stop their writer and tick tasks"""
+        if self.backplane is not None:
+            await self.backplane.stop()
+            self.backplane = None
+        for room_id in list(self._tick_tasks):
+            self._stop_room_tick(room_id)
+        for task in self._expiry_tasks.values():
+            task.cancel()
+        self._expiry_tasks.clear()
+        self.sessions.clear()
+        self.room_logs.clear()
+        self.room_seqs.clear()
+        for connection in list(self.connections.values()):
+            await connection.close(code=1001)
+        self.connections.clear()
+        self.rooms.clear()
+        self.player_rooms.clear()
+        self.player_state.clear()
+        self.interest_grids.clear()
+        
+# Global game manager instance
+game_manager = GameManager(
+    send_queue_size=int(os.getenv("WS_SEND_QUEUE_SIZE", "256")),
+    slow_consumer_policy=os.getenv("WS_SLOW_CONSUMER_POLICY", SlowConsumerPolicy.DROP_OLDEST.value),
+    tick_rate=float(os.getenv("WS_TICK_RATE", "0")),
+    interest_radius=float(os.getenv("WS_INTEREST_RADIUS", "0")),
+    state_writer=player_state_writer,
+    chat_history=chat_history,
+    chat_replay=int(os.getenv("CHAT_REPLAY", "20")),
+    resume_grace=float(os.getenv("WS_RESUME_GRACE", "10")),
+    resume_log_size=int(os.getenv("WS_RESUME_LOG_SIZE", "256")),
+    rate_limits=parse_rate_limits(os.getenv("WS_RATE_LIMITS", DEFAULT_RATE_LIMITS)),
+    strike_limit=parse_limit(os.getenv("WS_RATE_LIMIT_STRIKES", DEFAULT_STRIKE_LIMIT)),
+    move_flood_limit=parse_limit(os.getenv("WS_MOVE_FLOOD_LIMIT", DEFAULT_MOVE_FLOOD_LIMIT)),
+)
+ 
+
+# Read from live state at scrape time
+metrics.gauge(
+    "vibeton_ws_connections",
+    "Open WebSocket connections on this worker",
+    (),
+    lambda: [((), len(game_manager.connections))]
+)
+metrics.gauge(
+    "vibeton_room_members",
+    "Players in each room connected to this worker",
+    ("room",),
+    lambda: [((room_id,), len(members)) for room_id, members in list(game_manager.rooms.items())]
+)
+metrics.gauge(
+    "vibeton_ws_send_queue_depth",
+    "Outbound messages waiting in per-connection queues, summed and worst case",
+    ("stat",),
+    lambda: [
+        (("total",), sum(c.queue_depth for c in list(game_manager.connections.values()))),
+        (("max",), max((c.queue_depth for c in list(game_manager.connections.values())), default=0))
+    ]
+)
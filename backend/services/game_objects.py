@@ -0,0 +1,160 @@
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from bson import ObjectId
+
+from database import database
+from models.game import GameObjectsPatch
+
+# Marks a change log emptied by a whole-list replacement of game_objects
+RESET_ENTRY = {"op": "reset"}
+
+class GameNotFound(LookupError):
+    pass
+
+class VersionConflict(Exception):
+    def __init__(self, current_version: int):
+        super().__init__(f"Game is at version {current_version}")
+        self.current_version = current_version
+
+class PatchRejected(ValueError):
+    pass
+
+def version_filter(version: int) -> Dict[str, Any]:
+    """Match a game at `version`; games created before versioning count as 0"""
+    return {"version": {"$in": [0, None]}} if version == 0 else {"version": version}
+
+class GameObjectStore:
+    """Per-object edits to a game's game_objects list.
+
+    Every patch bumps the game's version and appends an entry to a bounded
+    change log kept on the game document itself, in the same atomic update,
+    so clients can ask for everything after the version they last saw.
+    """
+
+    def __init__(self, get_collection: Callable[[], Any], change_log_size: int = 256, max_retries: int = 5):
+        self.get_collection = get_collection
+        self.change_log_size = change_log_size
+        self.max_retries = max_retries
+
+    async def apply(self, game_id: str, patch: GameObjectsPatch) -> Dict[str, Any]:
+        """Apply a patch and return its change log entry.
+
+        With base_version the patch only applies to that version, otherwise
+        the current version is read and the write retried if another patch
+        lands in between.
+        """
+        kinds = [kind for kind in ("add", "update", "remove") if getattr(patch, kind)]
+        if len(kinds) != 1:
+            raise PatchRejected("A patch must add, update or remove objects, one kind per patch")
+        kind = kinds[0]
+        ids = patch.remove if kind == "remove" else [obj.id for obj in getattr(patch, kind)]
+        if len(set(ids)) != len(ids):
+            raise PatchRejected("Each object may appear only once per patch")
+
+        games = self.get_collection()
+        oid = ObjectId(game_id)
+        version = patch.base_version
+        for _ in range(self.max_retries):
+            positions: Dict[str, int] = {}
+            if version is None or kind == "update":
+                # Updates address objects by position, so they need the ids too
+                projection = {"version": 1, "game_objects.id": 1} if kind == "update" else {"version": 1}
+                current = await games.find_one({"_id": oid}, projection)
+                if current is None:
+                    raise GameNotFound(game_id)
+                if version is None:
+                    version = current.get("version") or 0
+                positions = {obj.get("id"): index for index, obj in enumerate(current.get("game_objects", []))}
+            change = self._change(kind, patch, version + 1)
+            query, update = self._update(kind, patch, ids, change, positions)
+            result = await games.update_one({"_id": oid, **version_filter(version), **query}, update)
+            if result.matched_count:
+                return change
+
+            current = await games.find_one({"_id": oid}, {"version": 1, "game_objects.id": 1})
+            if current is None:
+                raise GameNotFound(game_id)
+            current_version = current.get("version") or 0
+            if current_version == version:
+                existing = {obj.get("id") for obj in current.get("game_objects", [])}
+                if kind == "add":
+                    raise PatchRejected(f"Objects already exist: {sorted(set(ids) & existing)}")
+                raise PatchRejected(f"Unknown objects: {sorted(set(ids) - existing)}")
+            if patch.base_version is not None:
+                raise VersionConflict(current_version)
+            version = None
+        raise VersionConflict(current_version)
+
+    @staticmethod
+    def _change(kind: str, patch: GameObjectsPatch, version: int) -> Dict[str, Any]:
+        if kind == "remove":
+            return {"version": version, "op": kind, "ids": list(patch.remove)}
+        objects = [obj.model_dump(exclude_none=True) for obj in getattr(patch, kind)]
+        return {"version": version, "op": kind, "objects": objects}
+
+    def _update(self, kind: str, patch: GameObjectsPatch, ids: List[str], change: Dict[str, Any], positions: Dict[str, int]):
+        """Filter and update document for one patch; updates use the objects' positions in the list"""
+        query: Dict[str, Any] = {}
+        update: Dict[str, Any] = {
+            "$set": {"version": change["version"], "updated_at": datetime.utcnow()},
+            "$push": {"object_changes": {"$each": [change], "$slice": -self.change_log_size}}
+        }
+        if kind == "add":
+            query["game_objects.id"] = {"$nin": ids}
+            update["$push"]["game_objects"] = {"$each": change["objects"]}
+        elif kind == "remove":
+            query["game_objects.id"] = {"$all": ids}
+            update["$pull"] = {"game_objects": {"id": {"$in": ids}}}
+        else:
+            # Unknown ids fail this and end up reported as unknown
+            query["game_objects.id"] = {"$all": ids}
+            for fields in change["objects"]:
+                if len(fields) == 1:
+                    raise PatchRejected(f"Update for object {fields['id']} changes nothing")
+                position = positions.get(fields["id"])
+                if position is None:
+                    continue
+                # The object must still be where it was read; the version
+                # filter already makes sure nothing has moved it since
+                query[f"game_objects.{position}.id"] = fields["id"]
+                for field, value in fields.items():
+                    if field != "id":
+                        update["$set"][f"game_objects.{position}.{field}"] = value
+        return query, update
+
+    async def changes_since(self, game_id: str, since: int) -> Dict[str, Any]:
+        """Change log entries after `since`, or the full object list if the
+        log no longer reaches back that far"""
+        games = self.get_collection()
+        oid = ObjectId(game_id)
+        doc = await games.find_one({"_id": oid}, {"version": 1, "object_changes": 1})
+        if doc is None:
+            raise GameNotFound(game_id)
+        version = doc.get("version") or 0
+        changes = self._entries_after(doc.get("object_changes", []), since, version)
+        if changes is not None:
+            return {"version": version, "full": False, "changes": changes}
+
+        doc = await games.find_one({"_id": oid}, {"version": 1, "game_objects": 1})
+        if doc is None:
+            raise GameNotFound(game_id)
+        return {"version": doc.get("version") or 0, "full": True, "game_objects": doc.get("game_objects", [])}
+
+    def _entries_after(self, log: List[Dict[str, Any]], since: int, version: int) -> Optional[List[Dict[str, Any]]]:
+        if since > version:
+            return None
+        entries = [entry for entry in log if "version" in entry]
+        # Entries before the first one kept were trimmed or replaced wholesale
+        incomplete = len(log) >= self.change_log_size or (log and "version" not in log[0])
+        if incomplete:
+            floor = entries[0]["version"] - 1 if entries else version
+            if since < floor:
+                return None
+        return [entry for entry in entries if entry["version"] > since]
+
+# Global game object store
+game_object_store = GameObjectStore(
+    lambda: database.games,
+    change_log_size=int(os.getenv("GAME_CHANGE_LOG_SIZE", "256")),
+)
@@ -0,0 +1,233 @@
+import math
+import random
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+Key = Tuple[int, str]
+
+class _Infinity:
+    """Tail sentinel key, greater than every real key"""
+
+    def __lt__(self, other):
+        return False
+
+    def __eq__(self, other):
+        return other is self
+
+    __hash__ = object.__hash__
+
+_INF = _Infinity()
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, levels: int):
+        self.key = key
+        self.next: List[Optional["_Node"]] = [None] * levels
+        # Number of level-0 hops covered by each forward link
+        self.width: List[int] = [0] * levels
+
+class IndexableSkipList:
+    """Sorted set with O(log n) insert, remove, rank and positional access."""
+
+    def __init__(self, max_levels: int = 24):
+        self.max_levels = max_levels
+        self.size = 0
+        self._tail = _Node(_INF, 0)
+        self._head = _Node(None, max_levels)
+        self._reset()
+
+    def _reset(self):
+        self._head.next = [self._tail] * self.max_levels
+        self._head.width = [1] * self.max_levels
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _random_level(self) -> int:
+        return min(self.max_levels, 1 - int(math.log(1.0 - random.random(), 2.0)))
+
+    def build(self, sorted_keys: List[Key]):
+        """Replace the contents with already-sorted unique keys in O(n)"""
+        self._reset()
+        last = [self._head] * self.max_levels
+        last_pos = [0] * self.max_levels
+        for pos, key in enumerate(sorted_keys, 1):
+            levels = self._random_level()
+            node = _Node(key, levels)
+            for level in range(levels):
+                last[level].next[level] = node
+                last[level].width[level] = pos - last_pos[level]
+                last[level] = node
+                last_pos[level] = pos
+        end = len(sorted_keys) + 1
+        for level in range(self.max_levels):
+            last[level].next[level] = self._tail
+            last[level].width[level] = end - last_pos[level]
+        self.size = len(sorted_keys)
+
+    def insert(self, key: Key):
+        chain = [self._head] * self.max_levels
+        steps_at_level = [0] * self.max_levels
+        node = self._head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level].key < key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        levels = self._random_level()
+        new_node = _Node(key, levels)
+        steps = 0
+        for level in range(levels):
+            prev = chain[level]
+            new_node.next[level] = prev.next[level]
+            prev.next[level] = new_node
+            new_node.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, self.max_levels):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key: Key):
+        chain = [self._head] * self.max_levels
+        node = self._head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+        target = chain[0].next[0]
+        if target.key != key:
+            raise KeyError(key)
+
+        levels = len(target.next)
+        for level in range(levels):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(levels, self.max_levels):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def index(self, key: Key) -> int:
+        """Zero-based position of key"""
+        node = self._head
+        position = 0
+        for level in reversed(range(self.max_levels)):
+            while node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        if node.next[0].key != key:
+            raise KeyError(key)
+        return position
+
+    def iter_from(self, index: int) -> Iterator[Key]:
+        """Keys in order starting at a zero-based position"""
+        if index < 0 or index >= self.size:
+            return
+        node = self._head
+        remaining = index + 1
+        for level in reversed(range(self.max_levels)):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        while node is not self._tail:
+            yield node.key
+            node = node.next[0]
+
+class Leaderboard:
+    """Players ranked by score (ties broken by id), kept in memory.
+
+    Loaded once from Mongo at startup and updated incrementally by the player
+    routes, so top-N, rank and neighbour lookups never touch the database.
+    """
+
+    def __init__(self):
+        self._ranking = IndexableSkipList()
+        # player_id -> summary served with each entry
+        self._players: Dict[str, Dict[str, Any]] = {}
+        self.loaded = False
+        # Bumped on every change; with the epoch it identifies this process's ranking
+        self.version = 0
+        self._epoch = uuid.uuid4().hex[:8]
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def etag(self) -> str:
+        """Validator for responses derived from the current ranking"""
+        return f'W/"{self._epoch}-{self.version}"'
+
+    @staticmethod
+    def _key(player_id: str, score: int) -> Key:
+        return (-score, player_id)
+
+    async def load(self, collection):
+        """Build the ranking from the players collection in one pass"""
+        players: Dict[str, Dict[str, Any]] = {}
+        cursor = collection.find({}, {"username": 1, "score": 1, "level": 1})
+        async for doc in cursor:
+            player_id = str(doc["_id"])
+            players[player_id] = {
+                "username": doc.get("username"),
+                "score": doc.get("score", 0),
+                "level": doc.get("level", 1)
+            }
+        self._players = players
+        self._ranking.build(sorted(self._key(pid, p["score"]) for pid, p in players.items()))
+        self.loaded = True
+        self.version += 1
+
+    def upsert(self, player_id: str, username: str, score: int = 0, level: int = 1):
+        """Add a player or apply a new score/level"""
+        current = self._players.get(player_id)
+        if current is not None and current["score"] != score:
+            self._ranking.remove(self._key(player_id, current["score"]))
+            self._ranking.insert(self._key(player_id, score))
+        elif current is None:
+            self._ranking.insert(self._key(player_id, score))
+        entry = {"username": username, "score": score, "level": level}
+        if entry != current:
+            self._players[player_id] = entry
+            self.version += 1
+
+    def remove(self, player_id: str):
+        current = self._players.pop(player_id, None)
+        if current is not None:
+            self._ranking.remove(self._key(player_id, current["score"]))
+            self.version += 1
+
+    def _entry(self, rank: int, key: Key) -> Dict[str, Any]:
+        player_id = key[1]
+        return {"_id": player_id, "rank": rank, **self._players[player_id]}
+
+    def _slice(self, start: int, count: int) -> List[Dict[str, Any]]:
+        entries = []
+        for offset, key in enumerate(self._ranking.iter_from(start)):
+            if offset >= count:
+                break
+            entries.append(self._entry(start + offset + 1, key))
+        return entries
+
+    def top(self, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+        return self._slice(max(offset, 0), limit)
+
+    def rank(self, player_id: str) -> Optional[int]:
+        """One-based rank, or None for unknown players"""
+        current = self._players.get(player_id)
+        if current is None:
+            return None
+        return self._ranking.index(self._key(player_id, current["score"])) + 1
+
+    def around(self, player_id: str, radius: int = 2) -> List[Dict[str, Any]]:
+        """The player's entry with up to `radius` neighbours on each side"""
+        rank = self.rank(player_id)
+        if rank is None:
+            return []
+        start = max(rank - 1 - radius, 0)
+        return self._slice(start, rank - 1 - start + radius + 1)
+
+# Global leaderboard instance
+leaderboard = Leaderboard()
@@ -0,0 +1,268 @@
+import asyncio
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from database import database
+from services.metrics import matchmaking_placements
+
+# What the index needs to know about a game
+MATCH_PROJECTION = {"game_type": 1, "status": 1, "players": 1, "max_players": 1}
+
+def _capacity_filter() -> Dict[str, Any]:
+    return {"$or": [
+        {"max_players": None},
+        {"$expr": {"$lt": [{"$size": "$players"}, "$max_players"]}}
+    ]}
+
+def joinable_filter(game_id: str, player_id: str) -> Dict[str, Any]:
+    """Match the game only if a join by this player is currently allowed"""
+    return {
+        "_id": ObjectId(game_id),
+        "status": "waiting",
+        "players": {"$ne": player_id},
+        **_capacity_filter()
+    }
+
+def join_update(player_id: str) -> Dict[str, Any]:
+    return {
+        "$addToSet": {"players": player_id},
+        "$set": {"updated_at": datetime.utcnow()},
+        "$inc": {"version": 1}
+    }
+
+def new_game_document(game_type: str, player_id: str, settings: Dict[str, Any], max_players: Optional[int]) -> Dict[str, Any]:
+    now = datetime.utcnow()
+    return {
+        "game_type": game_type,
+        "status": "waiting",
+        "players": [player_id],
+        "game_objects": [],
+        "version": 0,
+        "object_changes": [],
+        "current_level": 1,
+        "score": 0,
+        "settings": settings,
+        "max_players": max_players,
+        "created_at": now,
+        "updated_at": now
+    }
+
+def _game_type(value: Any) -> str:
+    # GameType members hash by name, not by value; key the index by the plain string
+    return getattr(value, "value", value)
+
+class _OpenGame:
+    __slots__ = ("game_id", "game_type", "players", "pending", "max_players", "slots")
+
+    def __init__(self, game_id: str, game_type: str, players: Set[str], max_players: Optional[int]):
+        self.game_id = game_id
+        self.game_type = game_type
+        self.players = players
+        # Quick joins holding a slot until the database confirms them
+        self.pending: Set[str] = set()
+        self.max_players = max_players
+        # Key of the bucket the game sits in; None for games without a limit
+        self.slots: Optional[int] = None
+
+    def open_slots(self) -> Optional[int]:
+        if self.max_players is None:
+            return None
+        return self.max_players - len(self.players) - len(self.pending - self.players)
+
+class Matchmaker:
+    """In-memory index of waiting games by game_type and open slots.
+
+    Games sit in buckets keyed by how many slots they have left, so quick
+    join takes the first game in the fullest non-full bucket without looking
+    at the rest; that fills games up and gets them started sooner. The
+    database stays authoritative: a placement is confirmed by the same
+    atomic update join uses, and a miss (another worker got there first)
+    just re-syncs that game and tries the next one.
+    """
+
+    def __init__(self, get_collection: Callable[[], Any], max_attempts: int = 5):
+        self.get_collection = get_collection
+        self.max_attempts = max_attempts
+        self._games: Dict[str, _OpenGame] = {}
+        # game_type -> open slots (None: unlimited) -> game ids, oldest first.
+        # OrderedDict rather than dict: games keep leaving from the front, and
+        # a plain dict would make finding its first live entry slower each time
+        self._buckets: Dict[str, Dict[Optional[int], "OrderedDict[str, None]"]] = {}
+        self._create_locks: Dict[str, asyncio.Lock] = {}
+
+    def __len__(self) -> int:
+        return len(self._games)
+
+    def __contains__(self, game_id: str) -> bool:
+        return game_id in self._games
+
+    def _place(self, game: _OpenGame):
+        slots = game.open_slots()
+        if slots is not None and slots <= 0:
+            # Full for now, but keep the entry until the join is confirmed
+            game.slots = 0
+            return
+        game.slots = slots
+        buckets = self._buckets.setdefault(game.game_type, {})
+        bucket = buckets.get(slots)
+        if bucket is None:
+            bucket = buckets[slots] = OrderedDict()
+        bucket[game.game_id] = None
+
+    def _unplace(self, game: _OpenGame):
+        if game.slots == 0:
+            return
+        buckets = self._buckets.get(game.game_type)
+        bucket = buckets.get(game.slots) if buckets else None
+        if bucket is None:
+            return
+        bucket.pop(game.game_id, None)
+        if not bucket:
+            del buckets[game.slots]
+            if not buckets:
+                del self._buckets[game.game_type]
+
+    def sync(self, doc: Dict[str, Any]):
+        """Index or drop a game from its document (MATCH_PROJECTION fields)"""
+        game_id = str(doc["_id"])
+        previous = self._games.get(game_id)
+        self.remove(game_id)
+        if doc.get("status") != "waiting":
+            return
+        game = _OpenGame(game_id, _game_type(doc.get("game_type")), set(doc.get("players", [])), doc.get("max_players"))
+        if previous is not None:
+            # Other quick joins may still be waiting on their updates
+            game.pending = previous.pending - game.players
+        if not game.pending and game.open_slots() is not None and game.open_slots() <= 0:
+            return
+        self._games[game_id] = game
+        self._place(game)
+
+    def remove(self, game_id: str):
+        game = self._games.pop(game_id, None)
+        if game is not None:
+            self._unplace(game)
+
+    def candidate(self, game_type: Any, player_id: str) -> Optional[str]:
+        """Best waiting game for a player: fewest open slots first, unlimited games last"""
+        buckets = self._buckets.get(_game_type(game_type))
+        if not buckets:
+            return None
+        # At most max_players distinct keys, however many games there are
+        order = sorted(slots for slots in buckets if slots is not None)
+        if None in buckets:
+            order.append(None)
+        for slots in order:
+            for game_id in buckets[slots]:
+                game = self._games[game_id]
+                if player_id not in game.players and player_id not in game.pending:
+                    return game_id
+        return None
+
+    def reserve(self, game_id: str, player_id: str):
+        """Take a slot in memory while the join is confirmed, so concurrent quick joins spread out"""
+        game = self._games[game_id]
+        self._unplace(game)
+        game.pending.add(player_id)
+        self._place(game)
+
+    def release(self, game_id: str, player_id: str):
+        game = self._games.get(game_id)
+        if game is None:
+            return
+        self._unplace(game)
+        game.pending.discard(player_id)
+        self._place(game)
+
+    async def load(self, collection):
+        """Index every waiting game"""
+        self._games.clear()
+        self._buckets.clear()
+        async for doc in collection.find({"status": "waiting"}, MATCH_PROJECTION):
+            self.sync(doc)
+
+    async def quick_join(
+        self,
+        player_id: str,
+        game_type: Any,
+        settings: Optional[Dict[str, Any]] = None,
+        max_players: Optional[int] = None,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Put a player into the best waiting game, or a new one; returns (game, created)"""
+        games = self.get_collection()
+        game_type = _game_type(game_type)
+        for _ in range(self.max_attempts):
+            game_id = self.candidate(game_type, player_id)
+            if game_id is None:
+                async with self._create_locks.setdefault(game_type, asyncio.Lock()):
+                    # Whoever held the lock may have just opened a game
+                    if self.candidate(game_type, player_id) is not None:
+                        continue
+                    return await self._join_or_create(player_id, game_type, settings or {}, max_players)
+
+            self.reserve(game_id, player_id)
+            try:
+                doc = await games.find_one_and_update(
+                    joinable_filter(game_id, player_id),
+                    join_update(player_id),
+                    projection=MATCH_PROJECTION,
+                    return_document=ReturnDocument.AFTER
+                )
+            finally:
+                # Also on errors and cancelled requests, or the slot stays taken
+                self.release(game_id, player_id)
+            if doc is not None:
+                self.sync(doc)
+                matchmaking_placements.inc("indexed")
+                return doc, False
+            # Filled, started or joined elsewhere since we last looked
+            matchmaking_placements.inc("conflict")
+            current = await games.find_one({"_id": ObjectId(game_id)}, MATCH_PROJECTION)
+            if current is None:
+                self.remove(game_id)
+            else:
+                self.sync(current)
+        async with self._create_locks.setdefault(game_type, asyncio.Lock()):
+            return await self._join_or_create(player_id, game_type, settings or {}, max_players)
+
+    async def _join_or_create(
+        self, player_id: str, game_type: str, settings: Dict[str, Any], max_players: Optional[int]
+    ) -> Tuple[Dict[str, Any], bool]:
+        games = self.get_collection()
+        # Games opened by other workers aren't in this index; one indexed
+        # query catches those before we open yet another game
+        doc = await games.find_one_and_update(
+            {"status": "waiting", "game_type": game_type, "players": {"$ne": player_id}, **_capacity_filter()},
+            join_update(player_id),
+            projection=MATCH_PROJECTION,
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is not None:
+            self.sync(doc)
+            matchmaking_placements.inc("fallback")
+            return doc, False
+        doc = new_game_document(game_type, player_id, settings, max_players)
+        await games.insert_one(doc)
+        self.sync(doc)
+        matchmaking_placements.inc("created")
+        return doc, True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "waiting_games": len(self._games),
+            "by_type": {
+                game_type: sum(len(bucket) for bucket in buckets.values())
+                for game_type, buckets in self._buckets.items()
+            }
+        }
+
+# Global matchmaker
+matchmaker = Matchmaker(
+    lambda: database.games,
+    max_attempts=int(os.getenv("MATCHMAKING_MAX_ATTEMPTS", "5")),
+)
@@ -0,0 +1,278 @@
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from pymongo import monitoring
+
+Labels = Tuple[str, ...]
+# Returns (label values, value) pairs when the endpoint is scraped
+GaugeCollector = Callable[[], Iterable[Tuple[Labels, float]]]
+
+# Seconds; fine at the low end where REST, Mongo and fan-out calls should sit
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(value)
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count], sum
+        self._counts: Dict[Labels, List[int]] = {}
+        self._sums: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(labels)
+            if counts is None:
+                counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+                self._sums[labels] = 0.0
+            counts[index] += 1
+            self._sums[labels] += value
+
+    def time(self, *labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(counts), self._sums[labels]) for labels, counts in self._counts.items()]
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: Labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+class Gauge:
+    """Value read from live state at scrape time, so the hot path pays nothing"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], collect: GaugeCollector):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for labels, value in self.collect():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+class MetricsRegistry:
+    """Process-wide metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str], collect: GaugeCollector) -> Gauge:
+        return self._register(Gauge(name, help, labelnames, collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                print(f"Failed to collect metric {metric.name}: {e}")
+        return "\n".join(lines) + "\n"
+
+# Global metrics registry
+metrics = MetricsRegistry()
+
+http_request_duration = metrics.histogram(
+    "vibeton_http_request_duration_seconds",
+    "REST request latency by route template",
+    ("method", "route", "status")
+)
+mongo_operation_duration = metrics.histogram(
+    "vibeton_mongo_operation_duration_seconds",
+    "MongoDB command latency by collection and command",
+    ("collection", "operation")
+)
+mongo_operation_failures = metrics.counter(
+    "vibeton_mongo_operation_failures_total",
+    "MongoDB commands that returned an error",
+    ("collection", "operation")
+)
+ws_messages_in = metrics.counter(
+    "vibeton_ws_messages_in_total",
+    "WebSocket messages received by type",
+    ("type",)
+)
+ws_messages_out = metrics.counter(
+    "vibeton_ws_messages_out_total",
+    "WebSocket messages queued for delivery by type, one per recipient",
+    ("type",)
+)
+ws_messages_throttled = metrics.counter(
+    "vibeton_ws_messages_throttled_total",
+    "Inbound WebSocket messages over their rate limit, by type and what happened to them",
+    ("type", "action")
+)
+ws_rate_limit_disconnects = metrics.counter(
+    "vibeton_ws_rate_limit_disconnects_total",
+    "Connections dropped for persistently exceeding inbound rate limits"
+)
+ws_session_resumes = metrics.counter(
+    "vibeton_ws_session_resumes_total",
+    "Rooms restored on reconnect, by how: replay of missed messages or a snapshot",
+    ("mode",)
+)
+matchmaking_placements = metrics.counter(
+    "vibeton_matchmaking_placements_total",
+    "Quick join outcomes: indexed game, database fallback, new game, or a lost race",
+    ("outcome",)
+)
+ws_session_expirations = metrics.counter(
+    "vibeton_ws_session_expirations_total",
+    "Disconnected sessions whose grace window ran out before they resumed"
+)
+write_behind_flush_size = metrics.histogram(
+    "vibeton_write_behind_flush_size",
+    "Players written per write-behind flush",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+)
+write_behind_flush_lag = metrics.histogram(
+    "vibeton_write_behind_flush_lag_seconds",
+    "Age of the oldest change in a write-behind flush when it reached MongoDB",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+)
+write_behind_flush_failures = metrics.counter(
+    "vibeton_write_behind_flush_failures_total",
+    "Write-behind flushes that failed and were kept for the next one"
+)
+broadcast_fanout_duration = metrics.histogram(
+    "vibeton_broadcast_fanout_seconds",
+    "Time to encode a message and queue it for every local recipient",
+    ("scope",),
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+
+class HTTPMetricsMiddleware:
+    """ASGI middleware timing HTTP requests.
+
+    Routes are labelled by their path template once routing has matched,
+    so ids in the URL don't blow up the label set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status_code)
+            )
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener feeding the Mongo latency histogram"""
+
+    def __init__(self):
+        # request_id -> collection, between started and succeeded/failed
+        self._collections: Dict[int, str] = {}
+
+    @staticmethod
+    def _collection(event: monitoring.CommandStartedEvent) -> str:
+        target = event.command.get(event.command_name)
+        if isinstance(target, str):
+            return target
+        # getMore and friends name the collection separately
+        return str(event.command.get("collection", ""))
+
+    def started(self, event):
+        self._collections[event.request_id] = self._collection(event)
+
+    def succeeded(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        mongo_operation_duration.observe(event.duration_micros / 1e6, collection, event.command_name)
+
+    def failed(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        mongo_operation_duration.observe(event.duration_micros / 1e6, collection, event.command_name)
+        mongo_operation_failures.inc(collection, event.command_name)
+
+mongo_command_metrics = MongoCommandMetrics()
@@ -0,0 +1,47 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from bson import ObjectId
+
+# Cursors are opaque to clients: urlsafe base64 of the last row's sort key and _id
+
+def encode_cursor(sort_value: Any, doc_id: Any) -> str:
+    if isinstance(sort_value, datetime):
+        value = {"dt": sort_value.isoformat()}
+    else:
+        value = {"v": sort_value}
+    raw = json.dumps({**value, "id": str(doc_id)}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Any, ObjectId]:
+    """Inverse of encode_cursor; raises ValueError for anything malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded))
+        sort_value = datetime.fromisoformat(data["dt"]) if "dt" in data else data["v"]
+        return sort_value, ObjectId(data["id"])
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+def keyset_filter(field: str, cursor: Optional[str], descending: bool = False) -> Dict[str, Any]:
+    """Filter selecting rows strictly after the cursor in (field, _id) order"""
+    if not cursor:
+        return {}
+    sort_value, doc_id = decode_cursor(cursor)
+    op = "$lt" if descending else "$gt"
+    return {"$or": [
+        {field: {op: sort_value}},
+        {field: sort_value, "_id": {op: doc_id}}
+    ]}
+
+def keyset_sort(field: str, descending: bool = False):
+    direction = -1 if descending else 1
+    return [(field, direction), ("_id", direction)]
+
+def next_cursor(docs, field: str, limit: int) -> Optional[str]:
+    """Cursor for the following page, or None once a short page is returned"""
+    if limit <= 0 or len(docs) < limit:
+        return None
+    last = docs[-1]
+    return encode_cursor(last.get(field), last["_id"])
@@ -0,0 +1,146 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from bson import ObjectId
+
+from database import database
+
+class PlayerCache:
+    """Read-through LRU cache of player documents, reachable by _id or username.
+
+    Entries expire after `ttl` seconds so writes made elsewhere (other workers,
+    the write-behind flush) are picked up eventually; writes made through the
+    player routes invalidate immediately. A lookup that was already reading
+    the old document when the invalidation came doesn't put it back.
+    """
+
+    def __init__(self, get_collection: Callable[[], Any], max_size: int = 10000, ttl: float = 30.0):
+        self.get_collection = get_collection
+        self.max_size = max_size
+        self.ttl = ttl
+        # str(_id) -> (document, expires_at), least recently used first
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._by_username: Dict[str, str] = {}
+        # Bumped by every invalidation; each key remembers the generation it
+        # was last invalidated at, for as long as any fetch is in flight
+        self._generation = 0
+        self._invalidated: Dict[str, int] = {}
+        self._cleared_at = -1
+        self._fetches = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, player_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(player_id)
+        if entry is None:
+            return None
+        doc, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._drop(player_id)
+            return None
+        self._entries.move_to_end(player_id)
+        return doc
+
+    def _store(self, doc: Dict[str, Any]):
+        player_id = str(doc["_id"])
+        self._drop(player_id)
+        self._entries[player_id] = (doc, time.monotonic() + self.ttl)
+        if doc.get("username") is not None:
+            self._by_username[doc["username"]] = player_id
+        while len(self._entries) > self.max_size:
+            oldest_id = next(iter(self._entries))
+            self._drop(oldest_id)
+            self.evictions += 1
+
+    def _drop(self, player_id: str):
+        entry = self._entries.pop(player_id, None)
+        if entry is not None:
+            username = entry[0].get("username")
+            if self._by_username.get(username) == player_id:
+                del self._by_username[username]
+
+    def _invalidated_since(self, doc: Dict[str, Any], generation: int) -> bool:
+        return max(
+            self._cleared_at,
+            self._invalidated.get(str(doc["_id"]), -1),
+            self._invalidated.get(doc.get("username"), -1),
+        ) > generation
+
+    async def _fetch(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        generation = self._generation
+        self._fetches += 1
+        try:
+            doc = await self.get_collection().find_one(query)
+        finally:
+            self._fetches -= 1
+        if doc is not None and not self._invalidated_since(doc, generation):
+            self._store(doc)
+        if not self._fetches:
+            self._invalidated.clear()
+        return doc
+
+    async def get_by_id(self, player_id: str) -> Optional[Dict[str, Any]]:
+        """Player document by id; raises bson.errors.InvalidId for malformed ids"""
+        doc = self._lookup(player_id)
+        if doc is not None:
+            self.hits += 1
+            return dict(doc)
+        self.misses += 1
+        doc = await self._fetch({"_id": ObjectId(player_id)})
+        if doc is None:
+            return None
+        return dict(doc)
+
+    async def get_by_username(self, username: str) -> Optional[Dict[str, Any]]:
+        player_id = self._by_username.get(username)
+        doc = self._lookup(player_id) if player_id is not None else None
+        if doc is not None:
+            self.hits += 1
+            return dict(doc)
+        self.misses += 1
+        doc = await self._fetch({"username": username})
+        if doc is None:
+            return None
+        return dict(doc)
+
+    def invalidate(self, player_id: Optional[str] = None, username: Optional[str] = None):
+        if username is not None and player_id is None:
+            player_id = self._by_username.get(username)
+        if player_id is not None:
+            entry = self._entries.get(player_id)
+            if username is None and entry is not None:
+                username = entry[0].get("username")
+            self._drop(player_id)
+        self._generation += 1
+        if self._fetches:
+            for key in (player_id, username):
+                if key is not None:
+                    self._invalidated[key] = self._generation
+
+    def clear(self):
+        self._entries.clear()
+        self._by_username.clear()
+        self._generation += 1
+        self._cleared_at = self._generation
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+# Global player cache
+player_cache = PlayerCache(
+    lambda: database.players,
+    max_size=int(os.getenv("PLAYER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PLAYER_CACHE_TTL", "30")),
+)
@@ -0,0 +1,130 @@
+import math
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy
+except ImportError:
+    # Queries fall back to plain loops over the same columns
+    numpy = None
+
+class PlayerStateStore:
+    """Live player positions in columnar float arrays.
+
+    Each player gets a slot index into contiguous x, y, velocity and
+    last-update columns; slots of disconnected players go on a free list and
+    are reused, so steady-state moves allocate nothing. Whole-population
+    queries run over the columns at once (vectorized with NumPy when it is
+    installed).
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._slots: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._x = array("d")
+        self._y = array("d")
+        self._vx = array("d")
+        self._vy = array("d")
+        # time.monotonic() of the last update; inf for free slots so they are never stale
+        self._updated = array("d")
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, player_id: str) -> bool:
+        return player_id in self._slots
+
+    @property
+    def capacity(self) -> int:
+        return len(self._ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the float columns"""
+        return sum(column.itemsize * len(column) for column in (self._x, self._y, self._vx, self._vy, self._updated))
+
+    def _allocate(self, player_id: str) -> int:
+        if self._free:
+            slot = self._free.pop()
+            self._ids[slot] = player_id
+        else:
+            slot = len(self._ids)
+            self._ids.append(player_id)
+            for column in (self._x, self._y, self._vx, self._vy, self._updated):
+                column.append(0.0)
+        self._slots[player_id] = slot
+        return slot
+
+    def set(self, player_id: str, x: float, y: float, now: Optional[float] = None):
+        """Record a position; velocity is derived from the previous update"""
+        now = time.monotonic() if now is None else now
+        slot = self._slots.get(player_id)
+        if slot is None:
+            slot = self._allocate(player_id)
+            self._vx[slot] = self._vy[slot] = 0.0
+        else:
+            elapsed = now - self._updated[slot]
+            if elapsed > 0:
+                self._vx[slot] = (x - self._x[slot]) / elapsed
+                self._vy[slot] = (y - self._y[slot]) / elapsed
+        self._x[slot] = x
+        self._y[slot] = y
+        self._updated[slot] = now
+
+    def get(self, player_id: str) -> Optional[Tuple[float, float]]:
+        slot = self._slots.get(player_id)
+        if slot is None:
+            return None
+        return self._x[slot], self._y[slot]
+
+    def velocity(self, player_id: str) -> Optional[Tuple[float, float]]:
+        slot = self._slots.get(player_id)
+        if slot is None:
+            return None
+        return self._vx[slot], self._vy[slot]
+
+    def remove(self, player_id: str) -> bool:
+        slot = self._slots.pop(player_id, None)
+        if slot is None:
+            return False
+        self._ids[slot] = None
+        # NaN never compares within any radius
+        self._x[slot] = self._y[slot] = math.nan
+        self._updated[slot] = math.inf
+        self._free.append(slot)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {"players": len(self._slots), "slots": len(self._ids), "bytes": self.nbytes}
+
+    def _ids_at(self, slots) -> List[str]:
+        return [self._ids[slot] for slot in slots]
+
+    def within(self, x: float, y: float, radius: float) -> List[str]:
+        """All players within radius of (x, y)"""
+        if not self._slots:
+            return []
+        r2 = radius * radius
+        if numpy is not None:
+            dx = numpy.frombuffer(self._x, dtype=numpy.float64) - x
+            dy = numpy.frombuffer(self._y, dtype=numpy.float64) - y
+            return self._ids_at(numpy.flatnonzero(dx * dx + dy * dy <= r2).tolist())
+        return self._ids_at(
+            slot for slot, (px, py) in enumerate(zip(self._x, self._y))
+            if (px - x) * (px - x) + (py - y) * (py - y) <= r2
+        )
+
+    def stale(self, max_age: float, now: Optional[float] = None) -> List[str]:
+        """Players whose last update is more than max_age seconds old"""
+        if not self._slots:
+            return []
+        cutoff = (time.monotonic() if now is None else now) - max_age
+        if numpy is not None:
+            updated = numpy.frombuffer(self._updated, dtype=numpy.float64)
+            return self._ids_at(numpy.flatnonzero(updated < cutoff).tolist())
+        return self._ids_at(slot for slot, updated in enumerate(self._updated) if updated < cutoff)
@@ -0,0 +1,106 @@
+import asyncio
+import time
+from typing import Dict, Optional, Tuple
+
+# (tokens per second, burst)
+Limit = Tuple[float, float]
+
+# Message types without their own limit share the "default" bucket
+DEFAULT_RATE_LIMITS = "player_move=20/40,chat_message=2/5,default=30/60"
+# Throttled messages a connection may rack up before it is dropped
+DEFAULT_STRIKE_LIMIT = "50/250"
+# Coalesced moves are free up to this rate: a client sending one per frame
+# on a 144 Hz (or 240 Hz) display is eager, not abusive
+DEFAULT_MOVE_FLOOD_LIMIT = "250/500"
+
+def parse_limit(spec: str) -> Limit:
+    """"rate/burst" or just "rate" (burst = rate)"""
+    rate, _, burst = spec.partition("/")
+    limit = (float(rate), float(burst or rate))
+    if limit[0] <= 0 or limit[1] < 1:
+        raise ValueError(f"Invalid rate limit: {spec}")
+    return limit
+
+def parse_rate_limits(spec: str) -> Dict[str, Limit]:
+    """Parse "type=rate/burst,..." as used by WS_RATE_LIMITS"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        message_type, sep, limit = item.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid rate limit entry: {item}")
+        limits[message_type.strip()] = parse_limit(limit.strip())
+    return limits
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> bool:
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available"""
+        self._refill(time.monotonic())
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+class InboundLimiter:
+    """Per-connection token buckets for inbound messages, one per type.
+
+    Checked on the raw message type, before any handler or model work.
+    Every throttled message also costs a strike; a connection that runs out
+    of strikes is a persistent offender and gets disconnected. Throttled
+    moves are coalesced rather than dropped, so they only cost strikes past
+    move_flood_limit (never, if it is None).
+    """
+
+    def __init__(self, limits: Dict[str, Limit], strike_limit: Limit, move_flood_limit: Optional[Limit] = None):
+        self.limits = limits
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._strikes = TokenBucket(*strike_limit)
+        self._move_flood = TokenBucket(*move_flood_limit) if move_flood_limit is not None else None
+        self.throttled = 0
+        # Latest move that arrived over the limit, applied once a token frees up
+        self.pending_move: Optional[Tuple[float, float]] = None
+        self.deferred_move: Optional[asyncio.Task] = None
+
+    def _bucket(self, message_type: str) -> Optional[TokenBucket]:
+        key = message_type if message_type in self.limits else "default"
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            limit = self.limits.get(key)
+            if limit is None:
+                return None
+            bucket = self._buckets[key] = TokenBucket(*limit)
+        return bucket
+
+    def allow(self, message_type: str) -> bool:
+        bucket = self._bucket(message_type)
+        if bucket is None or bucket.take():
+            return True
+        self.throttled += 1
+        return False
+
+    def move_flooding(self) -> bool:
+        """Count a coalesced move; True once they arrive faster than the flood limit"""
+        return self._move_flood is not None and not self._move_flood.take()
+
+    def strike(self) -> bool:
+        """Charge a strike; False once the connection is out of them"""
+        return self._strikes.take()
+
+    def wait_time(self, message_type: str) -> float:
+        bucket = self._bucket(message_type)
+        return bucket.wait_time() if bucket is not None else 0.0
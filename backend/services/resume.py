@@ -0,0 +1,54 @@
+import itertools
+from collections import deque
+from typing import Collection, Deque, Dict, Iterable, List, Optional, Tuple
+
+from services.wire import EncodedMessage
+
+# Position updates are state, not events: a resuming client gets current
+# positions in one go instead of a replay of every step
+UNSEQUENCED_TYPES = {"player_moved", "players_moved"}
+
+class RoomLog:
+    """Sequence numbers for a room's messages and the last few of them.
+
+    Every sequenced room message gets the next seq; a reconnecting client
+    says which seq it saw last and gets exactly the messages after it, as
+    long as they are still in the log. A log recreated for a room id that
+    was used before starts at the seq the old one ended on.
+    """
+
+    __slots__ = ("seq", "_entries")
+
+    def __init__(self, size: int, seq: int = 0):
+        self.seq = seq
+        self._entries: Deque[Tuple[int, EncodedMessage, Collection[str]]] = deque(maxlen=size)
+
+    def next_seq(self) -> int:
+        self.seq += 1
+        return self.seq
+
+    def append(self, seq: int, message: EncodedMessage, exclude: Collection[str] = ()):
+        self._entries.append((seq, message, exclude))
+
+    def since(self, seq: int, player_id: str) -> Optional[List[EncodedMessage]]:
+        """Messages for player_id after seq, or None if some are no longer logged"""
+        if seq == self.seq:
+            return []
+        if seq > self.seq or not self._entries:
+            # A client ahead of us saw a different log, e.g. before a restart
+            return None
+        first = self._entries[0][0]
+        if seq + 1 < first:
+            return None
+        # Seqs in the log are consecutive, so the gap starts at a known index
+        missed = itertools.islice(self._entries, seq + 1 - first, None)
+        return [message for _, message, exclude in missed if player_id not in exclude]
+
+def parse_resume_seqs(values: Iterable[str]) -> Dict[str, int]:
+    """Last seen seq per room from ?seq=room_id:n query values; bad entries are skipped"""
+    seqs = {}
+    for value in values:
+        room_id, _, seq = value.rpartition(":")
+        if room_id and seq.isdigit():
+            seqs[room_id] = int(seq)
+    return seqs
@@ -0,0 +1,62 @@
+import hashlib
+from typing import Optional
+import orjson
+from bson import ObjectId
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+def _default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(content) -> bytes:
+    """Serialize Mongo documents as they come from the driver; ObjectId becomes its hex string"""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+class MongoJSONResponse(JSONResponse):
+    """JSON response rendered with orjson.
+
+    Returning it straight from a route skips FastAPI's response_model
+    validation and jsonable_encoder pass, so raw documents go out in one
+    native encoding step.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+# Clients may keep responses but must revalidate them; a match costs a 304
+CACHE_CONTROL = "no-cache"
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison of the request's If-None-Match against etag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    bare = etag.removeprefix("W/")
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == bare:
+            return True
+    return False
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+def etag_response(request: Request, content, etag: Optional[str] = None) -> Response:
+    """Render content with ETag and Cache-Control, or a 304 if the client has it.
+
+    Without an explicit etag one is derived from the rendered body.
+    """
+    body = dumps(content)
+    etag = etag or etag_for(body)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    )
@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import bisect
+import hashlib
+import os
+import sys
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+class HashRing:
+    """Consistent hash ring with virtual nodes.
+
+    Adding or removing a node only moves the keys on the arcs it gains or
+    loses, about 1/N of them, instead of reshuffling everything.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 100):
+        self.vnodes = vnodes
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self._nodes: Set[str] = set()
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> Set[str]:
+        return set(self._nodes)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def add(self, node: str):
+        if node in self._nodes:
+            return
+        self._nodes.add(node)
+        for replica in range(self.vnodes):
+            point = _hash(f"{node}#{replica}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str):
+        if node not in self._nodes:
+            return
+        self._nodes.discard(node)
+        kept = [(p, o) for p, o in zip(self._points, self._owners) if o != node]
+        self._points = [p for p, _ in kept]
+        self._owners = [o for _, o in kept]
+
+    def get(self, key: str) -> Optional[str]:
+        """Node owning key: the first point clockwise from the key's hash"""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+class RoomScheduler:
+    """Decides which worker owns each room.
+
+    Every worker builds the same ring from the same membership (learned
+    through the backplane), so they agree on placement without talking to
+    each other about individual rooms.
+    """
+
+    def __init__(self, worker_id: str, url: str, vnodes: int = 100):
+        self.worker_id = worker_id
+        self.url = url
+        self.workers: Dict[str, str] = {worker_id: url}
+        self.ring = HashRing([worker_id], vnodes=vnodes)
+
+    def owner(self, room_id: str) -> str:
+        return self.ring.get(room_id)
+
+    def owner_url(self, room_id: str) -> str:
+        return self.workers[self.owner(room_id)]
+
+    def is_local(self, room_id: str) -> bool:
+        return self.owner(room_id) == self.worker_id
+
+    def add_worker(self, worker_id: str, url: str) -> bool:
+        """Returns True if membership changed"""
+        if self.workers.get(worker_id) == url:
+            return False
+        self.workers[worker_id] = url
+        self.ring.add(worker_id)
+        return True
+
+    def remove_worker(self, worker_id: str) -> bool:
+        if worker_id == self.worker_id or worker_id not in self.workers:
+            return False
+        del self.workers[worker_id]
+        self.ring.remove(worker_id)
+        return True
+
+    def placement(self, room_ids: Iterable[str]) -> Dict[str, str]:
+        return {room_id: self.owner(room_id) for room_id in sorted(room_ids)}
+
+def _worker_commands(workers: int, host: str, base_port: int, backplane_url: str) -> List[Tuple[List[str], Dict[str, str]]]:
+    commands = []
+    for index in range(workers):
+        port = base_port + index
+        env = {
+            **os.environ,
+            "BACKPLANE_URL": backplane_url,
+            "SHARD_ROOMS": "1",
+            "WORKER_URL": f"ws://{host}:{port}",
+        }
+        commands.append(([sys.executable, "-m", "uvicorn", "main:app", "--host", host, "--port", str(port)], env))
+    return commands
+
+async def run_cluster(workers: int, host: str, base_port: int, backplane_url: str):
+    """Start the backplane broker and one uvicorn worker per port; runs until interrupted"""
+    from services.backplane import run_broker
+
+    broker = asyncio.create_task(run_broker(backplane_url))
+    await asyncio.sleep(0.5)
+    processes = []
+    for command, env in _worker_commands(workers, host, base_port, backplane_url):
+        processes.append(await asyncio.create_subprocess_exec(*command, env=env))
+    print(f"Started {workers} workers on ports {base_port}-{base_port + workers - 1}")
+    try:
+        await asyncio.gather(*(process.wait() for process in processes))
+    finally:
+        for process in processes:
+            if process.returncode is None:
+                process.terminate()
+        broker.cancel()
+
+if __name__ == "__main__":
+    # python -m services.sharding --workers 4
+    parser = argparse.ArgumentParser(description="Run room-sharded workers on one machine")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--base-port", type=int, default=8001)
+    parser.add_argument("--backplane-url", default="unix:///tmp/vibeton-backplane.sock")
+    args = parser.parse_args()
+    asyncio.run(run_cluster(args.workers, args.host, args.base_port, args.backplane_url))
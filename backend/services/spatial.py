@@ -0,0 +1,91 @@
+import math
+from typing import Dict, Optional, Set, Tuple
+
+Cell = Tuple[int, int]
+
+class InterestGrid:
+    """Uniform grid over player positions with symmetric radius-based visibility.
+
+    With the cell size equal to the radius, a radius query only has to look
+    at the 3x3 block of cells around a point, so a move costs O(neighbors)
+    rather than O(room).
+    """
+
+    def __init__(self, radius: float, cell_size: Optional[float] = None):
+        self.radius = radius
+        self.cell_size = cell_size or radius
+        self.positions: Dict[str, Tuple[float, float]] = {}
+        self.cells: Dict[Cell, Set[str]] = {}
+        # Who each player can currently see; always symmetric
+        self.visible: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __contains__(self, player_id: str) -> bool:
+        return player_id in self.positions
+
+    def _cell(self, x: float, y: float) -> Cell:
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def query(self, x: float, y: float, radius: Optional[float] = None) -> Set[str]:
+        """All players within radius of (x, y)"""
+        radius = self.radius if radius is None else radius
+        r2 = radius * radius
+        span = max(1, math.ceil(radius / self.cell_size))
+        cx, cy = self._cell(x, y)
+        found = set()
+        for gx in range(cx - span, cx + span + 1):
+            for gy in range(cy - span, cy + span + 1):
+                for player_id in self.cells.get((gx, gy), ()):
+                    px, py = self.positions[player_id]
+                    if (px - x) * (px - x) + (py - y) * (py - y) <= r2:
+                        found.add(player_id)
+        return found
+
+    def update(self, player_id: str, x: float, y: float) -> Tuple[Set[str], Set[str], Set[str]]:
+        """Move a player; returns (neighbors, entered, left) relative to its previous view"""
+        old = self.positions.get(player_id)
+        new_cell = self._cell(x, y)
+        if old is not None:
+            old_cell = self._cell(*old)
+            if old_cell != new_cell:
+                self._discard_from_cell(old_cell, player_id)
+                self.cells.setdefault(new_cell, set()).add(player_id)
+        else:
+            self.cells.setdefault(new_cell, set()).add(player_id)
+        self.positions[player_id] = (x, y)
+
+        neighbors = self.query(x, y)
+        neighbors.discard(player_id)
+        previous = self.visible.get(player_id, set())
+        entered = neighbors - previous
+        left = previous - neighbors
+
+        for other in entered:
+            self.visible.setdefault(other, set()).add(player_id)
+        for other in left:
+            self.visible[other].discard(player_id)
+        self.visible[player_id] = neighbors
+        return neighbors, entered, left
+
+    def remove(self, player_id: str) -> Set[str]:
+        """Drop a player; returns the players that could see it"""
+        position = self.positions.pop(player_id, None)
+        if position is None:
+            return set()
+        self._discard_from_cell(self._cell(*position), player_id)
+        watchers = self.visible.pop(player_id, set())
+        for other in watchers:
+            self.visible[other].discard(player_id)
+        return watchers
+
+    def neighbors(self, player_id: str) -> Set[str]:
+        return self.visible.get(player_id, set())
+
+    def _discard_from_cell(self, cell: Cell, player_id: str):
+        members = self.cells.get(cell)
+        if members is not None:
+            members.discard(player_id)
+            if not members:
+                del self.cells[cell]
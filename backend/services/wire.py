@@ -0,0 +1,139 @@
+import json
+import struct
+from typing import Any, Dict, Optional, Tuple, Union
+
+Payload = Union[str, bytes]
+
+# Binary frames start with a one-byte opcode; everything else stays JSON text.
+# Coordinates are little-endian float32, ids are length-prefixed UTF-8.
+OP_PLAYER_MOVE = 0x01     # client -> server: x, y
+OP_PLAYER_MOVED = 0x02    # server -> client: player_id, x, y
+OP_PLAYERS_MOVED = 0x03   # server -> client: tick, room_id, count, (player_id, x, y) * count
+
+_MOVE = struct.Struct("<Bff")
+_HEADER = struct.Struct("<B")
+_TICK_HEADER = struct.Struct("<BI")
+_COUNT = struct.Struct("<H")
+_XY = struct.Struct("<ff")
+
+# Largest finite float32; coordinates beyond it have no binary form
+FLOAT32_MAX = 3.4028234663852886e38
+
+PROTOCOL_JSON = "json"
+PROTOCOL_BINARY = "binary"
+
+class WireProtocolError(ValueError):
+    pass
+
+def _pack_id(value: str) -> bytes:
+    raw = value.encode("utf-8")
+    if len(raw) > 255:
+        raise WireProtocolError("Identifier too long for binary frame")
+    return bytes((len(raw),)) + raw
+
+def _unpack_id(data: bytes, offset: int) -> Tuple[str, int]:
+    length = data[offset]
+    start = offset + 1
+    end = start + length
+    if end > len(data):
+        raise WireProtocolError("Truncated identifier")
+    return data[start:end].decode("utf-8"), end
+
+def encode_binary(message: Dict[str, Any]) -> Optional[bytes]:
+    """Binary form of a hot-path message, or None if it has no binary layout.
+
+    Messages that don't fit the layout (a coordinate beyond float32, an id
+    over 255 bytes) also get None, so they go out as JSON instead of failing.
+    """
+    try:
+        return _encode_binary(message)
+    except (struct.error, OverflowError, WireProtocolError):
+        return None
+
+def _encode_binary(message: Dict[str, Any]) -> Optional[bytes]:
+    message_type = message.get("type")
+    data = message.get("data", {})
+    if message_type == "player_moved":
+        position = data["position"]
+        return (
+            _HEADER.pack(OP_PLAYER_MOVED)
+            + _pack_id(data["player_id"])
+            + _XY.pack(position["x"], position["y"])
+        )
+    if message_type == "players_moved":
+        positions = data["positions"]
+        parts = [
+            _TICK_HEADER.pack(OP_PLAYERS_MOVED, data["tick"]),
+            _pack_id(data["room_id"]),
+            _COUNT.pack(len(positions)),
+        ]
+        for player_id, position in positions.items():
+            parts.append(_pack_id(player_id))
+            parts.append(_XY.pack(position["x"], position["y"]))
+        return b"".join(parts)
+    return None
+
+def decode_move(data: bytes) -> Tuple[float, float]:
+    """Read an inbound player_move frame straight into (x, y)"""
+    if len(data) != _MOVE.size or data[0] != OP_PLAYER_MOVE:
+        raise WireProtocolError("Malformed player_move frame")
+    _, x, y = _MOVE.unpack(data)
+    return x, y
+
+def encode_move(x: float, y: float) -> bytes:
+    return _MOVE.pack(OP_PLAYER_MOVE, x, y)
+
+def decode_binary(data: bytes) -> Dict[str, Any]:
+    """Decode a server frame back into its JSON-equivalent message"""
+    if not data:
+        raise WireProtocolError("Empty frame")
+    opcode = data[0]
+    try:
+        if opcode == OP_PLAYER_MOVED:
+            player_id, offset = _unpack_id(data, 1)
+            x, y = _XY.unpack_from(data, offset)
+            return {"type": "player_moved", "data": {"player_id": player_id, "position": {"x": x, "y": y}}}
+        if opcode == OP_PLAYERS_MOVED:
+            _, tick = _TICK_HEADER.unpack_from(data, 0)
+            room_id, offset = _unpack_id(data, _TICK_HEADER.size)
+            (count,) = _COUNT.unpack_from(data, offset)
+            offset += _COUNT.size
+            positions = {}
+            for _ in range(count):
+                player_id, offset = _unpack_id(data, offset)
+                x, y = _XY.unpack_from(data, offset)
+                offset += _XY.size
+                positions[player_id] = {"x": x, "y": y}
+            return {"type": "players_moved", "data": {"room_id": room_id, "tick": tick, "positions": positions}}
+        if opcode == OP_PLAYER_MOVE:
+            x, y = decode_move(data)
+            return {"type": "player_move", "data": {"position": {"x": x, "y": y}}}
+    except struct.error as e:
+        raise WireProtocolError(str(e)) from e
+    raise WireProtocolError(f"Unknown opcode {opcode}")
+
+class EncodedMessage:
+    """A message encoded at most once per wire format, shared by all recipients"""
+
+    __slots__ = ("message", "_text", "_binary", "_binary_done")
+
+    def __init__(self, message: Dict[str, Any]):
+        self.message = message
+        self._text: Optional[str] = None
+        self._binary: Optional[bytes] = None
+        self._binary_done = False
+
+    def text(self) -> str:
+        if self._text is None:
+            self._text = json.dumps(self.message)
+        return self._text
+
+    def payload(self, binary: bool = False) -> Payload:
+        """Binary frame for binary clients when the type has one, JSON otherwise"""
+        if binary:
+            if not self._binary_done:
+                self._binary = encode_binary(self.message)
+                self._binary_done = True
+            if self._binary is not None:
+                return self._binary
+        return self.text()
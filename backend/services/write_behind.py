@@ -0,0 +1,178 @@
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from database import database
+from services.metrics import metrics, write_behind_flush_failures, write_behind_flush_lag, write_behind_flush_size
+
+# Fields that may be buffered; everything else goes through the routes directly.
+# Score, experience and level change through PUT /players, which returns the
+# updated document and keeps the leaderboard in step, so they are written there
+BUFFERED_FIELDS = ("position",)
+
+class PlayerStateWriter:
+    """Write-behind buffer for high-frequency player state.
+
+    Updates are merged per player in memory and written with one unordered
+    bulk_write when the flush interval elapses or the number of dirty players
+    reaches max_batch, so Mongo sees one write per player per flush instead of
+    one per event.
+    """
+
+    def __init__(
+        self,
+        get_collection: Callable[[], Any],
+        flush_interval: float = 1.0,
+        max_batch: int = 500,
+    ):
+        self.get_collection = get_collection
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        # player_id -> fields to $set
+        self._dirty: Dict[str, Dict[str, Any]] = {}
+        # player_id -> monotonic time of the oldest unflushed change
+        self._dirty_since: Dict[str, float] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+        # Metrics
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.documents_written = 0
+        self.last_flush_size = 0
+        self.max_flush_size = 0
+        self.last_flush_lag = 0.0
+        self.max_flush_lag = 0.0
+        self.last_flush_duration = 0.0
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty)
+
+    def mark(self, player_id: str, **fields):
+        """Record new state for a player; later values overwrite earlier ones"""
+        if not ObjectId.is_valid(player_id):
+            return
+        state = {k: v for k, v in fields.items() if k in BUFFERED_FIELDS}
+        if not state:
+            return
+        self._dirty.setdefault(player_id, {}).update(state)
+        self._dirty_since.setdefault(player_id, time.monotonic())
+        if len(self._dirty) >= self.max_batch:
+            self._wakeup.set()
+
+    async def discard(self, player_id: str, fields: Iterable[str]):
+        """Drop buffered values superseded by a direct write.
+
+        Waits for an in-flight flush so that the direct write lands after it.
+        """
+        async with self._flush_lock:
+            state = self._dirty.get(player_id)
+            if state is None:
+                return
+            for field in fields:
+                state.pop(field, None)
+            if not state:
+                del self._dirty[player_id]
+                self._dirty_since.pop(player_id, None)
+
+    def forget(self, player_id: str):
+        self._dirty.pop(player_id, None)
+        self._dirty_since.pop(player_id, None)
+
+    async def flush(self) -> int:
+        """Write everything buffered so far; returns the number of players written"""
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+            batch, self._dirty = self._dirty, {}
+            since, self._dirty_since = self._dirty_since, {}
+            started = time.monotonic()
+            operations = [
+                UpdateOne({"_id": ObjectId(player_id)}, {"$set": state})
+                for player_id, state in batch.items()
+            ]
+            try:
+                await self.get_collection().bulk_write(operations, ordered=False)
+            except Exception as e:
+                self.failed_flushes += 1
+                write_behind_flush_failures.inc()
+                print(f"Write-behind flush of {len(batch)} players failed: {e}")
+                # Put the batch back underneath anything newer that arrived meanwhile
+                for player_id, state in batch.items():
+                    self._dirty[player_id] = {**state, **self._dirty.get(player_id, {})}
+                    self._dirty_since[player_id] = min(since[player_id], self._dirty_since.get(player_id, since[player_id]))
+                return 0
+
+            finished = time.monotonic()
+            lag = finished - min(since.values())
+            self.flushes += 1
+            self.documents_written += len(batch)
+            self.last_flush_size = len(batch)
+            self.max_flush_size = max(self.max_flush_size, len(batch))
+            self.last_flush_lag = lag
+            self.max_flush_lag = max(self.max_flush_lag, lag)
+            self.last_flush_duration = finished - started
+            write_behind_flush_size.observe(len(batch))
+            write_behind_flush_lag.observe(lag)
+            return len(batch)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write out whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        oldest = min(self._dirty_since.values(), default=None)
+        return {
+            "pending": len(self._dirty),
+            "current_lag": time.monotonic() - oldest if oldest is not None else 0.0,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "documents_written": self.documents_written,
+            "last_flush_size": self.last_flush_size,
+            "max_flush_size": self.max_flush_size,
+            "last_flush_lag": self.last_flush_lag,
+            "max_flush_lag": self.max_flush_lag,
+            "last_flush_duration": self.last_flush_duration
+        }
+
+# Global player state writer
+player_state_writer = PlayerStateWriter(
+    lambda: database.players,
+    flush_interval=float(os.getenv("WRITE_BEHIND_INTERVAL", "1.0")),
+    max_batch=int(os.getenv("WRITE_BEHIND_MAX_BATCH", "500")),
+)
+
+metrics.gauge(
+    "vibeton_write_behind_pending",
+    "Players with buffered changes, and the age in seconds of the oldest one",
+    ("stat",),
+    lambda: [
+        (("players",), player_state_writer.pending),
+        (("oldest_age",), player_state_writer.stats()["current_lag"])
+    ]
+)
@@ -0,0 +1,47 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Backend modules import each other top-level (from services..., from models...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class FakeWebSocket:
+    """Just enough of a starlette WebSocket for GameManager.connect and the writer task"""
+
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+
+    async def accept(self, *args, **kwargs):
+        pass
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+
+    async def close(self, code=1000, reason=None):
+        self.closed = True
+
+@pytest.fixture
+def fake_websocket():
+    return FakeWebSocket
+
+@pytest.fixture
+def mongo():
+    """database pointed at an in-memory mongomock-motor client"""
+    from mongomock_motor import AsyncMongoMockClient
+    from database import database
+    client = AsyncMongoMockClient()
+    previous = database.client, database.db
+    database.client, database.db = client, client["vibeton_game"]
+    yield database
+    database.client, database.db = previous
+
+@pytest.fixture
+def run():
+    """Run a coroutine on a fresh event loop"""
+    return asyncio.run
@@ -0,0 +1,181 @@
+"""Room traffic crosses worker processes through the broker (user-007)"""
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import time
+
+import pytest
+
+from services.backplane import BrokerBackplane, run_broker
+from services.game_manager import GameManager
+
+ROOM = "room-1"
+TIMEOUT = 10.0
+
+class RecordingWebSocket:
+    """Reports every frame the worker sends to its client back to the test"""
+
+    def __init__(self, player_id, events):
+        self.player_id = player_id
+        self.events = events
+
+    async def accept(self, *args, **kwargs):
+        pass
+
+    async def send_text(self, text):
+        self.events.put(("received", self.player_id, time.time(), json.loads(text)))
+
+    async def send_bytes(self, data):
+        pass
+
+    async def close(self, code=1000, reason=None):
+        pass
+
+def _broker(url):
+    asyncio.run(run_broker(url))
+
+def _worker(url, player_id, commands, events):
+    asyncio.run(_worker_main(url, player_id, commands, events))
+
+async def _worker_main(url, player_id, commands, events):
+    gm = GameManager()
+    gm.rate_limits = None
+    await gm.attach_backplane(BrokerBackplane(url))
+    await gm.connect(player_id, RecordingWebSocket(player_id, events))
+    await gm.join_room(player_id, ROOM)
+    events.put(("ready", player_id))
+
+    loop = asyncio.get_running_loop()
+    while True:
+        command, payload = await loop.run_in_executor(None, commands.get)
+        if command == "stop":
+            break
+        if command == "chat":
+            await gm.handle_message(player_id, {
+                "type": "chat_message",
+                "data": {"room_id": ROOM, "message": payload, "timestamp": time.time()}
+            })
+        elif command == "move":
+            await gm.move_player(player_id, *payload)
+    await gm.shutdown()
+
+def _wait_for(events, predicate):
+    """First event matching predicate; fails the test after TIMEOUT"""
+    deadline = time.monotonic() + TIMEOUT
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            pytest.fail("Timed out waiting for a backplane event")
+        try:
+            event = events.get(timeout=remaining)
+        except queue.Empty:
+            continue
+        if predicate(event):
+            return event
+
+def _received(player_id, message_type):
+    return lambda event: event[0] == "received" and event[1] == player_id and event[3].get("type") == message_type
+
+@pytest.fixture
+def cluster(tmp_path):
+    """A broker and two worker processes, one player on each, both in ROOM"""
+    context = multiprocessing.get_context("spawn")
+    url = f"unix://{tmp_path}/backplane.sock"
+    broker = context.Process(target=_broker, args=(url,), daemon=True)
+    broker.start()
+    deadline = time.monotonic() + TIMEOUT
+    while not os.path.exists(f"{tmp_path}/backplane.sock"):
+        assert time.monotonic() < deadline, "broker did not start"
+        time.sleep(0.05)
+
+    events = context.Queue()
+    workers = {}
+    for player_id in ("alice", "bob"):
+        commands = context.Queue()
+        process = context.Process(target=_worker, args=(url, player_id, commands, events), daemon=True)
+        process.start()
+        workers[player_id] = (process, commands)
+        _wait_for(events, lambda event, p=player_id: event[:2] == ("ready", p))
+
+    yield workers, events
+
+    for process, commands in workers.values():
+        commands.put(("stop", None))
+    for process, _ in workers.values():
+        process.join(TIMEOUT)
+        if process.is_alive():
+            process.terminate()
+    broker.terminate()
+    broker.join(TIMEOUT)
+
+def test_chat_and_moves_reach_the_other_worker(cluster):
+    workers, events = cluster
+
+    latencies = []
+    for i in range(20):
+        workers["alice"][1].put(("chat", f"hello {i}"))
+        _, _, received_at, message = _wait_for(events, _received("bob", "chat_message"))
+        assert message["data"]["message"] == f"hello {i}"
+        assert message["data"]["player_id"] == "alice"
+        latencies.append(received_at - message["data"]["timestamp"])
+
+    workers["bob"][1].put(("move", (12.5, 7.0)))
+    _, _, _, message = _wait_for(events, _received("alice", "player_moved"))
+    assert message["data"] == {"player_id": "bob", "position": {"x": 12.5, "y": 7.0}}
+
+    latencies.sort()
+    # Generous bounds: the point is delivery, not this machine's scheduler
+    assert latencies[len(latencies) // 2] < 0.5
+    assert latencies[-1] < 2.0
+
+def test_stalled_worker_does_not_hold_up_the_broker(run, tmp_path):
+    async def scenario():
+        url = f"unix://{tmp_path}/stalled.sock"
+        broker = asyncio.create_task(run_broker(url, max_queue_size=500))
+        while not os.path.exists(f"{tmp_path}/stalled.sock"):
+            await asyncio.sleep(0.01)
+
+        connections = {}
+        for name in ("sender", "reader", "stalled"):
+            reader, writer = await asyncio.open_unix_connection(f"{tmp_path}/stalled.sock")
+            writer.write(json.dumps({"op": "hello", "meta": {}, "origin": name}).encode() + b"\n")
+            await writer.drain()
+            connections[name] = (reader, writer)
+        await asyncio.sleep(0.05)
+
+        # Far more than fits in the stalled worker's socket buffer, in rounds
+        # the reading worker keeps up with
+        rounds, per_round = 20, 100
+        padding = "x" * 1024
+        sender = connections["sender"][1]
+        reader = connections["reader"][0]
+        received, gone = [], None
+        for round_number in range(rounds):
+            for i in range(round_number * per_round, (round_number + 1) * per_round):
+                sender.write(json.dumps({"op": "publish", "room": ROOM, "message": {"i": i, "pad": padding},
+                                         "origin": "sender"}).encode() + b"\n")
+            await sender.drain()
+            while len(received) < (round_number + 1) * per_round:
+                frame = json.loads(await asyncio.wait_for(reader.readline(), TIMEOUT))
+                if frame["op"] == "publish":
+                    received.append(frame["message"]["i"])
+                elif frame["op"] == "gone":
+                    gone = frame["worker"]
+        while gone is None:
+            frame = json.loads(await asyncio.wait_for(reader.readline(), TIMEOUT))
+            if frame["op"] == "gone":
+                gone = frame["worker"]
+
+        for _, writer in connections.values():
+            writer.close()
+        await asyncio.sleep(0.05)
+        broker.cancel()
+        return received, gone
+
+    received, gone = run(scenario())
+    # Everything reached the reading worker, in order, while the stalled
+    # one was cut off and the others told it is gone
+    assert received == list(range(2000))
+    assert gone == "stalled"
@@ -0,0 +1,48 @@
+"""Placements and removals through the building writer's group commit (user-025)"""
+import asyncio
+
+from bson import ObjectId
+
+from models.game import BuildingCreate
+from services.buildings import BuildingIndex, BuildingWriter
+
+async def _setup(database, commit_delay):
+    game_id = ObjectId()
+    await database.games.insert_one({"_id": game_id, "settings": {}})
+    writer = BuildingWriter(lambda: database.buildings, commit_delay=commit_delay)
+    writer.start()
+    index = BuildingIndex(lambda: database.buildings, lambda: database.games, writer)
+    return str(game_id), writer, index
+
+def test_removing_a_queued_placement_cancels_both_writes(run, mongo):
+    async def scenario():
+        game_id, writer, index = await _setup(mongo, commit_delay=0.05)
+        building = BuildingCreate(building_type="house", x=2, y=3, width=2, height=2)
+        placing = asyncio.create_task(index.place(game_id, building))
+        await asyncio.sleep(0.01)
+        assert writer.pending == 1
+        building_id = next(iter((await index.grid(game_id)).buildings))
+
+        await index.remove(game_id, building_id)
+        placed = await placing
+        pending = writer.pending
+        await writer.stop()
+        return building_id, placed, pending, await mongo.buildings.count_documents({}), writer.stats()
+
+    building_id, placed, pending, saved, stats = run(scenario())
+    assert str(placed["_id"]) == building_id
+    # No insert left to write the building back after it was removed
+    assert pending == 0
+    assert saved == 0
+    assert stats["written"] == 0
+
+def test_removing_a_saved_building_deletes_it(run, mongo):
+    async def scenario():
+        game_id, writer, index = await _setup(mongo, commit_delay=0.001)
+        placed = await index.place(game_id, BuildingCreate(building_type="house", x=0, y=0))
+        before = await mongo.buildings.count_documents({})
+        await index.remove(game_id, str(placed["_id"]))
+        await writer.stop()
+        return before, await mongo.buildings.count_documents({})
+
+    assert run(scenario()) == (1, 0)
@@ -0,0 +1,73 @@
+"""Concurrent joins and starts can't overfill or double-start a game (user-013)"""
+import asyncio
+import inspect
+import uuid
+
+import httpx
+from bson import ObjectId
+
+MAX_PLAYERS = 5
+
+class YieldingCollection:
+    """Collection proxy that yields to the loop around every awaited call.
+
+    mongomock-motor runs each operation without suspending, so concurrent
+    requests would never interleave; a real driver awaits the network.
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(0)
+            result = await attr(*args, **kwargs)
+            await asyncio.sleep(0)
+            return result
+        return call
+
+async def _scenario(database, monkeypatch):
+    import main
+
+    games = YieldingCollection(database.db["games"])
+    monkeypatch.setattr(type(database), "games", property(lambda self: games))
+
+    prefix = uuid.uuid4().hex[:8]
+    usernames = [f"{prefix}-{i}" for i in range(30)]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        for username in usernames:
+            response = await client.post("/api/players/", json={"username": username})
+            assert response.status_code == 200, response.text
+        response = await client.post(
+            f"/api/games/?player_username={usernames[0]}",
+            json={"game_type": "multiplayer", "max_players": MAX_PLAYERS}
+        )
+        game_id = response.json()["_id"]
+
+        # Everyone else at once, each of them twice
+        joins = await asyncio.gather(*[
+            client.post(f"/api/games/{game_id}/join?player_username={username}")
+            for username in usernames[1:] * 2
+        ])
+        starts = await asyncio.gather(*[client.post(f"/api/games/{game_id}/start") for _ in range(10)])
+        late = await client.post(f"/api/games/{game_id}/join?player_username={usernames[-1]}")
+
+    game = await database.games.find_one({"_id": ObjectId(game_id)})
+    return joins, starts, late, game
+
+def test_concurrent_joins_fill_exactly_max_players(run, mongo, monkeypatch):
+    joins, starts, late, game = run(_scenario(mongo, monkeypatch))
+
+    assert sum(response.status_code == 200 for response in joins) == MAX_PLAYERS - 1
+    assert all(response.status_code in (200, 400) for response in joins)
+    assert len(game["players"]) == MAX_PLAYERS
+    assert len(set(game["players"])) == MAX_PLAYERS
+
+    assert sum(response.status_code == 200 for response in starts) == 1
+    assert all(response.status_code == 400 for response in starts if response.status_code != 200)
+    assert game["status"] == "active"
+    assert late.status_code == 400
@@ -0,0 +1,77 @@
+"""Per-object updates to game_objects (user-014)"""
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from models.game import GameObjectsPatch
+from services.game_objects import GameObjectStore, PatchRejected, VersionConflict
+
+def _object(object_id, x):
+    return {"id": object_id, "type": "house", "position": {"x": x, "y": x}, "properties": {"level": 1}}
+
+async def _game(database, objects=3):
+    game_id = ObjectId()
+    await database.games.insert_one({
+        "_id": game_id,
+        "version": 4,
+        "game_objects": [_object(f"obj-{i}", i) for i in range(objects)],
+        "object_changes": []
+    })
+    return str(game_id), GameObjectStore(lambda: database.games)
+
+def test_update_changes_only_the_named_objects(run, mongo):
+    async def scenario():
+        game_id, store = await _game(mongo)
+        change = await store.apply(game_id, GameObjectsPatch(update=[
+            {"id": "obj-2", "position": {"x": 9, "y": 8}},
+            {"id": "obj-0", "properties": {"level": 3}},
+        ]))
+        return change, await mongo.games.find_one({"_id": ObjectId(game_id)})
+
+    change, game = run(scenario())
+    assert change["version"] == 5
+    assert change["op"] == "update"
+    assert game["version"] == 5
+    assert game["game_objects"] == [
+        {**_object("obj-0", 0), "properties": {"level": 3}},
+        _object("obj-1", 1),
+        {**_object("obj-2", 2), "position": {"x": 9.0, "y": 8.0}},
+    ]
+    assert game["object_changes"] == [change]
+
+def test_update_rejects_unknown_objects_and_stale_versions(run, mongo):
+    async def scenario():
+        game_id, store = await _game(mongo)
+        with pytest.raises(PatchRejected, match="obj-7"):
+            await store.apply(game_id, GameObjectsPatch(update=[
+                {"id": "obj-1", "properties": {"level": 2}},
+                {"id": "obj-7", "properties": {"level": 2}},
+            ]))
+        with pytest.raises(PatchRejected, match="changes nothing"):
+            await store.apply(game_id, GameObjectsPatch(update=[{"id": "obj-1"}]))
+        with pytest.raises(VersionConflict):
+            await store.apply(game_id, GameObjectsPatch(base_version=3, update=[
+                {"id": "obj-1", "properties": {"level": 2}},
+            ]))
+        return await mongo.games.find_one({"_id": ObjectId(game_id)})
+
+    game = run(scenario())
+    # Nothing above was written
+    assert game["version"] == 4
+    assert game["game_objects"][1] == _object("obj-1", 1)
+
+def test_update_follows_objects_moved_by_a_concurrent_remove(run, mongo):
+    async def scenario():
+        game_id, store = await _game(mongo, objects=6)
+        patches = [GameObjectsPatch(remove=["obj-0"])] + [
+            GameObjectsPatch(update=[{"id": f"obj-{i}", "properties": {"level": 10 + i}}]) for i in range(1, 6)
+        ]
+        await asyncio.gather(*(store.apply(game_id, patch) for patch in patches))
+        return await mongo.games.find_one({"_id": ObjectId(game_id)})
+
+    game = run(scenario())
+    assert game["version"] == 4 + 6
+    assert [(obj["id"], obj["properties"]["level"]) for obj in game["game_objects"]] == [
+        (f"obj-{i}", 10 + i) for i in range(1, 6)
+    ]
@@ -0,0 +1,118 @@
+"""The indexable skip list and the leaderboard on top of it, against sorted lists (user-008)"""
+import bisect
+import random
+
+import pytest
+
+from services.leaderboard import IndexableSkipList, Leaderboard
+
+def _check_spans(skiplist, expected):
+    """Every link's width is the number of level-0 hops it covers"""
+    positions = {}
+    node, position = skiplist._head, 0
+    while node is not skiplist._tail:
+        positions[id(node)] = position
+        node, position = node.next[0], position + 1
+    positions[id(skiplist._tail)] = position
+    assert position == len(expected) + 1
+
+    for level in range(skiplist.max_levels):
+        node = skiplist._head
+        while node is not skiplist._tail:
+            following = node.next[level]
+            assert node.width[level] == positions[id(following)] - positions[id(node)]
+            node = following
+
+def _check(skiplist, expected):
+    assert len(skiplist) == len(expected)
+    assert list(skiplist.iter_from(0)) == expected
+    for position, key in enumerate(expected):
+        assert skiplist.index(key) == position
+    for start in (1, len(expected) // 2, len(expected) - 1):
+        if 0 <= start < len(expected):
+            assert list(skiplist.iter_from(start)) == expected[start:]
+    assert list(skiplist.iter_from(len(expected))) == []
+    _check_spans(skiplist, expected)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_skip_list_matches_a_sorted_list(seed):
+    rng = random.Random(seed)
+    # Random levels come from the module's random; pin them per seed too
+    random.seed(seed)
+    skiplist = IndexableSkipList(max_levels=6)
+    expected = sorted({(rng.randrange(-50, 0), f"p{i}") for i in range(rng.randrange(0, 40))})
+    skiplist.build(list(expected))
+    _check(skiplist, expected)
+
+    for step in range(400):
+        if expected and rng.random() < 0.45:
+            key = expected.pop(rng.randrange(len(expected)))
+            skiplist.remove(key)
+        else:
+            key = (rng.randrange(-50, 0), f"q{step}")
+            bisect.insort(expected, key)
+            skiplist.insert(key)
+        if step % 40 == 0:
+            _check(skiplist, expected)
+    _check(skiplist, expected)
+
+    missing = (1, "nobody")
+    with pytest.raises(KeyError):
+        skiplist.index(missing)
+    with pytest.raises(KeyError):
+        skiplist.remove(missing)
+
+class _Players:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, *args, **kwargs):
+        return self._cursor()
+
+    async def _cursor(self):
+        for doc in self.docs:
+            yield doc
+
+def _expected_order(scores):
+    return sorted(scores, key=lambda player_id: (-scores[player_id], player_id))
+
+def test_leaderboard_matches_sorting_every_player(run):
+    rng = random.Random(7)
+    random.seed(7)
+    scores = {f"player-{i:03d}": rng.randrange(100) for i in range(60)}
+    leaderboard = Leaderboard()
+    run(leaderboard.load(_Players([
+        {"_id": player_id, "username": player_id, "score": score, "level": 1}
+        for player_id, score in scores.items()
+    ])))
+
+    for step in range(300):
+        roll = rng.random()
+        if roll < 0.6:
+            player_id = rng.choice(sorted(scores))
+            scores[player_id] = rng.randrange(100)
+            leaderboard.upsert(player_id, player_id, scores[player_id])
+        elif roll < 0.8 or not scores:
+            player_id = f"new-{step:03d}"
+            scores[player_id] = rng.randrange(100)
+            leaderboard.upsert(player_id, player_id, scores[player_id])
+        else:
+            player_id = rng.choice(sorted(scores))
+            del scores[player_id]
+            leaderboard.remove(player_id)
+
+        order = _expected_order(scores)
+        probe = rng.choice(order)
+        rank = order.index(probe) + 1
+        assert leaderboard.rank(probe) == rank
+        around = leaderboard.around(probe, 2)
+        assert [entry["_id"] for entry in around] == order[max(rank - 3, 0):rank + 2]
+        assert [entry["rank"] for entry in around] == list(range(max(rank - 2, 1), min(rank + 2, len(order)) + 1))
+
+    order = _expected_order(scores)
+    assert len(leaderboard) == len(order)
+    assert [entry["_id"] for entry in leaderboard.top(len(order))] == order
+    assert [entry["_id"] for entry in leaderboard.top(10, offset=20)] == order[20:30]
+    assert [entry["score"] for entry in leaderboard.top(5)] == [scores[player_id] for player_id in order[:5]]
+    assert leaderboard.rank("nobody") is None
+    assert leaderboard.around("nobody") == []
@@ -0,0 +1,59 @@
+"""An invalidation during a cache miss wins over the document being read (user-012)"""
+import asyncio
+
+from bson import ObjectId
+
+from services.player_cache import PlayerCache
+
+class SlowPlayers:
+    """Reads the document, then lets the test write before the read returns"""
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.reading = asyncio.Event()
+        self.proceed = asyncio.Event()
+
+    async def find_one(self, query):
+        doc = dict(self.doc)
+        self.reading.set()
+        await self.proceed.wait()
+        return doc
+
+async def _update_during_miss(lookup):
+    players = SlowPlayers({"_id": ObjectId(), "username": "alice", "score": 1})
+    cache = PlayerCache(lambda: players)
+    player_id = str(players.doc["_id"])
+
+    fetch = asyncio.create_task(lookup(cache, player_id))
+    await players.reading.wait()
+    # The player route writes and invalidates while the old document is in flight
+    players.doc["score"] = 2
+    cache.invalidate(player_id)
+    players.proceed.set()
+    await fetch
+
+    return await cache.get_by_id(player_id), await cache.get_by_username("alice")
+
+def test_stale_read_by_id_is_not_cached(run):
+    by_id, by_username = run(_update_during_miss(lambda cache, player_id: cache.get_by_id(player_id)))
+    assert by_id["score"] == 2
+    assert by_username["score"] == 2
+
+def test_stale_read_by_username_is_not_cached(run):
+    by_id, by_username = run(_update_during_miss(lambda cache, player_id: cache.get_by_username("alice")))
+    assert by_id["score"] == 2
+    assert by_username["score"] == 2
+
+def test_reads_after_an_invalidation_are_cached(run):
+    async def scenario():
+        players = SlowPlayers({"_id": ObjectId(), "username": "alice"})
+        players.proceed.set()
+        cache = PlayerCache(lambda: players)
+        cache.invalidate(username="alice")
+        await cache.get_by_username("alice")
+        await cache.get_by_username("alice")
+        return cache.stats()
+
+    stats = run(scenario())
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
@@ -0,0 +1,97 @@
+"""Move handling must not depend on how many rooms the worker has (user-002)"""
+import asyncio
+import time
+
+from services.game_manager import GameManager
+
+class CountingDict(dict):
+    """dict that counts lookups and every key or item it iterates over"""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.touched = 0
+
+    def __getitem__(self, key):
+        self.touched += 1
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.touched += 1
+        return super().get(key, default)
+
+    def __contains__(self, key):
+        self.touched += 1
+        return super().__contains__(key)
+
+    def __iter__(self):
+        for key in super().__iter__():
+            self.touched += 1
+            yield key
+
+    def items(self):
+        for item in super().items():
+            self.touched += 1
+            yield item
+
+    def values(self):
+        for value in super().values():
+            self.touched += 1
+            yield value
+
+async def _measure(room_count, fake_websocket, moves=200):
+    """(dict entries touched per move, seconds per move) with room_count busy rooms"""
+    gm = GameManager()
+    for i in range(room_count):
+        # Idle members keep every room alive without needing a socket each
+        await gm.join_room(f"idle-{i}", f"room-{i}")
+    sockets = {}
+    for player_id in ("mover", "watcher"):
+        sockets[player_id] = fake_websocket()
+        await gm.connect(player_id, sockets[player_id])
+        await gm.join_room(player_id, "room-0")
+
+    gm.rooms = CountingDict(gm.rooms)
+    gm.player_rooms = CountingDict(gm.player_rooms)
+    started = time.perf_counter()
+    for i in range(moves):
+        await gm.move_player("mover", i, i)
+    elapsed = (time.perf_counter() - started) / moves
+    touched = (gm.rooms.touched + gm.player_rooms.touched) / moves
+
+    await asyncio.sleep(0)
+    await gm.shutdown()
+    return touched, elapsed
+
+def test_move_work_is_independent_of_room_count(run, fake_websocket):
+    small_touched, small_time = run(_measure(100, fake_websocket))
+    large_touched, large_time = run(_measure(20000, fake_websocket))
+
+    # The same lookups per move, not a scan of every room
+    assert large_touched == small_touched
+    assert small_touched < 10
+    # Timing is noisy on shared machines; a scan would be ~200x slower here
+    assert large_time < small_time * 5
+
+def test_move_reaches_only_room_members(run, fake_websocket):
+    async def scenario():
+        gm = GameManager()
+        for i in range(1000):
+            await gm.join_room(f"idle-{i}", f"room-{i}")
+        sockets = {player_id: fake_websocket() for player_id in ("mover", "watcher", "elsewhere")}
+        for player_id, websocket in sockets.items():
+            await gm.connect(player_id, websocket)
+        await gm.join_room("mover", "room-0")
+        await gm.join_room("watcher", "room-0")
+        await gm.join_room("elsewhere", "room-1")
+        for websocket in sockets.values():
+            websocket.sent.clear()
+
+        await gm.move_player("mover", 3, 4)
+        await asyncio.sleep(0.01)
+        await gm.shutdown()
+        return {player_id: [m for m in websocket.sent if "player_moved" in m] for player_id, websocket in sockets.items()}
+
+    received = run(scenario())
+    assert len(received["watcher"]) == 1
+    assert received["mover"] == []
+    assert received["elsewhere"] == []
@@ -21,6 +21,10 @@ export interface GameState {
   isAnimating: boolean;
 }
 
+// Moves are sent at most this often, matching the server's player_move
+// limit (20/s); sending every frame only gets coalesced on the server
+const MOVE_SEND_INTERVAL_MS = 50
+
 // Игровой движок
 export class GameEngine {
   private app: PIXI.Application
@@ -31,6 +35,8 @@ export class GameEngine {
   private keys: Set<string> = new Set()
   private state: GameState
   private stateListeners: ((state: GameState) => void)[] = []
+  private lastMoveSent: number = 0
+  private moveUnsent: boolean = false
 
   constructor(container: HTMLElement, buildings: Building[]) {
     this.container = container
@@ -105,19 +111,24 @@ export class GameEngine {
 
     if (dx !== 0 || dy !== 0) {
       this.player.move(dx, dy)
-      
-      // Send movement to server
-      if (this.wsManager) {
-        this.wsManager.sendMessage({
-          type: 'player_move',
-          data: {
-            position: {
-              x: this.player.sprite.x,
-              y: this.player.sprite.y
-            }
+      this.moveUnsent = true
+    }
+
+    // Send movement to server, at most once per interval; the last
+    // position still goes out after the player stops
+    const now = performance.now()
+    if (this.moveUnsent && this.wsManager && now - this.lastMoveSent >= MOVE_SEND_INTERVAL_MS) {
+      this.wsManager.sendMessage({
+        type: 'player_move',
+        data: {
+          position: {
+            x: this.player.sprite.x,
+            y: this.player.sprite.y
           }
-        })
-      }
+        }
+      })
+      this.lastMoveSent = now
+      this.moveUnsent = false
     }
 
     // Handle actions
@@ -1,20 +1,53 @@
+import { decodeServerFrame, encodePlayerMove } from './wireProtocol'
+
+/**
+ * Batched movement delta sent once per server tick when the room has a tick
+ * rate configured. `positions` holds only the players that moved since the
+ * previous tick. Room-wide deltas include the receiver's own entry; with an
+ * interest radius set on the server each receiver gets only the movers it
+ * can see, never itself, and players who just came into view arrive as
+ * `player_entered_view` instead. `tick` increases by one per tick of the
+ * room, so a receiver skips the numbers of ticks it had nothing in.
+ */
+export interface PlayersMovedMessage {
+  type: 'players_moved'
+  data: {
+    room_id: string
+    tick: number
+    positions: Record<string, { x: number; y: number }>
+  }
+}
+
 export class WebSocketManager {
   private ws: WebSocket | null = null
   private url: string
   private reconnectAttempts: number = 0
   private maxReconnectAttempts: number = 5
   private reconnectDelay: number = 1000
+  // Binary mode sends moves and receives movement updates as compact binary
+  // frames (see wireProtocol.ts); other messages stay JSON
+  private binary: boolean
+  // Session resumption: the server keeps a dropped player in its rooms for a
+  // grace window; reconnecting with the session id and the last seq seen per
+  // room replays only what was missed
+  private sessionId: string | null = null
+  private lastSeq: Record<string, number> = {}
 
-  constructor() {
+  constructor(binary: boolean = false) {
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
     const host = window.location.host
+    this.binary = binary
     this.url = `${protocol}//${host}/ws/player_123` // TODO: Use actual player ID
+    if (binary) {
+      this.url += '?protocol=binary'
+    }
   }
 
   async connect(): Promise<void> {
     return new Promise((resolve, reject) => {
       try {
-        this.ws = new WebSocket(this.url)
+        this.ws = new WebSocket(this.resumeUrl())
+        this.ws.binaryType = 'arraybuffer'
 
         this.ws.onopen = () => {
           console.log('WebSocket connected')
@@ -24,8 +57,12 @@ export class WebSocketManager {
 
         this.ws.onmessage = (event) => {
           try {
-            const message = JSON.parse(event.data)
-            this.handleMessage(message)
+            const message = event.data instanceof ArrayBuffer
+              ? decodeServerFrame(event.data)
+              : JSON.parse(event.data)
+            if (!this.isDuplicate(message)) {
+              this.handleMessage(message)
+            }
           } catch (error) {
             console.error('Error parsing WebSocket message:', error)
           }
@@ -52,11 +89,34 @@ export class WebSocketManager {
     switch (message.type) {
       case 'connected':
         console.log('Successfully connected to game server')
+        if (message.data.resumed) {
+          console.log('Session resumed:', message.data.rooms)
+        } else if (Object.keys(this.lastSeq).length > 0) {
+          // The server no longer has our session: rooms have to be joined again
+          this.lastSeq = {}
+        }
+        this.sessionId = message.data.session_id
+        break
+      case 'room_snapshot':
+        // Too much was missed to replay; rebuild the room from this
+        this.lastSeq[message.data.room_id] = message.data.seq
+        console.log('Room snapshot:', message.data)
         break
       case 'player_moved':
         // Handle other player movement
         console.log('Player moved:', message.data)
         break
+      case 'players_moved':
+        // Tick-batched movement: one entry per player that moved
+        this.handlePlayersMoved(message as PlayersMovedMessage)
+        break
+      case 'player_entered_view':
+        // Another player came within the server's interest radius
+        console.log('Player entered view:', message.data)
+        break
+      case 'player_left_view':
+        console.log('Player left view:', message.data)
+        break
       case 'player_joined':
         console.log('Player joined:', message.data)
         break
@@ -69,11 +129,75 @@ export class WebSocketManager {
       case 'chat_message':
         console.log('Chat message:', message.data)
         break
+      case 'game_objects_patched':
+        console.log('Game objects patched:', message.data)
+        break
+      case 'building_placed':
+        console.log('Building placed:', message.data.building)
+        break
+      case 'building_removed':
+        console.log('Building removed:', message.data.building_id)
+        break
+      case 'error':
+        // Structured rejection: code, message and per-field errors
+        console.warn('Server rejected message:', message.data)
+        break
+      case 'redirect':
+        // The room lives on another worker: reconnect there and rejoin it
+        this.handleRedirect(message.data)
+        break
       default:
         console.log('Unknown message type:', message.type)
     }
   }
 
+  private resumeUrl(): string {
+    if (!this.sessionId) {
+      return this.url
+    }
+    const url = new URL(this.url)
+    url.searchParams.set('resume', this.sessionId)
+    url.searchParams.delete('seq')
+    for (const [roomId, seq] of Object.entries(this.lastSeq)) {
+      url.searchParams.append('seq', `${roomId}:${seq}`)
+    }
+    return url.toString()
+  }
+
+  // Room messages carry a per-room seq; anything at or below the last one
+  // seen was already handled
+  private isDuplicate(message: any): boolean {
+    if (typeof message.seq !== 'number' || typeof message.room_id !== 'string') {
+      return false
+    }
+    const last = this.lastSeq[message.room_id]
+    if (last !== undefined && message.seq <= last) {
+      return true
+    }
+    this.lastSeq[message.room_id] = message.seq
+    return false
+  }
+
+  private handlePlayersMoved(message: PlayersMovedMessage): void {
+    for (const [playerId, position] of Object.entries(message.data.positions)) {
+      console.log('Player moved:', { player_id: playerId, position })
+    }
+  }
+
+  private handleRedirect(data: { room_id: string; worker_id: string; url: string }): void {
+    const current = new URL(this.url)
+    const target = new URL(current.pathname, data.url)
+    target.search = current.search
+    target.searchParams.set('room', data.room_id)
+    this.url = target.toString()
+    // Sessions don't move between workers
+    this.sessionId = null
+    this.lastSeq = {}
+    // onclose reconnects, now to the owning worker
+    this.reconnectAttempts = 0
+    this.ws?.close()
+  }
+
   public sendMessage(message: any): void {
     if (this.ws && this.ws.readyState === WebSocket.OPEN) {
       this.ws.send(JSON.stringify(message))
@@ -82,11 +206,36 @@ export class WebSocketManager {
     }
   }
 
+  // A room id can be left and later reused; its seqs then mean nothing to
+  // what we saw before, so forget them either way
+  public joinRoom(roomId: string): void {
+    delete this.lastSeq[roomId]
+    this.sendMessage({ type: 'join_room', data: { room_id: roomId } })
+  }
+
+  public leaveRoom(roomId: string): void {
+    delete this.lastSeq[roomId]
+    this.sendMessage({ type: 'leave_room', data: { room_id: roomId } })
+  }
+
+  public sendMove(x: number, y: number): void {
+    if (!this.binary) {
+      this.sendMessage({ type: 'player_move', data: { position: { x, y } } })
+      return
+    }
+    if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+      this.ws.send(encodePlayerMove(x, y))
+    } else {
+      console.warn('WebSocket is not connected')
+    }
+  }
+
   private attemptReconnect(): void {
     if (this.reconnectAttempts < this.maxReconnectAttempts) {
       this.reconnectAttempts++
       console.log(`Attempting to reconnect... (${this.reconnectAttempts}/${this.maxReconnectAttempts})`)
-      
+
+      // connect() resumes the session, so rooms don't have to be rejoined
       setTimeout(() => {
         this.connect().catch((error) => {
           console.error('Reconnection failed:', error)
@@ -98,6 +247,8 @@ export class WebSocketManager {
   }
 
   public disconnect(): void {
+    this.sessionId = null
+    this.lastSeq = {}
     if (this.ws) {
       this.ws.close()
       this.ws = null
@@ -0,0 +1,58 @@
+// Binary wire format for high-frequency messages, mirrored from backend/services/wire.py.
+// Frames start with a one-byte opcode; coordinates are little-endian float32 and
+// ids are length-prefixed UTF-8. Anything without a binary layout stays JSON text.
+
+export const OP_PLAYER_MOVE = 0x01
+export const OP_PLAYER_MOVED = 0x02
+export const OP_PLAYERS_MOVED = 0x03
+
+const decoder = new TextDecoder()
+
+export function encodePlayerMove(x: number, y: number): ArrayBuffer {
+  const buffer = new ArrayBuffer(9)
+  const view = new DataView(buffer)
+  view.setUint8(0, OP_PLAYER_MOVE)
+  view.setFloat32(1, x, true)
+  view.setFloat32(5, y, true)
+  return buffer
+}
+
+function readId(view: DataView, offset: number): [string, number] {
+  const length = view.getUint8(offset)
+  const start = offset + 1
+  const bytes = new Uint8Array(view.buffer, view.byteOffset + start, length)
+  return [decoder.decode(bytes), start + length]
+}
+
+export function decodeServerFrame(buffer: ArrayBuffer): any {
+  const view = new DataView(buffer)
+  const opcode = view.getUint8(0)
+
+  if (opcode === OP_PLAYER_MOVED) {
+    const [playerId, offset] = readId(view, 1)
+    return {
+      type: 'player_moved',
+      data: {
+        player_id: playerId,
+        position: { x: view.getFloat32(offset, true), y: view.getFloat32(offset + 4, true) }
+      }
+    }
+  }
+
+  if (opcode === OP_PLAYERS_MOVED) {
+    const tick = view.getUint32(1, true)
+    let [roomId, offset] = readId(view, 5)
+    const count = view.getUint16(offset, true)
+    offset += 2
+    const positions: Record<string, { x: number; y: number }> = {}
+    for (let i = 0; i < count; i++) {
+      let playerId: string
+      ;[playerId, offset] = readId(view, offset)
+      positions[playerId] = { x: view.getFloat32(offset, true), y: view.getFloat32(offset + 4, true) }
+      offset += 8
+    }
+    return { type: 'players_moved', data: { room_id: roomId, tick, positions } }
+  }
+
+  throw new Error(`Unknown binary opcode ${opcode}`)
+}
@@ -20,6 +20,43 @@ export const getPlayer = async (playerId: string): Promise<Player> => {
   return response.data
 }
 
+export interface PlacedBuilding {
+  _id: string
+  game_id: string
+  building_type: string
+  x: number
+  y: number
+  width: number
+  height: number
+  placed_by: string | null
+  created_at: string
+}
+
+// Building API: the server owns the city grid and rejects overlapping
+// footprints with 409
+export const placeBuilding = async (
+  gameId: string,
+  building: { building_type: string; x: number; y: number; width?: number; height?: number },
+  playerUsername?: string
+): Promise<PlacedBuilding> => {
+  const response = await axios.post(`${API_BASE_URL}/games/${gameId}/buildings`, building, {
+    params: playerUsername ? { player_username: playerUsername } : undefined
+  })
+  return response.data
+}
+
+export const getBuildingsInView = async (
+  gameId: string,
+  view: { x: number; y: number; width: number; height: number }
+): Promise<PlacedBuilding[]> => {
+  const response = await axios.get(`${API_BASE_URL}/games/${gameId}/buildings`, { params: view })
+  return response.data.buildings
+}
+
+export const removeBuilding = async (gameId: string, buildingId: string): Promise<void> => {
+  await axios.delete(`${API_BASE_URL}/games/${gameId}/buildings/${buildingId}`)
+}
+
 export const api = axios.create({
   baseURL: API_BASE_URL,
   headers: {